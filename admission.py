@@ -0,0 +1,235 @@
+"""
+Per-tool admission control for backend scans.
+
+A burst of deepfake uploads can otherwise take every core and starve the
+cheap text tools. Each capped tool gets `limit` run slots and `queue` wait
+slots, host-wide: slots are flock()-ed files under STATE_FOLDER, so every
+gunicorn worker (and job thread) competes for the same ones, and a slot is
+released automatically if its holder dies.
+
+    TOOL_CONCURRENCY=deepfake-analyzer=2,adversarial-attack-shield=2   run slots (unlisted tools are uncapped)
+    TOOL_QUEUE_LIMITS=deepfake-analyzer=8                             wait slots (default TOOL_QUEUE_DEFAULT)
+    TOOL_QUEUE_TIMEOUT=30                                             max seconds a request waits for a run slot
+
+A request that finds all run slots and all wait slots taken is rejected at
+once with Overloaded (HTTP 429 + Retry-After) instead of piling up.
+
+admit() blocks its thread while queued; admit_async() is the same for the
+asyncio serving mode (asgi.py) and waits with asyncio.sleep() instead.
+"""
+import os
+import math
+import time
+import random
+import asyncio
+import logging
+import threading
+from contextlib import contextmanager, asynccontextmanager
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+POLL_SECONDS = 0.1
+DEFAULT_SCAN_SECONDS = 5.0
+
+
+class Overloaded(Exception):
+    """Every run and wait slot of a tool is taken."""
+
+    def __init__(self, tool, retry_after):
+        super().__init__(f"{tool} is busy. Please retry in {retry_after}s.")
+        self.tool = tool
+        self.retry_after = retry_after
+
+
+def parse_limits(raw):
+    limits = {}
+    for item in (raw or '').split(','):
+        if '=' not in item:
+            continue
+        name, value = item.split('=', 1)
+        try:
+            limits[name.strip()] = int(value)
+        except ValueError:
+            logging.warning(f"⚠️ Ignoring invalid tool limit entry: {item!r}")
+    return limits
+
+
+def _try_lock(path):
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        return fd
+    except BlockingIOError:
+        os.close(fd)
+        return None
+
+
+def _release(fd):
+    fcntl.flock(fd, fcntl.LOCK_UN)
+    os.close(fd)
+
+
+def _locked_inodes():
+    """
+    Inode numbers of the files flock()-ed on this host, read from /proc/locks;
+    None where that is unavailable. Reading it takes no lock, so counting the
+    busy slots never makes a concurrent admit() miss a free one.
+    """
+    try:
+        with open('/proc/locks') as f:
+            lines = f.read().splitlines()
+    except OSError:
+        return None
+    inodes = set()
+    for line in lines:
+        # "1: FLOCK  ADVISORY  WRITE 1234 fe:00:5678 0 EOF"; blocked waiters have a "->" field
+        fields = line.split()
+        if 'FLOCK' not in fields or '->' in fields:
+            continue
+        device_inode = fields[fields.index('FLOCK') + 4]
+        # Inode only: under overlayfs the device here is not the one os.stat() reports
+        inodes.add(int(device_inode.rsplit(':', 1)[-1]))
+    return inodes
+
+
+class AdmissionController:
+    def __init__(self, lock_dir, concurrency, queue_limits=None, default_queue=4, queue_timeout=30):
+        self.lock_dir = lock_dir
+        self.concurrency = {tool: limit for tool, limit in concurrency.items() if limit > 0}
+        self.queue_limits = queue_limits or {}
+        self.default_queue = default_queue
+        self.queue_timeout = queue_timeout
+        self._durations = {}
+        self._lock = threading.Lock()
+        if fcntl is None and self.concurrency:
+            logging.warning("⚠️ fcntl is not available on this platform - tool concurrency limits are disabled.")
+            self.concurrency = {}
+        for tool in self.concurrency:
+            os.makedirs(os.path.join(lock_dir, tool), exist_ok=True)
+
+    def queue_limit(self, tool):
+        return self.queue_limits.get(tool, self.default_queue)
+
+    def _slot_paths(self, tool, kind, count):
+        paths = [os.path.join(self.lock_dir, tool, f"{kind}-{i}.lock") for i in range(count)]
+        random.shuffle(paths)
+        return paths
+
+    def _take_slot(self, tool, kind, count):
+        for path in self._slot_paths(tool, kind, count):
+            fd = _try_lock(path)
+            if fd is not None:
+                return fd
+        return None
+
+    def _count_taken(self, tool, kind, count):
+        """Slots of a kind currently held, host-wide; None when /proc/locks cannot be read."""
+        inodes = _locked_inodes()
+        if inodes is None:
+            return None
+        taken = 0
+        for i in range(count):
+            try:
+                if os.stat(os.path.join(self.lock_dir, tool, f"{kind}-{i}.lock")).st_ino in inodes:
+                    taken += 1
+            except OSError:
+                # Never taken yet
+                continue
+        return taken
+
+    def retry_after(self, tool):
+        """Seconds until a wait slot is likely free, from this worker's recent scan durations."""
+        limit = self.concurrency.get(tool, 1)
+        average = self._durations.get(tool, DEFAULT_SCAN_SECONDS)
+        return max(1, math.ceil(average * (self.queue_limit(tool) + 1) / limit))
+
+    def has_capacity(self, tool):
+        """Cheap pre-check (e.g. before accepting an upload): False when run and wait slots are all taken."""
+        limit = self.concurrency.get(tool)
+        if not limit:
+            return True
+        running = self._count_taken(tool, 'run', limit)
+        if running is None:
+            # Cannot tell without probing the slots; admit() decides
+            return True
+        return running < limit or self._count_taken(tool, 'queue', self.queue_limit(tool)) < self.queue_limit(tool)
+
+    @contextmanager
+    def admit(self, tool):
+        """Holds one of the tool's run slots for the duration of the block, or raises Overloaded."""
+        limit = self.concurrency.get(tool)
+        if not limit:
+            yield
+            return
+
+        run_fd = self._take_slot(tool, 'run', limit)
+        if run_fd is None:
+            queue_fd = self._take_slot(tool, 'queue', self.queue_limit(tool))
+            if queue_fd is None:
+                raise Overloaded(tool, self.retry_after(tool))
+            try:
+                deadline = time.monotonic() + self.queue_timeout
+                while run_fd is None:
+                    if time.monotonic() >= deadline:
+                        raise Overloaded(tool, self.retry_after(tool))
+                    time.sleep(POLL_SECONDS)
+                    run_fd = self._take_slot(tool, 'run', limit)
+            finally:
+                _release(queue_fd)
+
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            _release(run_fd)
+            self._record_duration(tool, time.monotonic() - started)
+
+    @asynccontextmanager
+    async def admit_async(self, tool):
+        """admit() for coroutines: waiting for a run slot does not block the event loop."""
+        limit = self.concurrency.get(tool)
+        if not limit:
+            yield
+            return
+
+        run_fd = self._take_slot(tool, 'run', limit)
+        if run_fd is None:
+            queue_fd = self._take_slot(tool, 'queue', self.queue_limit(tool))
+            if queue_fd is None:
+                raise Overloaded(tool, self.retry_after(tool))
+            try:
+                deadline = time.monotonic() + self.queue_timeout
+                while run_fd is None:
+                    if time.monotonic() >= deadline:
+                        raise Overloaded(tool, self.retry_after(tool))
+                    await asyncio.sleep(POLL_SECONDS)
+                    run_fd = self._take_slot(tool, 'run', limit)
+            finally:
+                _release(queue_fd)
+
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            _release(run_fd)
+            self._record_duration(tool, time.monotonic() - started)
+
+    def _record_duration(self, tool, elapsed):
+        with self._lock:
+            previous = self._durations.get(tool, elapsed)
+            self._durations[tool] = 0.8 * previous + 0.2 * elapsed
+
+    def gauges(self):
+        """Host-wide in-flight and queued scans per capped tool (None where /proc/locks is unavailable)."""
+        return {
+            tool: {
+                "limit": limit,
+                "in_flight": self._count_taken(tool, 'run', limit),
+                "queue_limit": self.queue_limit(tool),
+                "queued": self._count_taken(tool, 'queue', self.queue_limit(tool)),
+            }
+            for tool, limit in self.concurrency.items()
+        }
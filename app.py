@@ -1,24 +1,43 @@
-from flask import Flask, render_template, request, jsonify, redirect, url_for, session
+from flask import Flask, render_template, request, jsonify, redirect, url_for, session, Response, stream_with_context
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import tuple_, func, case, inspect
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import load_only, joinedload, undefer, make_transient_to_detached
 from flask_login import LoginManager, UserMixin, login_user, logout_user, login_required, current_user
 from werkzeug.security import generate_password_hash, check_password_hash
-from werkzeug.utils import secure_filename 
-from datetime import datetime
+from datetime import datetime, timedelta
 from functools import wraps
 from flask import abort
 from random import randint
-from sendgrid import SendGridAPIClient
-from sendgrid.helpers.mail import Mail
-import subprocess
+from types import SimpleNamespace
 import os
-import shlex
+import sys
+import time
+import shutil
 import re
 import base64
 import logging
 import json 
 import hashlib 
-import numpy as np 
+import hmac
+import itertools
+import csv
+import io
+import gzip
+import zlib
+import click
 from dotenv import load_dotenv
+import tool_workers
+import jobs
+import result_cache
+import single_flight
+import admission
+import uploads
+import report_writer
+import report_archive
+import migrations
+from backend import registry as backend_registry
+from backend import model_registry
 
 # Load environment variables from .env file
 load_dotenv()
@@ -28,6 +47,9 @@ logging.basicConfig(level=logging.INFO)
 
 # --- CONFIGURATION & INITIALIZATION ---
 app = Flask(__name__, template_folder='templates', static_folder='static')
+# Multipart uploads are streamed straight into UPLOAD_FOLDER, hashed on the way (see uploads.py)
+app.request_class = uploads.IngestRequest
+app.teardown_request(uploads.discard_unclaimed)
 
 # --- EMAIL CONFIGURATION ---
 USE_SUPABASE_AUTH = False
@@ -51,6 +73,9 @@ app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 MAX_UPLOAD_SIZE_MB = int(os.getenv('MAX_UPLOAD_SIZE_MB', 128))
 app.config['MAX_CONTENT_LENGTH'] = MAX_UPLOAD_SIZE_MB * 1024 * 1024
 
+# Host-local state (job table, result cache) shared by the gunicorn workers
+STATE_FOLDER = os.getenv('STATE_FOLDER', 'instance/')
+
 # --- SECURITY & DATABASE CONFIGURATION ---
 app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'dev_key_CHANGE_IN_PRODUCTION_' + os.urandom(24).hex())
 
@@ -93,7 +118,7 @@ class User(db.Model, UserMixin):
     username = db.Column(db.String(80), unique=True, nullable=False)
     email = db.Column(db.String(120), unique=True, nullable=False)
     password_hash = db.Column(db.String(128), nullable=False)
-    role = db.Column(db.String(20), default='user')
+    role = db.Column(db.String(20), default='user', index=True)
     reports = db.relationship('ScanReport', backref='author', lazy=True)
 
     def set_password(self, password):
@@ -105,25 +130,145 @@ class User(db.Model, UserMixin):
     def get_id(self):
         return str(self.id)
 
+GZIP_MAGIC = b'\x1f\x8b'
+
+class CompressedText(db.TypeDecorator):
+    """
+    Text stored gzip-compressed in a binary column (BYTEA on Postgres, see
+    convert_compressed_columns). Reads also accept the plain-text values
+    written before `flask compress-reports` ran.
+    """
+    impl = db.LargeBinary
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        return gzip.compress(value.encode('utf-8'), compresslevel=6, mtime=0)
+
+    def process_result_value(self, value, dialect):
+        return decompress_text(value)
+
+def decompress_text(value):
+    if value is None or isinstance(value, str):
+        return value
+    value = bytes(value)
+    if value.startswith(GZIP_MAGIC):
+        value = zlib.decompress(value, wbits=31)
+    return value.decode('utf-8')
+
+# Top-level report fields that differ between two scans of the same input
+VOLATILE_REPORT_KEYS = ('timestamp', 'cached')
+
+class ReportBody(db.Model):
+    """A report body stored once and shared by every ScanReport with the same content (see split_report_data)."""
+    __tablename__ = 'report_body'
+    hash = db.Column(db.String(64), primary_key=True)
+    data = db.Column(CompressedText, nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+def split_report_data(report_data):
+    """
+    (body, hash, per-scan fields) for a report's JSON text: the body is the
+    canonical JSON (sorted keys) without VOLATILE_REPORT_KEYS, hashed with
+    SHA-256. None for a report that is not a JSON object.
+    """
+    try:
+        report = json.loads(report_data)
+    except (TypeError, json.JSONDecodeError):
+        return None
+    if not isinstance(report, dict):
+        return None
+    per_scan = {key: report.pop(key) for key in VOLATILE_REPORT_KEYS if key in report}
+    body = json.dumps(report, sort_keys=True, separators=(',', ':'))
+    return body, hashlib.sha256(body.encode('utf-8')).hexdigest(), json.dumps(per_scan)
+
+def merge_report_data(report_data, body):
+    """The full report JSON text of a row: its own report_data, on top of the shared body if it has one."""
+    if body is None:
+        return report_data
+    return json.dumps({**json.loads(body), **json.loads(report_data)})
+
 class ScanReport(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    tool_name = db.Column(db.String(50), nullable=False)
+    tool_name = db.Column(db.String(50), nullable=False, index=True)
     input_data_summary = db.Column(db.Text, nullable=False)
-    risk_level = db.Column(db.String(20), nullable=True) 
+    risk_level = db.Column(db.String(20), nullable=True, index=True)
     main_finding = db.Column(db.String(255), nullable=True)
-    report_data = db.Column(db.Text, nullable=False) 
+    # Compressed, and only fetched when a view actually reads it. With a
+    # body_hash it only holds the per-scan fields; the rest is in report_body
+    report_data = db.deferred(db.Column(CompressedText, nullable=False))
+    body_hash = db.Column(db.String(64), db.ForeignKey('report_body.hash'), nullable=True, index=True)
+    body = db.relationship(ReportBody, lazy='select')
+    # What /api/search matches (see build_search_text); indexed by FTS5 / tsvector
+    search_text = db.deferred(db.Column(db.Text, nullable=True))
     scan_date = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
 
+    @property
+    def full_report_data(self):
+        """The report JSON text, with the shared body merged back in."""
+        return merge_report_data(self.report_data, self.body.data if self.body_hash else None)
+
+    # Keyset pagination of /history: every page is a range scan of one of these
+    __table_args__ = (
+        db.Index('ix_scan_report_user_date', 'user_id', 'scan_date', 'id'),
+        db.Index('ix_scan_report_user_tool_date', 'user_id', 'tool_name', 'scan_date', 'id'),
+        db.Index('ix_scan_report_user_risk_date', 'user_id', 'risk_level', 'scan_date', 'id'),
+        # ...and of the admin monitor's all-users log
+        db.Index('ix_scan_report_date', 'scan_date', 'id'),
+    )
+
+class ScanStat(db.Model):
+    """Scans per user, tool, normalized risk and day; kept up to date as reports are inserted."""
+    __tablename__ = 'scan_stats_daily'
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    tool_name = db.Column(db.String(50), primary_key=True)
+    risk = db.Column(db.String(10), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    scan_count = db.Column(db.Integer, nullable=False, default=0)
+    last_scan_date = db.Column(db.DateTime, nullable=False)
+
+    __table_args__ = (
+        db.Index('ix_scan_stats_daily_day', 'day'),
+    )
+
 # --- FILE UPLOAD HELPER ---
 def allowed_file(filename):
     return '.' in filename and \
            filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
 # --- FLASK-LOGIN USER LOADER ---
+# Per-process cache of the logged-in users, so an authenticated request does not
+# start with a SELECT on the user table. promote / delete / logout drop the entry
+# in the process that handles them; other workers see the change within the TTL.
+USER_CACHE_TTL_SECONDS = float(os.getenv('USER_CACHE_TTL_SECONDS', 30))
+USER_CACHE_MAX_ENTRIES = 10000
+_user_cache = {}  # user id -> (expires at, detached User)
+
+def forget_cached_user(user_id):
+    _user_cache.pop(int(user_id), None)
+
+def cache_user(user):
+    if len(_user_cache) >= USER_CACHE_MAX_ENTRIES:
+        _user_cache.clear()
+    snapshot = User(**{column.name: getattr(user, column.name) for column in User.__table__.columns})
+    make_transient_to_detached(snapshot)
+    _user_cache[user.id] = (time.monotonic() + USER_CACHE_TTL_SECONDS, snapshot)
+
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(int(user_id))
+    user_id = int(user_id)
+    entry = _user_cache.get(user_id)
+    if entry and entry[0] > time.monotonic():
+        # A session-bound copy without a query; relationships still lazy-load
+        return db.session.merge(entry[1], load=False)
+    user = db.session.get(User, user_id)
+    if user is None:
+        forget_cached_user(user_id)
+    elif USER_CACHE_TTL_SECONDS > 0:
+        cache_user(user)
+    return user
 
 # --- AUTHENTICATION ROUTES ---
 @app.route('/')
@@ -147,6 +292,10 @@ def login():
 
 def send_otp_email(email, username, otp):
     try:
+        # Imported here: sendgrid (and its HTTP/certifi stack) is only needed to send mail
+        from sendgrid import SendGridAPIClient
+        from sendgrid.helpers.mail import Mail
+
         message = Mail(
             from_email=app.config.get('MAIL_DEFAULT_SENDER'),
             to_emails=email,
@@ -201,15 +350,10 @@ def register():
 
         # Send Email via SendGrid
         if not send_otp_email(email, username, otp):
-    return render_template(
-        'register.html',
-        error="Failed to send verification email. Please try again."
-    )
-
-
-        except Exception as e:
-            logging.error(f"❌ Email error: {str(e)}")
-            return render_template('register.html', error="Failed to send verification email. Please try again later.")
+            return render_template(
+                'register.html',
+                error="Failed to send verification email. Please try again."
+            )
 
         # Store data in session temporarily until OTP is verified
         session['temp_user'] = {
@@ -272,9 +416,40 @@ def admin_required(f):
 @login_required
 @admin_required
 def admin_monitor():
-    all_reports = ScanReport.query.order_by(ScanReport.scan_date.desc()).all()
-    all_users = User.query.all()
-    return render_template('admin_monitor.html', reports=all_reports, users=all_users)
+    # Per-user totals come from the rollup table, not from the reports themselves
+    counts = (
+        db.session.query(
+            ScanStat.user_id,
+            func.sum(ScanStat.scan_count).label('report_count'),
+            func.sum(case((ScanStat.risk == 'high', ScanStat.scan_count), else_=0)).label('high_risk_count'),
+            func.max(ScanStat.last_scan_date).label('last_scan_date'),
+        )
+        .group_by(ScanStat.user_id)
+        .subquery()
+    )
+    users = (
+        db.session.query(
+            User,
+            func.coalesce(counts.c.report_count, 0),
+            func.coalesce(counts.c.high_risk_count, 0),
+            counts.c.last_scan_date,
+        )
+        .outerjoin(counts, counts.c.user_id == User.id)
+        .order_by(User.id)
+        .all()
+    )
+    # A page of the log, each report's author joined in the same query and report_data never loaded
+    reports, next_cursor = keyset_page(
+        ScanReport.query.options(
+            load_only(*HISTORY_COLUMNS),
+            joinedload(ScanReport.author).load_only(User.username),
+        ),
+        request.args
+    )
+    return render_template(
+        'admin_monitor.html', reports=reports, users=users, stats=scan_stats(),
+        next_cursor=next_cursor, paged=bool(request.args.get('cursor'))
+    )
 
 @app.route('/admin/promote/<int:user_id>')
 @login_required
@@ -283,6 +458,7 @@ def promote_user(user_id):
     user = User.query.get_or_404(user_id)
     user.role = 'admin'
     db.session.commit()
+    forget_cached_user(user.id)
     return redirect(url_for('admin_monitor'))
 
 @app.route('/admin/delete_user/<int:user_id>')
@@ -293,29 +469,319 @@ def delete_user(user_id):
     if user.id == current_user.id:
         return "Error: You cannot delete your own admin account.", 400
     ScanReport.query.filter_by(user_id=user.id).delete()
+    ScanStat.query.filter_by(user_id=user.id).delete()
     db.session.delete(user)
     db.session.commit()
+    forget_cached_user(user.id)
+    scan_archive.forget_user(user.id)
     return redirect(url_for('admin_monitor'))
 
 @app.route('/logout')
 @login_required
 def logout():
+    forget_cached_user(current_user.id)
     logout_user()
     session.pop('ai_core_access', None)
     return redirect(url_for('welcome_gate'))
 
+# --- SCAN HISTORY ---
+HISTORY_PAGE_SIZE = 50
+HISTORY_MAX_PAGE_SIZE = 200
+HISTORY_COLUMNS = (
+    ScanReport.id, ScanReport.tool_name, ScanReport.input_data_summary,
+    ScanReport.risk_level, ScanReport.main_finding, ScanReport.scan_date
+)
+
+def encode_history_cursor(report):
+    return base64.urlsafe_b64encode(f"{report.scan_date.isoformat()}|{report.id}".encode()).decode().rstrip('=')
+
+def decode_history_cursor(cursor):
+    """(scan_date, id) of the last row of the previous page, or None for a malformed cursor."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        scan_date, report_id = raw.rsplit('|', 1)
+        return datetime.fromisoformat(scan_date), int(report_id)
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+def parse_history_date(value):
+    try:
+        return datetime.strptime(value, '%Y-%m-%d') if value else None
+    except ValueError:
+        return None
+
+def history_page(user_id, args):
+    """
+    One page of a user's reports, newest first, without the report_data blobs.
+    Filters: tool, risk, from / to (YYYY-MM-DD, inclusive), q (full-text
+    search; not applied to archived reports); `cursor` is the
+    next_cursor of the previous page, `per_page` the page size, archived=1
+    lists the reports moved to the archive instead.
+    Returns (reports, next_cursor, filters).
+    """
+    filters = {
+        "tool": args.get('tool', '').strip(),
+        "risk": args.get('risk', '').strip(),
+        "from": args.get('from', '').strip(),
+        "to": args.get('to', '').strip(),
+        "q": args.get('q', '').strip(),
+    }
+    date_from = parse_history_date(filters['from'])
+    date_to = parse_history_date(filters['to'])
+    if date_to:
+        date_to += timedelta(days=1)
+
+    if args.get('archived') == '1':
+        per_page = history_per_page(args)
+        reports = [
+            SimpleNamespace(**row) for row in scan_archive.user_reports(
+                user_id, per_page + 1, decode_history_cursor(args.get('cursor', '')),
+                filters['tool'], filters['risk'], date_from, date_to
+            )
+        ]
+        next_cursor = encode_history_cursor(reports[per_page - 1]) if len(reports) > per_page else None
+        return reports[:per_page], next_cursor, filters
+
+    query = ScanReport.query.options(load_only(*HISTORY_COLUMNS)).filter(ScanReport.user_id == user_id)
+    if filters['tool']:
+        query = query.filter(ScanReport.tool_name == filters['tool'])
+    if filters['risk']:
+        query = query.filter(ScanReport.risk_level == filters['risk'])
+    if date_from:
+        query = query.filter(ScanReport.scan_date >= date_from)
+    if date_to:
+        query = query.filter(ScanReport.scan_date < date_to)
+    if filters['q']:
+        query = query.filter(search_filter(filters['q']))
+    reports, next_cursor = keyset_page(query, args)
+    return reports, next_cursor, filters
+
+def history_per_page(args):
+    return min(max(args.get('per_page', HISTORY_PAGE_SIZE, type=int), 1), HISTORY_MAX_PAGE_SIZE)
+
+def keyset_page(query, args):
+    """
+    Newest-first page of a ScanReport query, continuing after args['cursor'].
+    Returns (reports, next_cursor); next_cursor is None on the last page.
+    """
+    per_page = history_per_page(args)
+    cursor = decode_history_cursor(args.get('cursor', ''))
+    if cursor:
+        query = query.filter(tuple_(ScanReport.scan_date, ScanReport.id) < cursor)
+
+    # One extra row tells whether there is a next page
+    reports = query.order_by(ScanReport.scan_date.desc(), ScanReport.id.desc()).limit(per_page + 1).all()
+    next_cursor = encode_history_cursor(reports[per_page - 1]) if len(reports) > per_page else None
+    return reports[:per_page], next_cursor
+
+def history_filter_options(user_id):
+    """The tools and risk levels that occur in a user's history (for the filter drop-downs)."""
+    tools = db.session.query(ScanReport.tool_name).filter(ScanReport.user_id == user_id).distinct()
+    risks = db.session.query(ScanReport.risk_level).filter(
+        ScanReport.user_id == user_id, ScanReport.risk_level.isnot(None)
+    ).distinct()
+    return sorted(row[0] for row in tools), sorted(row[0] for row in risks)
+
 @app.route('/history')
 @login_required
 def history():
-    reports = ScanReport.query.filter_by(user_id=current_user.id).order_by(ScanReport.scan_date.desc()).all()
-    return render_template('history.html', reports=reports)
+    reports, next_cursor, filters = history_page(current_user.id, request.args)
+    tools, risks = history_filter_options(current_user.id)
+    archived = request.args.get('archived') == '1'
+    filter_args = {key: value for key, value in filters.items() if value}
+    if archived:
+        filter_args['archived'] = '1'
+    return render_template(
+        'history.html', reports=reports, next_cursor=next_cursor, filters=filters,
+        stats=scan_stats(current_user.id), filter_args=filter_args, archived=archived,
+        retention_days=REPORT_RETENTION_DAYS,
+        tools=tools, risks=risks, paged=bool(request.args.get('cursor'))
+    )
+
+@app.get('/api/history')
+@login_required
+def api_history():
+    reports, next_cursor, filters = history_page(current_user.id, request.args)
+    return jsonify({
+        "ok": True,
+        "filters": filters,
+        "reports": [report_summary(report) for report in reports],
+        "next_cursor": next_cursor,
+        "next_url": url_for('api_history', **{**request.args.to_dict(), "cursor": next_cursor}) if next_cursor else None,
+    })
+
+# --- BULK EXPORT ---
+EXPORT_COLUMNS = ('id', 'user_id', 'tool_name', 'input_data_summary', 'risk_level', 'main_finding', 'scan_date', 'report_data')
+EXPORT_FETCH_ROWS = 1000
+EXPORT_WRITE_BYTES = 64 * 1024
+
+def export_rows(user_id, date_from, date_to, tool):
+    """Archived reports, then those still in the database (read through a server-side cursor), oldest first."""
+    yield from scan_archive.iter_reports(user_id, date_from, date_to, tool)
+    table = ScanReport.__table__
+    statement = (
+        db.select(*(table.c[name] for name in EXPORT_COLUMNS), ReportBody.__table__.c.data.label('body'))
+        .outerjoin(ReportBody.__table__, ReportBody.__table__.c.hash == table.c.body_hash)
+        .order_by(table.c.scan_date, table.c.id)
+    )
+    if user_id is not None:
+        statement = statement.where(table.c.user_id == user_id)
+    if tool:
+        statement = statement.where(table.c.tool_name == tool)
+    if date_from:
+        statement = statement.where(table.c.scan_date >= date_from)
+    if date_to:
+        statement = statement.where(table.c.scan_date < date_to)
+    result = db.session.execute(statement.execution_options(stream_results=True, yield_per=EXPORT_FETCH_ROWS))
+    for row in result.mappings():
+        if row['body'] is None:
+            yield row
+        else:
+            yield dict(row, report_data=merge_report_data(row['report_data'], row['body']))
+
+def export_lines(rows, fmt):
+    if fmt == 'csv':
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(EXPORT_COLUMNS)
+        for row in rows:
+            writer.writerow([row['scan_date'].isoformat() if name == 'scan_date' else row[name] for name in EXPORT_COLUMNS])
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        return
+    for row in rows:
+        line = {name: row[name] for name in EXPORT_COLUMNS}
+        line['scan_date'] = row['scan_date'].isoformat()
+        try:
+            line['report_data'] = json.loads(row['report_data'])
+        except (TypeError, json.JSONDecodeError):
+            pass  # Exported as the stored text
+        yield json.dumps(line) + '\n'
+
+def export_chunks(lines, compress):
+    """Joins lines into EXPORT_WRITE_BYTES writes, gzip-compressed on the fly when asked."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None
+    pending, size = [], 0
+    for line in lines:
+        pending.append(line)
+        size += len(line)
+        if size >= EXPORT_WRITE_BYTES:
+            data = ''.join(pending).encode('utf-8')
+            pending, size = [], 0
+            data = compressor.compress(data) if compressor else data
+            if data:
+                yield data
+    data = ''.join(pending).encode('utf-8')
+    if compressor:
+        data = compressor.compress(data) + compressor.flush()
+    if data:
+        yield data
+
+@app.get('/api/export')
+@login_required
+def api_export():
+    """
+    Streams reports as NDJSON (default) or CSV (format=csv), gzip-compressed
+    with gzip=1, without holding them in memory. Filters: from / to
+    (YYYY-MM-DD, inclusive) and tool; admins may export another user's
+    reports (user_id=<id>) or everyone's (scope=all).
+    """
+    fmt = request.args.get('format', 'ndjson').lower()
+    if fmt not in ('ndjson', 'csv'):
+        return jsonify({"ok": False, "error": "format must be ndjson or csv.", "error_type": "ValidationError"}), 400
+    compress = request.args.get('gzip', '').lower() in ('1', 'true', 'yes')
+
+    user_id = current_user.id
+    if request.args.get('scope') == 'all' or request.args.get('user_id'):
+        if current_user.role != 'admin':
+            return jsonify({"ok": False, "error": "Only admins can export other users' reports.", "error_type": "Forbidden"}), 403
+        user_id = None if request.args.get('scope') == 'all' else request.args.get('user_id', type=int)
+        if user_id is None and request.args.get('scope') != 'all':
+            # type=int gives None for "abc", which would export every user
+            return jsonify({"ok": False, "error": "user_id must be an integer.", "error_type": "ValidationError"}), 400
+
+    date_from = parse_history_date(request.args.get('from', ''))
+    date_to = parse_history_date(request.args.get('to', ''))
+    if date_to:
+        date_to += timedelta(days=1)
+    tool = request.args.get('tool', '').strip() or None
+
+    chunks = export_chunks(export_lines(export_rows(user_id, date_from, date_to, tool), fmt), compress)
+    filename = f"scan_reports_{datetime.utcnow():%Y%m%d}.{fmt}" + ('.gz' if compress else '')
+    return Response(
+        stream_with_context(chunks),
+        mimetype='application/gzip' if compress else ('text/csv' if fmt == 'csv' else 'application/x-ndjson'),
+        headers={
+            'Content-Disposition': f'attachment; filename="{filename}"',
+            'X-Accel-Buffering': 'no'
+        }
+    )
+
+def report_summary(report):
+    return {
+        "id": report.id,
+        "tool_name": report.tool_name,
+        "input_data_summary": report.input_data_summary,
+        "risk_level": report.risk_level,
+        "main_finding": report.main_finding,
+        "scan_date": report.scan_date.isoformat(),
+        "url": url_for('view_report', report_id=report.id),
+    }
+
+@app.get('/api/search')
+@login_required
+def api_search():
+    """Full-text search of the user's reports; admins can pass scope=all to search every user's."""
+    q = request.args.get('q', '').strip()
+    if not q:
+        return jsonify({"ok": False, "error": "Missing search query (q).", "error_type": "ValidationError"}), 400
+    search_all = request.args.get('scope') == 'all'
+    if search_all and current_user.role != 'admin':
+        return jsonify({"ok": False, "error": "Only admins can search every user's reports.", "error_type": "Forbidden"}), 403
+
+    query = ScanReport.query.options(load_only(*HISTORY_COLUMNS)).filter(search_filter(q))
+    if search_all:
+        query = query.options(joinedload(ScanReport.author).load_only(User.username))
+    else:
+        query = query.filter(ScanReport.user_id == current_user.id)
+    reports, next_cursor = keyset_page(query, request.args)
+    results = []
+    for report in reports:
+        result = report_summary(report)
+        if search_all:
+            result["username"] = report.author.username
+            result.pop("url")  # view_report only serves the owner's reports
+        results.append(result)
+    return jsonify({
+        "ok": True,
+        "q": q,
+        "scope": "all" if search_all else "own",
+        "reports": results,
+        "next_cursor": next_cursor,
+        "next_url": url_for('api_search', **{**request.args.to_dict(), "cursor": next_cursor}) if next_cursor else None,
+    })
+
+@app.get('/api/stats')
+@login_required
+def api_stats():
+    days = min(max(request.args.get('days', STATS_DAYS, type=int), 1), 366)
+    return jsonify({"ok": True, **scan_stats(current_user.id, days=days)})
 
 @app.route('/report/<int:report_id>')
 @login_required
 def view_report(report_id):
-    report = ScanReport.query.filter_by(id=report_id, user_id=current_user.id).first_or_404()
+    report = ScanReport.query.filter_by(id=report_id, user_id=current_user.id).first()
+    if report is None:
+        # Older reports live in the archive files
+        archived = scan_archive.get(report_id, user_id=current_user.id)
+        if archived is None:
+            abort(404)
+        report = SimpleNamespace(**archived, archived=True)
     try:
-        report.report_data_json = json.loads(report.report_data) 
+        report.report_data_json = json.loads(
+            report.report_data if isinstance(report, SimpleNamespace) else report.full_report_data
+        )
     except json.JSONDecodeError:
         report.report_data_json = {"error": "Corrupt report data."}
     return render_template('full_report_viewer.html', report=report) 
@@ -335,32 +801,24 @@ def ai_core_page():
 
 
 # Helper function to run backend scripts
-def run_tool(command_list, cwd=None):
-    try:
-        completed = subprocess.run(
-            command_list,
-            cwd=cwd,
-            capture_output=True,
-            text=True,
-            timeout=120, 
-            check=True
-        )
-        return {
-            "ok": True,
-            "stdout": completed.stdout.strip(),
-            "stderr": completed.stderr.strip(),
-            "returncode": completed.returncode
-        }
-    except subprocess.CalledProcessError as e:
-        error_output = e.stderr.strip() or e.stdout.strip() or 'Unknown backend error.'
-        return {"ok": False, "error": f"Tool failed: {error_output}", "raw_stderr": e.stderr.strip()}
-    except subprocess.TimeoutExpired:
-        return {"ok": False, "error": "Tool timed out after 120s. Try a smaller file."}
-    except FileNotFoundError:
-        return {"ok": False, "error": "Backend script or Python interpreter not found."}
-    except Exception as e:
-        logging.error(f"Error running tool: {e}")
-        return {"ok": False, "error": f"OS Error: {str(e)}"}
+def run_tool(folder, tool_input, options=None, timeout=120, job=None):
+    """
+    Sends one request frame ({"input", "options"}, see backend/framing.py) to
+    the tool in backend/<folder> and returns its reply frame: {"ok": True,
+    "report": {...}} or {"ok": False, "error", "error_type", "stderr"}.
+    With a background `job` (jobs.JobContext) the tool's progress events are
+    recorded on it, and cancelling the job stops the tool.
+    """
+    message = {"input": tool_input, "options": options or {}}
+    progress = job.progress if job else None
+    cancelled = job.cancelled if job else None
+    # Prefer a warm worker for the tool folder: no interpreter/model start-up
+    pool = tool_workers.get_pool(folder)
+    if pool:
+        reply = pool.run(message, timeout=timeout, progress=progress, cancelled=cancelled)
+        if reply is not None:
+            return reply
+    return tool_workers.run_once(folder, message, timeout=timeout, progress=progress, cancelled=cancelled)
 
 
 # Tool page routes
@@ -408,11 +866,620 @@ tool_map = {
     'metadata-extractor': ('Metadata_Extractor', 'python main.py'),
 }
 
+tool_workers.configure({route: folder for route, (folder, _) in tool_map.items() if folder != 'internal'})
+
+# Trusted tools run in-process through backend/registry.py; the subprocess path stays as fallback
+IN_PROCESS_TOOLS = {
+    name.strip() for name in
+    os.getenv('IN_PROCESS_TOOLS', 'bughunter,network-analyzer,ueba-analyzer,fake-login-detector').split(',')
+    if name.strip()
+}
+
+# Host-wide per-tool concurrency caps with bounded wait queues (see admission.py)
+tool_admission = admission.AdmissionController(
+    os.path.join(STATE_FOLDER, 'admission'),
+    admission.parse_limits(os.getenv('TOOL_CONCURRENCY', 'deepfake-analyzer=2,adversarial-attack-shield=2')),
+    queue_limits=admission.parse_limits(os.getenv('TOOL_QUEUE_LIMITS')),
+    default_queue=int(os.getenv('TOOL_QUEUE_DEFAULT', 4)),
+    queue_timeout=int(os.getenv('TOOL_QUEUE_TIMEOUT', 30))
+)
+
+def overloaded_response(e):
+    response = jsonify({"ok": False, "error": str(e), "retry_after": e.retry_after})
+    response.headers['Retry-After'] = str(e.retry_after)
+    return response, 429
+
+def run_plugin(tool, tool_input):
+    """
+    Runs a trusted tool's analyze() in this process. Returns the report dict,
+    or None when the tool is not trusted or bails out, so the caller falls
+    back to run_tool().
+    """
+    if tool not in IN_PROCESS_TOOLS or not tool_input:
+        return None
+    try:
+        return backend_registry.analyze(tool, tool_input)
+    except SystemExit:
+        # Tools sys.exit(1) on missing model files; the subprocess path reports that to the user
+        return None
+    except Exception as e:
+        logging.error(f"In-process plugin {tool} failed, falling back to subprocess: {e}")
+        return None
+
+def execute_tool(tool, tool_input, options=None, job=None):
+    """
+    Runs a tool_map backend on one input and returns (report_json, error_json).
+    Trusted tools run in-process; the rest (or a plugin that bails out) get
+    the raw input and `options` (passed to the tool's analyze()) in a request
+    frame through run_tool(). Raises admission.Overloaded when the tool is at
+    its concurrency cap and its wait queue is full.
+    """
+    if not tool_input:
+        return None, {"ok": False, "error": "No input provided.", "error_type": "BadRequest"}
+    with tool_admission.admit(tool):
+        if job and job.cancelled():
+            # Cancelled while waiting for a slot
+            return None, {"ok": False, "error": "Scan cancelled.", "error_type": "Cancelled"}
+        return _execute_tool(tool, tool_input, options, job)
+
+def _execute_tool(tool, tool_input, options, job=None):
+    report_json = run_plugin(tool, tool_input)
+    if report_json is not None:
+        return report_json, None
+
+    folder, _ = tool_map[tool]
+    reply = run_tool(folder, tool_input, options, job=job)
+    if reply.get('ok'):
+        return reply['report'], None
+    if reply.get('error_type') == 'Busy':
+        # Every pooled worker stayed busy; the tool itself never ran
+        raise admission.Overloaded(tool, tool_admission.retry_after(tool))
+    return None, {
+        "ok": False,
+        "error": reply.get('error', 'Execution failed.'),
+        "error_type": reply.get('error_type'),
+        "raw_stderr": reply.get('stderr', '')
+    }
+
+
+# --- RESULT CACHE ---
+scan_cache = result_cache.ResultCache(
+    os.getenv('RESULT_CACHE_URL', 'sqlite:///' + os.path.join(STATE_FOLDER, 'result_cache.db')),
+    ttl_seconds=int(os.getenv('RESULT_CACHE_TTL_SECONDS', 3600)),
+    max_entries=int(os.getenv('RESULT_CACHE_MAX_ENTRIES', 10000))
+)
+
+def tool_cache_key(tool, canonical_input, mode=''):
+    """
+    Cache key for one scan; the fingerprint covers the tool's code and model
+    files (app.py for internal tools). None for tools that are never cached.
+    """
+    if tool in result_cache.UNCACHED_TOOLS:
+        return None
+    folder, _ = tool_map[tool]
+    if folder == 'internal':
+        model_fingerprint = result_cache.fingerprint(os.path.abspath(__file__))
+    else:
+        model_fingerprint = result_cache.fingerprint(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backend', folder))
+    return result_cache.make_key(tool, canonical_input, model_fingerprint, mode)
+
+scan_flights = single_flight.SingleFlight(os.path.join(STATE_FOLDER, 'locks'))
+
+def run_cached_tool(tool, cache_key, work):
+    """
+    Returns (report_json, error_json) for a backend scan. Concurrent identical
+    scans (same cache key) share one execution of work(), in this worker or
+    any other; only the leader runs the tool and fills the result cache.
+    """
+    def lead():
+        report_json, error_json = work()
+        if report_json:
+            scan_cache.set(cache_key, tool, report_json, numpy_json_default)
+        return report_json, error_json
+
+    def lookup():
+        report_json = scan_cache.get(cache_key)
+        return (report_json, None) if report_json is not None else None
+
+    (report_json, error_json), shared = scan_flights.do(cache_key, lead, lookup)
+    if shared and error_json and error_json.get('error_type') == 'Cancelled':
+        # The leader's job was cancelled, not ours
+        return work()
+    if shared and report_json is not None:
+        # Followers get their own copy: callers annotate the dict before saving it
+        report_json = dict(report_json, cached=True)
+    return report_json, error_json
+
+
+# --- REPORT PERSISTENCE HELPERS ---
+def numpy_json_default(o):
+    # numpy is only imported by the tools; if it is not loaded, o cannot be a numpy scalar
+    np = sys.modules.get('numpy')
+    if np is not None and isinstance(o, (np.float32, np.float64, np.int32, np.int64)):
+        return float(o)
+    return o.__dict__
+
+# --- SCAN STATISTICS (ROLLUPS) ---
+STATS_DAYS = 30
+RISK_BUCKETS = (
+    ('high', ('critical', 'high', 'phishing', 'malicious', 'suspicious', 'fake', 'danger', 'very weak', 'breach', 'compromised')),
+    ('medium', ('medium', 'moderate', 'warning', 'weak')),
+    ('low', ('low', 'safe', 'clean', 'strong', 'verified', 'benign', 'real', 'genuine')),
+)
+
+def normalize_risk(risk_level):
+    """Maps the tools' free-form risk labels onto high / medium / low / unknown."""
+    label = (risk_level or '').lower()
+    for bucket, words in RISK_BUCKETS:
+        if any(word in label for word in words):
+            return bucket
+    return 'unknown'
+
+def count_scan_stats(rows):
+    """{(user_id, tool_name, risk, day): [scan_count, last_scan_date]} for ScanReport column dicts."""
+    counts = {}
+    for row in rows:
+        key = (row['user_id'], row['tool_name'], normalize_risk(row.get('risk_level')), row['scan_date'].date())
+        entry = counts.setdefault(key, [0, row['scan_date']])
+        entry[0] += 1
+        entry[1] = max(entry[1], row['scan_date'])
+    return counts
+
+def upsert_scan_stats(counts):
+    """Adds the counts to the rollup rows, in the caller's transaction."""
+    if not counts:
+        return
+    table = ScanStat.__table__
+    values = [
+        {"user_id": user_id, "tool_name": tool_name, "risk": risk, "day": day,
+         "scan_count": scan_count, "last_scan_date": last_scan_date}
+        for (user_id, tool_name, risk, day), (scan_count, last_scan_date) in counts.items()
+    ]
+    dialect = db.engine.dialect.name
+    if dialect in ('postgresql', 'sqlite'):
+        insert = (postgresql if dialect == 'postgresql' else sqlite).insert(table).values(values)
+        db.session.execute(insert.on_conflict_do_update(
+            index_elements=[table.c.user_id, table.c.tool_name, table.c.risk, table.c.day],
+            set_={
+                "scan_count": table.c.scan_count + insert.excluded.scan_count,
+                "last_scan_date": case(
+                    (insert.excluded.last_scan_date > table.c.last_scan_date, insert.excluded.last_scan_date),
+                    else_=table.c.last_scan_date
+                ),
+            }
+        ))
+        return
+    # Databases without ON CONFLICT: update, then insert the keys that had no row yet
+    for value in values:
+        updated = db.session.execute(
+            table.update()
+            .where(table.c.user_id == value['user_id'], table.c.tool_name == value['tool_name'],
+                   table.c.risk == value['risk'], table.c.day == value['day'])
+            .values(
+                scan_count=table.c.scan_count + value['scan_count'],
+                last_scan_date=case(
+                    (table.c.last_scan_date < value['last_scan_date'], value['last_scan_date']),
+                    else_=table.c.last_scan_date
+                ),
+            )
+        )
+        if not updated.rowcount:
+            db.session.execute(table.insert(), [value])
+
+def scan_stats(user_id=None, days=STATS_DAYS):
+    """Dashboard totals from the rollups: per tool, per risk and per day (last `days` days); all users when user_id is None."""
+    query = db.session.query(
+        ScanStat.tool_name, ScanStat.risk, ScanStat.day,
+        func.sum(ScanStat.scan_count), func.max(ScanStat.last_scan_date)
+    )
+    if user_id is not None:
+        query = query.filter(ScanStat.user_id == user_id)
+    since = datetime.utcnow().date() - timedelta(days=days - 1)
+    by_tool, by_risk, by_day = {}, {}, {}
+    total, last_scan_date = 0, None
+    for tool_name, risk, day, scan_count, last in query.group_by(ScanStat.tool_name, ScanStat.risk, ScanStat.day):
+        scan_count = int(scan_count)
+        total += scan_count
+        by_tool[tool_name] = by_tool.get(tool_name, 0) + scan_count
+        by_risk[risk] = by_risk.get(risk, 0) + scan_count
+        if day >= since:
+            by_day[day.isoformat()] = by_day.get(day.isoformat(), 0) + scan_count
+        last_scan_date = max(last_scan_date, last) if last_scan_date else last
+    return {
+        "total": total,
+        "by_tool": dict(sorted(by_tool.items(), key=lambda item: -item[1])),
+        "by_risk": by_risk,
+        "by_day": dict(sorted(by_day.items())),
+        "last_scan_date": last_scan_date.isoformat() if last_scan_date else None,
+    }
+
+def archived_report_ids_in_db(batch_size=10000):
+    """Ids of reports both archived and still in scan_report (an archive run that died before deleting them)."""
+    newest = scan_archive.newest_scan_date()
+    if newest is None:
+        return set()
+    duplicates, after = set(), 0
+    while True:
+        # Only reports as old as the newest archived one can have been archived
+        report_ids = [
+            report_id for (report_id,) in db.session.query(ScanReport.id)
+            .filter(ScanReport.scan_date <= newest, ScanReport.id > after)
+            .order_by(ScanReport.id)
+            .limit(batch_size)
+        ]
+        if not report_ids:
+            return duplicates
+        duplicates |= scan_archive.archived_ids(report_ids)
+        after = report_ids[-1]
+
+def rebuild_scan_stats(batch_size=10000):
+    """
+    Recomputes every rollup row from scan_report and the archive index
+    (backfill, or repair after manual edits).
+    """
+    day = func.date(ScanReport.scan_date)
+    grouped = (
+        db.session.query(
+            ScanReport.user_id, ScanReport.tool_name, ScanReport.risk_level, day,
+            func.count(ScanReport.id), func.max(ScanReport.scan_date)
+        )
+        .group_by(ScanReport.user_id, ScanReport.tool_name, ScanReport.risk_level, day)
+        .execution_options(yield_per=batch_size)
+    )
+    duplicates = archived_report_ids_in_db(batch_size)
+    if duplicates:
+        # Counted from the archive below
+        grouped = grouped.filter(ScanReport.id.notin_(duplicates))
+    counts = {}
+
+    def add(user_id, tool_name, risk_level, scan_day, scan_count, last_scan_date):
+        if isinstance(scan_day, str):
+            scan_day = datetime.strptime(scan_day, '%Y-%m-%d').date()
+        if isinstance(last_scan_date, str):
+            last_scan_date = datetime.fromisoformat(last_scan_date)
+        entry = counts.setdefault((user_id, tool_name, normalize_risk(risk_level), scan_day), [0, last_scan_date])
+        entry[0] += scan_count
+        entry[1] = max(entry[1], last_scan_date)
+
+    for row in grouped:
+        add(*row)
+    for row in scan_archive.summary_counts():
+        add(*row)
+    ScanStat.query.delete()
+    keys = list(counts)
+    for start in range(0, len(keys), batch_size):
+        upsert_scan_stats({key: counts[key] for key in keys[start:start + batch_size]})
+    db.session.commit()
+    return len(counts)
+
+# --- FULL-TEXT SEARCH ---
+# Report fields searched besides the input summary and main finding
+SEARCH_REPORT_FIELDS = ('input_received', 'tool_prediction', 'advanced_report_details')
+SEARCH_TEXT_MAX_CHARS = 4000
+
+SQLITE_SEARCH_DDL = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS scan_report_fts USING fts5(search_text, content='scan_report', content_rowid='id')",
+    """CREATE TRIGGER IF NOT EXISTS scan_report_fts_insert AFTER INSERT ON scan_report BEGIN
+        INSERT INTO scan_report_fts(rowid, search_text) VALUES (new.id, new.search_text);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS scan_report_fts_delete AFTER DELETE ON scan_report BEGIN
+        INSERT INTO scan_report_fts(scan_report_fts, rowid, search_text) VALUES ('delete', old.id, old.search_text);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS scan_report_fts_update AFTER UPDATE OF search_text ON scan_report BEGIN
+        INSERT INTO scan_report_fts(scan_report_fts, rowid, search_text) VALUES ('delete', old.id, old.search_text);
+        INSERT INTO scan_report_fts(rowid, search_text) VALUES (new.id, new.search_text);
+    END""",
+)
+# A plain column kept by a trigger: adding a GENERATED ... STORED column would
+# rewrite the whole table under an ACCESS EXCLUSIVE lock during the release phase
+POSTGRES_SEARCH_DDL = (
+    "ALTER TABLE scan_report ADD COLUMN IF NOT EXISTS search_vector tsvector",
+    """CREATE OR REPLACE FUNCTION scan_report_search_vector() RETURNS trigger AS $$
+    BEGIN
+        NEW.search_vector := to_tsvector('simple', coalesce(NEW.search_text, ''));
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql""",
+    "DROP TRIGGER IF EXISTS scan_report_search_vector ON scan_report",
+    """CREATE TRIGGER scan_report_search_vector BEFORE INSERT OR UPDATE OF search_text ON scan_report
+        FOR EACH ROW EXECUTE FUNCTION scan_report_search_vector()""",
+)
+# Databases that ran the first version of migration 4 have a generated column;
+# dropping the expression keeps the stored values and does not rewrite the table
+POSTGRES_SEARCH_GENERATED = (
+    "SELECT 1 FROM information_schema.columns WHERE table_name = 'scan_report' "
+    "AND column_name = 'search_vector' AND is_generated = 'ALWAYS'"
+)
+POSTGRES_SEARCH_DROP_EXPRESSION = "ALTER TABLE scan_report ALTER COLUMN search_vector DROP EXPRESSION"
+POSTGRES_SEARCH_BACKFILL_UPTO = "SELECT max(id) FROM (SELECT id FROM scan_report WHERE id > :after ORDER BY id LIMIT :limit) batch"
+POSTGRES_SEARCH_BACKFILL = (
+    "UPDATE scan_report SET search_vector = to_tsvector('simple', search_text) "
+    "WHERE id > :after AND id <= :upto AND search_vector IS NULL AND search_text IS NOT NULL"
+)
+POSTGRES_SEARCH_BACKFILL_BATCH = 5000
+POSTGRES_SEARCH_INDEX = "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_scan_report_search ON scan_report USING GIN (search_vector)"
+
+def _collect_strings(value, parts):
+    if isinstance(value, str):
+        parts.append(value)
+    elif isinstance(value, dict):
+        for item in value.values():
+            _collect_strings(item, parts)
+    elif isinstance(value, (list, tuple)):
+        for item in value:
+            _collect_strings(item, parts)
+
+def build_search_text(input_summary, main_finding, report):
+    """The text a report is found by: its input, finding and the string values of SEARCH_REPORT_FIELDS."""
+    parts = [input_summary or '', main_finding or '']
+    if isinstance(report, dict):
+        for field in SEARCH_REPORT_FIELDS:
+            _collect_strings(report.get(field), parts)
+    return ' '.join(part for part in parts if part)[:SEARCH_TEXT_MAX_CHARS]
+
+def fts_query(q):
+    # Every word as a quoted FTS5 phrase: 'evil.com' matches the tokens evil, com in a row
+    return ' '.join('"' + term.replace('"', '""') + '"' for term in q.split())
+
+def search_filter(q):
+    """WHERE clause matching the ScanReport rows whose search_text contains every word of q."""
+    if db.engine.dialect.name == 'postgresql':
+        return db.literal_column('scan_report.search_vector').op('@@')(func.websearch_to_tsquery('simple', q))
+    if db.engine.dialect.name == 'sqlite':
+        return ScanReport.id.in_(
+            db.text("SELECT rowid FROM scan_report_fts WHERE scan_report_fts MATCH :fts_query")
+            .bindparams(fts_query=fts_query(q))
+            .columns(rowid=db.Integer)
+        )
+    # No inverted index elsewhere: a scan, but the same results
+    return db.and_(*(ScanReport.search_text.ilike(f"%{term}%") for term in q.split()))
+
+def ensure_search_index():
+    """Creates the dialect's full-text index over scan_report.search_text."""
+    new_fts_table = db.engine.dialect.name == 'sqlite' and not db.inspect(db.engine).has_table('scan_report_fts')
+    with db.engine.begin() as conn:
+        if db.engine.dialect.name == 'postgresql' and conn.execute(db.text(POSTGRES_SEARCH_GENERATED)).first():
+            conn.execute(db.text(POSTGRES_SEARCH_DROP_EXPRESSION))
+        statements = {'sqlite': SQLITE_SEARCH_DDL, 'postgresql': POSTGRES_SEARCH_DDL}.get(db.engine.dialect.name, ())
+        for statement in statements:
+            conn.execute(db.text(statement))
+        if new_fts_table:
+            # The triggers expect every existing row to be in the index already
+            conn.execute(db.text("INSERT INTO scan_report_fts(scan_report_fts) VALUES ('rebuild')"))
+    if db.engine.dialect.name == 'postgresql':
+        # Rows saved before the trigger existed, in id ranges with a short transaction each
+        after = 0
+        while True:
+            with db.engine.begin() as conn:
+                upto = conn.execute(db.text(POSTGRES_SEARCH_BACKFILL_UPTO),
+                                    {"after": after, "limit": POSTGRES_SEARCH_BACKFILL_BATCH}).scalar()
+                if upto is None:
+                    break
+                conn.execute(db.text(POSTGRES_SEARCH_BACKFILL), {"after": after, "upto": upto})
+            after = upto
+        migrations.run_outside_transaction(db.engine, POSTGRES_SEARCH_INDEX)
+
+def reindex_search(batch_size=500):
+    """Fills search_text for reports stored before search existed. Returns the number of rows updated."""
+    updated = 0
+    while True:
+        reports = (
+            ScanReport.query.options(load_only(ScanReport.id, ScanReport.input_data_summary, ScanReport.main_finding,
+                                               ScanReport.body_hash),
+                                     undefer(ScanReport.report_data), joinedload(ScanReport.body))
+            .filter(ScanReport.search_text.is_(None))
+            .order_by(ScanReport.id)
+            .limit(batch_size)
+            .all()
+        )
+        if not reports:
+            return updated
+        for report in reports:
+            try:
+                data = json.loads(report.full_report_data)
+            except json.JSONDecodeError:
+                data = None
+            report.search_text = build_search_text(report.input_data_summary, report.main_finding, data)
+        db.session.commit()
+        updated += len(reports)
+
+def insert_report_bodies(bodies):
+    """Stores the {hash: body} not in report_body yet, in the caller's transaction. Returns the rows written."""
+    table = ReportBody.__table__
+    existing = set(db.session.execute(db.select(table.c.hash).where(table.c.hash.in_(list(bodies)))).scalars())
+    created_at = datetime.utcnow()
+    values = [{"hash": key, "data": body, "created_at": created_at} for key, body in bodies.items() if key not in existing]
+    if not values:
+        return values
+    dialect = db.engine.dialect.name
+    if dialect in ('postgresql', 'sqlite'):
+        # A concurrent flush may store the same body in the meantime
+        db.session.execute((postgresql if dialect == 'postgresql' else sqlite).insert(table).values(values).on_conflict_do_nothing())
+    else:
+        db.session.execute(table.insert(), values)
+    return values
+
+def prepare_scan_report(row):
+    """The scan_report row for a queued report: body split off into report_body, search text filled in."""
+    row = dict(row)
+    if 'search_text' not in row:
+        # Spooled before search existed
+        try:
+            data = json.loads(row['report_data'])
+        except json.JSONDecodeError:
+            data = None
+        row['search_text'] = build_search_text(row['input_data_summary'], row['main_finding'], data)
+    split = split_report_data(row['report_data'])
+    body = None
+    if split:
+        body, row['body_hash'], row['report_data'] = split
+    else:
+        row['body_hash'] = None
+    return row, body
+
+def insert_scan_reports(rows):
+    """One multi-row INSERT of ScanReport column dicts (the write-behind writer's flush), plus bodies and rollups."""
+    # New dicts: on failure the writer spools the rows exactly as it queued them
+    prepared, bodies = [], {}
+    for row in rows:
+        row, body = prepare_scan_report(row)
+        prepared.append(row)
+        if body is not None:
+            bodies[row['body_hash']] = body
+    with app.app_context():
+        try:
+            if bodies:
+                insert_report_bodies(bodies)
+            db.session.execute(ScanReport.__table__.insert(), prepared)
+            upsert_scan_stats(count_scan_stats(rows))
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+# Reports are written behind the response, in batches (see report_writer.py)
+scan_report_writer = report_writer.ReportWriter(
+    insert_scan_reports,
+    os.getenv('REPORT_SPOOL_PATH', os.path.join(STATE_FOLDER, 'report_spool.ndjson')),
+    flush_rows=int(os.getenv('REPORT_FLUSH_ROWS', 200)),
+    flush_seconds=float(os.getenv('REPORT_FLUSH_SECONDS', 1.0)),
+    enabled=os.getenv('REPORT_WRITE_BEHIND', 'true').lower() == 'true'
+)
+
+# Reports older than REPORT_RETENTION_DAYS move to monthly archive files (see report_archive.py)
+REPORT_RETENTION_DAYS = int(os.getenv('REPORT_RETENTION_DAYS', 365))
+scan_archive = report_archive.ReportArchive(
+    os.getenv('REPORT_ARCHIVE_FOLDER', os.path.join(STATE_FOLDER, 'report_archive'))
+)
+
+def archive_old_reports(older_than_days=REPORT_RETENTION_DAYS, batch_size=1000):
+    """Moves reports older than `older_than_days` from the database to the archive, a batch at a time."""
+    cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+    archived = 0
+    while True:
+        reports = (
+            ScanReport.query.options(undefer(ScanReport.report_data), joinedload(ScanReport.body))
+            .filter(ScanReport.scan_date < cutoff)
+            .order_by(ScanReport.scan_date, ScanReport.id)
+            .limit(batch_size)
+            .all()
+        )
+        if not reports:
+            break
+        scan_archive.append([
+            {
+                **{column.name: getattr(report, column.name) for column in ScanReport.__table__.columns
+                   if column.name not in ('search_text', 'body_hash')},
+                "report_data": report.full_report_data,
+            }
+            for report in reports
+        ])
+        # Only deleted once the archive holds them; rollups keep counting them
+        ScanReport.query.filter(ScanReport.id.in_([report.id for report in reports])).delete(synchronize_session=False)
+        db.session.commit()
+        archived += len(reports)
+    return archived
+
+def save_scan_report(user_id, tool, input_summary, report_json):
+    """Queues one successful scan as a ScanReport row; it reaches the database within REPORT_FLUSH_SECONDS."""
+    try:
+        scan_report_writer.submit({
+            "user_id": user_id,
+            "tool_name": report_json.get('tool', tool),
+            "input_data_summary": input_summary,
+            "risk_level": report_json.get('risk_level', 'N/A'),
+            "main_finding": report_json.get('main_finding', 'Analysis saved.'),
+            "report_data": json.dumps(report_json, default=numpy_json_default),
+            "search_text": build_search_text(
+                input_summary, report_json.get('main_finding', 'Analysis saved.'), report_json
+            ),
+            "scan_date": datetime.utcnow(),
+        })
+    except Exception as e:
+        logging.error(f"FATAL DB LOGGING ERROR for tool {tool}: {e}")
+
+def save_scan_reports_bulk(user_id, tool, inputs, reports):
+    """Queues the successful scans of a batch for the write-behind writer. Returns the number of rows queued."""
+    scan_date = datetime.utcnow()
+    rows = [
+        {
+            "user_id": user_id,
+            "tool_name": report.get('tool', tool),
+            "input_data_summary": tool_input[:100] if tool_input else "N/A",
+            "risk_level": report.get('risk_level', 'N/A'),
+            "main_finding": report.get('main_finding', 'Analysis saved.'),
+            "report_data": json.dumps(report, default=numpy_json_default),
+            "search_text": build_search_text(
+                tool_input[:100] if tool_input else "N/A", report.get('main_finding', 'Analysis saved.'), report
+            ),
+            "scan_date": scan_date,
+        }
+        for tool_input, report in zip(inputs, reports) if report.get('ok')
+    ]
+    scan_report_writer.submit(*rows)
+    return len(rows)
+
+
+# --- BACKGROUND JOBS FOR FILE UPLOADS ---
+JOB_WORKERS = int(os.getenv('JOB_WORKERS', 2))
+JOB_MAX_WAIT_SECONDS = 25
+
+job_store = jobs.JobStore(os.path.join(STATE_FOLDER, 'jobs.db'), max_workers=JOB_WORKERS)
+
+def upload_cache_input(upload, filename, user_id):
+    """
+    Canonical cache input for an uploaded file. File reports echo the file's
+    name and path, so a cached report is only reused for the same user
+    uploading the same bytes under the same name.
+    """
+    return f"user:{user_id}:sha256:{upload['sha256']}:{filename}"
+
+def run_upload_job(job, tool, absolute_filepath, upload, user_id):
+    """
+    Background half of api_file_upload: runs the tool, deletes the upload, saves the report.
+    `upload` holds the sha256 and content_type computed while the file was received;
+    they are passed to the tool's analyze() as options.
+    """
+    upload_dir, filename = os.path.split(absolute_filepath)
+    error_json = None
+    try:
+        if job.cancelled():
+            return {"ok": False, "error": "Scan cancelled before it started.", "error_type": "Cancelled"}
+        cache_key = tool_cache_key(tool, upload_cache_input(upload, filename, user_id))
+        final_report_json = scan_cache.get(cache_key)
+        if final_report_json is not None:
+            final_report_json['cached'] = True
+        else:
+            final_report_json, error_json = run_cached_tool(
+                tool, cache_key, lambda: execute_tool(tool, absolute_filepath, options=upload, job=job)
+            )
+    except admission.Overloaded as e:
+        return {"ok": False, "error": str(e), "retry_after": e.retry_after}
+    finally:
+        shutil.rmtree(upload_dir, ignore_errors=True)
+
+    if error_json:
+        return error_json
+
+    if final_report_json.get('ok'):
+        save_scan_report(user_id, tool, f"File: {filename}", final_report_json)
+    return final_report_json
+
 
 # --- API ROUTE FOR FILE UPLOADS ---
 @app.route('/api/upload_file/<tool>', methods=['POST'])
 @login_required
 def api_file_upload(tool):
+    # Checked before touching request.files, which is what streams the upload to disk
+    folder, command = tool_map.get(tool, (None, None))
+    if folder == 'internal':
+        return jsonify({"ok": False, "error": "This file tool is not configured correctly."}), 400
+    if not folder:
+        return jsonify({"ok": False, "error": "Unknown processing error."}), 500
+    if not tool_admission.has_capacity(tool):
+        # Reject before receiving the file: the job would only wait and then fail
+        return overloaded_response(admission.Overloaded(tool, tool_admission.retry_after(tool)))
+
     if 'file' not in request.files:
         return jsonify({"ok": False, "error": "No file part in the request."}), 400
     
@@ -422,69 +1489,204 @@ def api_file_upload(tool):
         return jsonify({"ok": False, "error": "No file selected for uploading."}), 400
     
     if file and allowed_file(file.filename):
-        filename = secure_filename(file.filename)
-        filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-        
-        os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
-        
+        # Already on disk in its own directory, hashed and sniffed in the same pass (uploads.IngestFile)
+        ingest = file.stream
+        filename = ingest.filename
+        upload = {
+            "sha256": ingest.sha256,
+            "content_type": ingest.content_type or 'application/octet-stream',
+        }
+        absolute_filepath = ingest.claim()
+
+        user_id = current_user.id
+        job_id = job_store.submit(
+            user_id, tool, f"File: {filename}",
+            lambda job: run_upload_job(job, tool, absolute_filepath, upload, user_id)
+        )
+        return jsonify({
+            "ok": True,
+            "job_id": job_id,
+            "status": jobs.QUEUED,
+            "status_url": url_for('api_job_status', job_id=job_id),
+            "events_url": url_for('api_job_events', job_id=job_id),
+            "cancel_url": url_for('api_job_cancel', job_id=job_id)
+        }), 202
+
+    return jsonify({"ok": False, "error": "File type not allowed."}), 400
+
+
+@app.get('/api/jobs/<job_id>')
+@login_required
+def api_job_status(job_id):
+    # ?wait=N long-polls for up to N seconds (capped) instead of returning immediately
+    wait = min(max(request.args.get('wait', 0, type=float), 0), JOB_MAX_WAIT_SECONDS)
+    if wait:
+        job = job_store.wait(job_id, current_user.id, wait)
+    else:
+        job = job_store.get(job_id, current_user.id)
+    if job is None:
+        return jsonify({"ok": False, "error": "Job not found."}), 404
+    return jsonify(job)
+
+
+@app.get('/api/jobs/<job_id>/events')
+@login_required
+def api_job_events(job_id):
+    """
+    Server-Sent Events stream of a job: `progress` events as the tool reports
+    them, `status` when the job changes state and a final `done` with the
+    whole job. Like ?wait=, a stream holds its worker for at most
+    JOB_MAX_WAIT_SECONDS; EventSource then reconnects with Last-Event-ID.
+    """
+    user_id = current_user.id
+    if job_store.get(job_id, user_id) is None:
+        return jsonify({"ok": False, "error": "Job not found."}), 404
+    after = request.headers.get('Last-Event-ID', type=int) or request.args.get('after', 0, type=int)
+
+    def generate():
+        yield "retry: 1000\n\n"
+        for event, seq, data in job_store.stream(job_id, user_id, after, max_seconds=JOB_MAX_WAIT_SECONDS):
+            event_id = f"id: {seq}\n" if seq is not None else ""
+            yield f"{event_id}event: {event}\ndata: {json.dumps(data, default=numpy_json_default)}\n\n"
+
+    return Response(stream_with_context(generate()), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+
+@app.post('/api/jobs/<job_id>/cancel')
+@login_required
+def api_job_cancel(job_id):
+    """Stops a queued or running job; the tool process is killed and its slot freed."""
+    job = job_store.cancel(job_id, current_user.id)
+    if job is None:
+        return jsonify({"ok": False, "error": "Job not found."}), 404
+    return jsonify(job)
+
+
+@app.get('/metrics/tools')
+def tool_metrics():
+    """
+    Per-tool in-flight / queued gauges for autoscaling. Readable with
+    `Authorization: Bearer <METRICS_TOKEN>` or by a logged-in admin; without
+    METRICS_TOKEN only admins can read it.
+    """
+    token = os.getenv('METRICS_TOKEN')
+    presented = request.headers.get('Authorization', '')
+    token_ok = bool(token) and hmac.compare_digest(presented.encode(), f"Bearer {token}".encode())
+    if not token_ok and not (current_user.is_authenticated and current_user.role == 'admin'):
+        abort(401)
+    return jsonify({
+        "ok": True,
+        "tools": tool_admission.gauges(),
+        "models": model_registry.stats_report(),
+        "report_writer": scan_report_writer.stats(),
+        "report_archive": scan_archive.stats()
+    })
+
+
+# --- BATCH SCORING FOR THE ML-BACKED TOOLS ---
+BATCH_MAX_ITEMS = int(os.getenv('BATCH_MAX_ITEMS', 100000))
+BATCH_CHUNK_SIZE = int(os.getenv('BATCH_CHUNK_SIZE', 10000))
+
+def read_batch_inputs():
+    """
+    Yields the raw inputs of a batch request: a JSON array (or {"inputs": [...]}),
+    or NDJSON from an uploaded `file` / an application/x-ndjson body. NDJSON
+    lines may be JSON strings, {"input": ...} objects or plain text (e.g. a proxy log of URLs).
+    """
+    if 'file' in request.files:
+        lines = request.files['file'].stream
+    elif request.mimetype == 'application/x-ndjson':
+        lines = request.stream
+    else:
+        data = request.get_json(silent=True)
+        if isinstance(data, dict):
+            data = data.get('inputs')
+        if not isinstance(data, list):
+            raise ValueError('Send a JSON array of inputs, {"inputs": [...]}, or NDJSON.')
+        for item in data:
+            yield str(item.get('input', '')) if isinstance(item, dict) else str(item)
+        return
+
+    for raw_line in lines:
+        line = raw_line.decode('utf-8', errors='replace').strip() if isinstance(raw_line, bytes) else raw_line.strip()
+        if not line:
+            continue
         try:
-            file.save(filepath)
-        except Exception as e:
-            return jsonify({"ok": False, "error": f"Failed to save file: {str(e)}"}), 500
-        
-        absolute_filepath = os.path.abspath(filepath)
-        folder, command = tool_map.get(tool, (None, None))
-        final_report_json = None
-        
-        if folder and folder != 'internal': 
-            backend_base = os.path.join(os.path.dirname(__file__), 'backend')
-            PYTHON_EXECUTABLE = 'python' 
-            cwd = os.path.join(backend_base, folder)
-            parts = shlex.split(command) 
-            command_list = [PYTHON_EXECUTABLE] + parts[1:]
-            command_list.append(absolute_filepath)
-            
-            result_dict = run_tool(command_list, cwd=cwd)
+            item = json.loads(line)
+        except json.JSONDecodeError:
+            item = line
+        yield str(item.get('input', '')) if isinstance(item, dict) else str(item)
+
+
+def score_batch(tool, analyze_batch, chunk):
+    """
+    Scores one chunk while holding one of the tool's admission slots (raises
+    admission.Overloaded). A tool that sys.exit()s - missing model files,
+    input it cannot process - raises RuntimeError; the reason it printed stays
+    in the server's stderr log.
+    """
+    if not chunk:
+        return []
+    with tool_admission.admit(tool):
+        try:
+            return analyze_batch(chunk)
+        except SystemExit as e:
+            logging.error(f"❌ {tool} exited while scoring a batch (exit code {e.code}); see its stderr output above.")
+            reason = e.code if isinstance(e.code, str) else f"{tool} exited while scoring."
+            raise RuntimeError(reason)
 
-            try:
-                os.remove(absolute_filepath) 
-            except OSError as e:
-                logging.error(f"Error deleting file {absolute_filepath}: {e}")
-
-            if result_dict.get('ok') and result_dict.get('stdout'):
-                try:
-                    final_report_json = json.loads(result_dict['stdout'])
-                except json.JSONDecodeError:
-                    return jsonify({"ok": False, "error": "Backend script returned invalid JSON.", "raw_output": result_dict.get('stdout')}), 500
-            else:
-                return jsonify({"ok": False, "error": result_dict.get('error', 'Execution failed.'), "raw_stderr": result_dict.get('raw_stderr', '')}), 500
-        
-        elif folder == 'internal':
-            return jsonify({"ok": False, "error": "This file tool is not configured correctly."}), 400
 
-        if final_report_json and final_report_json.get('ok') and current_user.is_authenticated:
+@app.post('/api/batch/<tool>')
+@login_required
+def api_batch(tool):
+    try:
+        analyze_batch = backend_registry.get_batch_analyzer(tool)
+    except ImportError as e:
+        logging.error(f"❌ Batch plugin {tool} could not be loaded: {e}")
+        return jsonify({"ok": False, "error": f"Batch scoring for '{tool}' is unavailable: {e}"}), 503
+    if analyze_batch is None:
+        return jsonify({"ok": False, "error": f"Batch scoring is not available for '{tool}'."}), 404
+
+    persist = request.args.get('persist', '').lower() in ('1', 'true', 'yes')
+    user_id = current_user.id
+    inputs = read_batch_inputs()
+
+    # Score the first chunk up front so bad input or missing models still get a proper status code
+    try:
+        first_chunk = list(itertools.islice(inputs, min(BATCH_CHUNK_SIZE, BATCH_MAX_ITEMS)))
+        first_reports = score_batch(tool, analyze_batch, first_chunk)
+    except ValueError as e:
+        return jsonify({"ok": False, "error": str(e)}), 400
+    except admission.Overloaded as e:
+        return overloaded_response(e)
+    except RuntimeError as e:
+        return jsonify({"ok": False, "error": f"Tool failed: {e}"}), 500
+
+    def generate():
+        index = 0
+        chunk, reports = first_chunk, first_reports
+        while chunk:
+            if persist:
+                save_scan_reports_bulk(user_id, tool, chunk, reports)
+            for report in reports:
+                yield json.dumps({"index": index, **report}, default=numpy_json_default) + '\n'
+                index += 1
+
+            if index >= BATCH_MAX_ITEMS:
+                if next(inputs, None) is not None:
+                    yield json.dumps({"ok": False, "error": f"Batch truncated at {BATCH_MAX_ITEMS} inputs."}) + '\n'
+                break
             try:
-                report_data_str = json.dumps(final_report_json, default=lambda o: float(o) if isinstance(o, (np.float32, np.float64, np.int32, np.int64)) else o.__dict__)
-                new_report = ScanReport(
-                    user_id=current_user.id,
-                    tool_name=final_report_json.get('tool', tool),
-                    input_data_summary=f"File: {filename}",
-                    risk_level=final_report_json.get('risk_level', 'N/A'),
-                    main_finding=final_report_json.get('main_finding', 'Analysis saved.'),
-                    report_data=report_data_str
-                )
-                db.session.add(new_report)
-                db.session.commit()
+                chunk = list(itertools.islice(inputs, min(BATCH_CHUNK_SIZE, BATCH_MAX_ITEMS - index)))
+                reports = score_batch(tool, analyze_batch, chunk)
             except Exception as e:
-                db.session.rollback()
-                logging.error(f"FATAL DB LOGGING ERROR for file tool {tool}: {e}")
-
-        if final_report_json:
-            return jsonify(final_report_json)
-        else:
-            return jsonify({"ok": False, "error": "Unknown processing error."}), 500
+                yield json.dumps({"ok": False, "error": f"Batch aborted after {index} inputs: {e}"}) + '\n'
+                break
 
-    return jsonify({"ok": False, "error": "File type not allowed."}), 400
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
 
 
 # --- API ROUTE FOR TEXT/JSON INPUTS ---
@@ -497,9 +1699,15 @@ def api_tool(tool):
     
     final_report_json = None
     folder, command = tool_map.get(tool, (None, None))
-    backend_base = os.path.join(os.path.dirname(__file__), 'backend')
+
+    cache_key = tool_cache_key(tool, result_cache.canonicalize(tool, user_input), user_mode) if folder and user_input else None
+    cached_report = scan_cache.get(cache_key)
     
-    if folder == 'internal':
+    if cached_report is not None:
+        final_report_json = cached_report
+        final_report_json['cached'] = True
+
+    elif folder == 'internal':
         if command == 'password':
             if not user_input:
                 final_report_json = {
@@ -611,59 +1819,251 @@ def api_tool(tool):
         
         if final_report_json and not final_report_json.get('ok'):
             return jsonify(final_report_json), 400
+
+        scan_cache.set(cache_key, tool, final_report_json, numpy_json_default)
         
     elif folder and command:
-        PYTHON_EXECUTABLE = 'python' 
-        cwd = os.path.join(backend_base, folder)
-        parts = shlex.split(command) 
-        command_list = [PYTHON_EXECUTABLE] + parts[1:]
-        
-        if user_input:
-            quoted_input = shlex.quote(user_input)
-            command_list.append(quoted_input)
-            
-        result_dict = run_tool(command_list, cwd=cwd)
-
-        if result_dict.get('ok') and result_dict.get('stdout'):
-            try:
-                final_report_json = json.loads(result_dict['stdout'])
-            except json.JSONDecodeError:
-                return jsonify({"ok": False, "error": "Backend script returned invalid JSON.", "raw_output": result_dict.get('stdout')}), 500
-        else:
-            return jsonify({"ok": False, "error": result_dict.get('error', 'Execution failed.'), "raw_stderr": result_dict.get('raw_stderr', '')}), 500
+        try:
+            if cache_key:
+                final_report_json, error_json = run_cached_tool(tool, cache_key, lambda: execute_tool(tool, user_input))
+            else:
+                final_report_json, error_json = execute_tool(tool, user_input)
+        except admission.Overloaded as e:
+            return overloaded_response(e)
+        if error_json:
+            return jsonify(error_json), 400 if error_json.get('error_type') == 'BadRequest' else 500
         
     else:
         final_report_json = {"ok": True, "tool": tool, "main_finding": "No server-side processing required for this tool."}
 
     # --- Database Persistence ---
     if final_report_json and final_report_json.get('ok') and current_user.is_authenticated:
-        try:
-            report_data_str = json.dumps(final_report_json, default=lambda o: float(o) if isinstance(o, (np.float32, np.float64, np.int32, np.int64)) else o.__dict__)
-            new_report = ScanReport(
-                user_id=current_user.id,
-                tool_name=final_report_json.get('tool', tool),
-                input_data_summary=user_input[:100] if user_input else "N/A",
-                risk_level=final_report_json.get('risk_level', 'N/A'),
-                main_finding=final_report_json.get('main_finding', 'Analysis saved.'),
-                report_data=report_data_str
-            )
-            db.session.add(new_report)
-            db.session.commit()
-        except Exception as e:
-            db.session.rollback()
-            logging.error(f"FATAL DB LOGGING ERROR for tool {tool}: {e}")
+        save_scan_report(current_user.id, tool, user_input[:100] if user_input else "N/A", final_report_json)
 
     return jsonify(final_report_json)
 
 
 # --- INITIALIZATION ---
-with app.app_context():
-    db.create_all()
+# Schema changes are not made at import time: deployments run `flask --app app init-db`
+# once (see Procfile), and AUTO_INIT_DB makes each worker do it on its first request
+AUTO_INIT_DB = os.getenv('AUTO_INIT_DB', 'true').lower() == 'true'
+SCHEMA_DRIFT_CHECK = os.getenv('SCHEMA_DRIFT_CHECK', 'true').lower() == 'true'
+_db_initialized = False
+
+def convert_compressed_columns(engine):
+    """
+    Postgres tables created before compression keep report_data as TEXT, which
+    rejects the bytea CompressedText binds: ALTERs such columns to BYTEA, the
+    plain-text values staying readable until `compress-reports` gzips them.
+    """
+    if engine.dialect.name != 'postgresql':
+        return
+    inspector = inspect(engine)
+    preparer = engine.dialect.identifier_preparer
+    with engine.begin() as conn:
+        for table in db.metadata.sorted_tables:
+            live_types = {column['name']: column['type'] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                live_type = live_types.get(column.name)
+                if isinstance(column.type, CompressedText) and live_type is not None and not isinstance(live_type, db.LargeBinary):
+                    name = preparer.format_column(column)
+                    conn.execute(db.text(
+                        f"ALTER TABLE {preparer.format_table(table)} ALTER COLUMN {name} TYPE BYTEA USING convert_to({name}, 'UTF8')"
+                    ))
+
+# Append new versions; never edit one that has shipped (see migrations.py).
+# Each step is idempotent, so databases made by the old init-db adopt them as they are.
+SCHEMA_MIGRATIONS = (
+    (1, "create tables", lambda engine: db.create_all()),
+    (2, "add columns missing from tables created before them", lambda engine: migrations.add_missing_columns(engine, db.metadata)),
+    # The keyset, rollup and report body indexes, plus the user_id / scan_date /
+    # tool_name / risk_level / role indexes supabase_schema.sql meant for these tables
+    (3, "create model indexes", lambda engine: migrations.create_indexes(engine, db.metadata)),
+    (4, "full-text search index", lambda engine: ensure_search_index()),
+    (5, "store compressed columns as BYTEA", convert_compressed_columns),
+    # Turns the generated search_vector an earlier migration 4 created into a trigger-kept column
+    (6, "maintain search_vector with a trigger", lambda engine: ensure_search_index()),
+    # e.g. scan_report.body_hash -> report_body, which migration 2 added as a bare column
+    (7, "add foreign keys missing from tables created before them", lambda engine: migrations.add_missing_foreign_keys(engine, db.metadata)),
+)
+# Created by migrations 4 and 6 on Postgres, not mapped
+SCHEMA_EXTRA_COLUMNS = ('scan_report.search_vector',)
+
+def init_db():
+    with app.app_context():
+        migrations.migrate(db.engine, SCHEMA_MIGRATIONS)
+        # e.g. a scan_stats_daily created by an older supabase_schema.sql, tied to users(id)
+        migrations.check_foreign_keys(db.engine, db.metadata)
+
+@app.cli.command('init-db')
+def init_db_command():
+    """Creates the database tables and applies the pending schema migrations."""
+    init_db()
+    print("✅ Database schema is up to date.")
+
+@app.cli.command('db-status')
+def db_status_command():
+    """Lists the applied migrations and any drift between the models and the database."""
+    with app.app_context():
+        done = migrations.applied_versions(db.engine)
+        for version, name, _ in SCHEMA_MIGRATIONS:
+            print(f"{'✅' if version in done else '⏳'} {version}: {name}")
+        problems = migrations.drift(db.engine, db.metadata, SCHEMA_MIGRATIONS, SCHEMA_EXTRA_COLUMNS)
+    for problem in problems:
+        print(f"⚠️ {problem}")
+    print("✅ No schema drift." if not problems else f"⚠️ {len(problems)} difference(s) from the models.")
+
+@app.cli.command('replay-reports')
+def replay_reports_command():
+    """Inserts the ScanReport rows spooled while the database was unreachable."""
+    print(f"✅ Replayed {scan_report_writer.replay()} spooled report(s); {scan_report_writer.spooled_bytes()} bytes left.")
+
+@app.cli.command('compress-reports')
+@click.option('--batch-size', default=500, show_default=True)
+def compress_reports_command(batch_size):
+    """Gzips the report_data of ScanReport rows stored before it was compressed."""
+    table = ScanReport.__tablename__
+    # The column itself becomes BYTEA in migration 5
+    init_db()
+    with app.app_context():
+        # Raw SQL, so values come back as stored rather than through CompressedText
+        after, rows_seen, compressed, before_bytes, after_bytes = 0, 0, 0, 0, 0
+        while True:
+            batch = db.session.execute(db.text(
+                f"SELECT id, report_data FROM {table} WHERE id > :after ORDER BY id LIMIT :limit"
+            ), {"after": after, "limit": batch_size}).all()
+            if not batch:
+                break
+            updates = []
+            for report_id, raw in batch:
+                raw = raw.encode('utf-8') if isinstance(raw, str) else bytes(raw)
+                if raw.startswith(GZIP_MAGIC):
+                    before_bytes += len(raw)
+                    after_bytes += len(raw)
+                    continue
+                data = gzip.compress(raw, compresslevel=6, mtime=0)
+                before_bytes += len(raw)
+                after_bytes += len(data)
+                updates.append({"id": report_id, "data": data})
+            if updates:
+                db.session.execute(db.text(f"UPDATE {table} SET report_data = :data WHERE id = :id"), updates)
+                db.session.commit()
+            rows_seen += len(batch)
+            compressed += len(updates)
+            after = batch[-1][0]
+
+    saved = before_bytes - after_bytes
+    ratio = f"{100 * saved / before_bytes:.1f}%" if before_bytes else "0%"
+    print(f"✅ Compressed {compressed} of {rows_seen} report(s): {before_bytes} -> {after_bytes} bytes ({ratio} saved).")
+
+@app.cli.command('rebuild-stats')
+def rebuild_stats_command():
+    """Recomputes the scan_stats_daily rollups from the scan reports, archived ones included."""
+    with app.app_context():
+        print(f"✅ Rebuilt {rebuild_scan_stats()} scan statistics row(s).")
+
+@app.cli.command('archive-reports')
+@click.option('--older-than-days', default=REPORT_RETENTION_DAYS, show_default=True)
+@click.option('--batch-size', default=1000, show_default=True)
+def archive_reports_command(older_than_days, batch_size):
+    """Moves old scan reports out of the database into the monthly archive files."""
+    with app.app_context():
+        archived = archive_old_reports(older_than_days, batch_size)
+    stats = scan_archive.stats()
+    print(f"✅ Archived {archived} report(s); the archive holds {stats['reports']} in {stats['files']} file(s), {stats['bytes']} bytes.")
+
+@app.cli.command('reindex-search')
+@click.option('--batch-size', default=500, show_default=True)
+def reindex_search_command(batch_size):
+    """Builds the search text of reports saved before full-text search existed."""
+    with app.app_context():
+        ensure_search_index()
+        print(f"✅ Indexed {reindex_search(batch_size)} report(s) for search.")
+
+@app.cli.command('dedupe-reports')
+@click.option('--batch-size', default=500, show_default=True)
+def dedupe_reports_command(batch_size):
+    """Moves the bodies of reports stored before deduplication into report_body."""
+    rows_seen, deduped, new_bodies, before_bytes, after_bytes = 0, 0, 0, 0, 0
+    with app.app_context():
+        after = 0
+        while True:
+            reports = (
+                ScanReport.query.options(load_only(ScanReport.id, ScanReport.body_hash), undefer(ScanReport.report_data))
+                .filter(ScanReport.id > after, ScanReport.body_hash.is_(None))
+                .order_by(ScanReport.id)
+                .limit(batch_size)
+                .all()
+            )
+            if not reports:
+                break
+            bodies, splits = {}, []
+            for report in reports:
+                before_bytes += len(report.report_data)
+                split = split_report_data(report.report_data)
+                if split is None:
+                    after_bytes += len(report.report_data)
+                    continue
+                body, body_hash, per_scan = split
+                bodies[body_hash] = body
+                splits.append((report, body_hash, per_scan))
+            # Bodies first: changing the reports before would let the query in
+            # insert_report_bodies autoflush body_hash values with no report_body row yet
+            stored = insert_report_bodies(bodies) if bodies else []
+            for report, body_hash, per_scan in splits:
+                report.body_hash, report.report_data = body_hash, per_scan
+                after_bytes += len(per_scan)
+                deduped += 1
+            new_bodies += len(stored)
+            after_bytes += sum(len(value['data']) for value in stored)
+            db.session.commit()
+            rows_seen += len(reports)
+            after = reports[-1].id
+    saved = before_bytes - after_bytes
+    ratio = f"{100 * saved / before_bytes:.1f}%" if before_bytes else "0%"
+    print(
+        f"✅ Deduplicated {deduped} of {rows_seen} report(s) into {new_bodies} new bodies: "
+        f"{before_bytes} -> {after_bytes} bytes of JSON before compression ({ratio} saved)."
+    )
+
+@app.cli.command('gc-report-bodies')
+def gc_report_bodies_command():
+    """Deletes report bodies no scan report points at any more (after archiving or deleting users)."""
+    with app.app_context():
+        referenced = db.select(ScanReport.body_hash).where(ScanReport.body_hash == ReportBody.hash).exists()
+        deleted = ReportBody.query.filter(~referenced).delete(synchronize_session=False)
+        db.session.commit()
+    print(f"✅ Deleted {deleted} unreferenced report bodies.")
+
+@app.cli.command('import-report')
+def import_report_command():
+    """Shows what importing app.py spends, per module."""
+    import import_report
+    print(import_report.report())
+
+@app.before_request
+def ensure_db_initialized():
+    global _db_initialized
+    if not _db_initialized:
+        if AUTO_INIT_DB:
+            init_db()
+        if SCHEMA_DRIFT_CHECK:
+            # Once per process: says so in the logs when a deploy skipped init-db
+            migrations.log_drift(db.engine, db.metadata, SCHEMA_MIGRATIONS, SCHEMA_EXTRA_COLUMNS)
+        _db_initialized = True
+
+if os.getenv('PRELOAD_MODELS', 'false').lower() == 'true':
+    # Load every model artifact (and the in-process plugins) before gunicorn forks,
+    # so the workers share those pages copy-on-write
+    for plugin_tool in IN_PROCESS_TOOLS:
+        backend_registry.get_plugin(plugin_tool)
+    model_registry.preload()
 
 if not os.path.exists(UPLOAD_FOLDER):
     os.makedirs(UPLOAD_FOLDER)
 
 # --- RUN BLOCK ---
 if __name__ == '__main__': 
+    init_db()
     port = int(os.environ.get("PORT", 5000))
     app.run(host='0.0.0.0', port=port, debug=False)
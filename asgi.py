@@ -0,0 +1,339 @@
+"""
+ASGI Entry Point for AI CyberShield Matrix: asyncio serving mode for the tool API.
+
+    uvicorn asgi:application --host 0.0.0.0 --port $PORT --workers 2
+
+Under gunicorn sync workers every pending scan holds a whole worker (or a job
+thread) while the tool runs. Here the two scan endpoints are served on the
+event loop instead:
+
+    POST /api/<tool>                backend tools (not the internal or in-process ones)
+    POST /api/upload_file/<tool>    uploads; the job runs as an asyncio task
+
+They talk to the same tool worker processes and frames (tool_workers.py)
+through asyncio pipes and use the async variants of admission control,
+single-flight and the job store, so a pending scan costs a file descriptor,
+not a thread. Short blocking steps (session/user lookup, model fingerprints,
+cache reads and writes, job table reads and writes, queueing the ScanReport)
+run on the default thread pool.
+
+Every other request - pages, login, history, job polling and event streams,
+batch scoring, the internal tools - goes to the unchanged Flask app through
+a2wsgi's WSGI adapter, on a pool of ASGI_FLASK_THREADS threads (default 16).
+"""
+import io
+import os
+import re
+import json
+import shutil
+import asyncio
+import logging
+
+from a2wsgi import WSGIMiddleware
+from flask_login import current_user
+from werkzeug.exceptions import RequestEntityTooLarge
+from werkzeug.http import parse_options_header
+
+import app as web
+import admission
+import jobs
+import result_cache
+import tool_workers
+import uploads
+
+TOOL_ROUTE = re.compile(r'^/api/(?P<tool>[^/]+)$')
+UPLOAD_ROUTE = re.compile(r'^/api/upload_file/(?P<tool>[^/]+)$')
+
+flask_asgi = WSGIMiddleware(web.app, workers=int(os.getenv('ASGI_FLASK_THREADS', 16)))
+
+
+# --- REQUEST / RESPONSE HELPERS ---
+def wsgi_environ(scope):
+    """Just enough of a WSGI environ for Flask to open the session of an ASGI request."""
+    server_name, server_port = scope.get('server') or ('localhost', 80)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', ''),
+        'PATH_INFO': scope['path'],
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': server_name,
+        'SERVER_PORT': str(server_port),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(),
+        'wsgi.errors': io.StringIO(),
+    }
+    for name, value in scope['headers']:
+        key = name.decode('latin-1').upper().replace('-', '_')
+        if key not in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+            key = f"HTTP_{key}"
+        value = value.decode('latin-1')
+        environ[key] = f"{environ[key]},{value}" if key in environ else value
+    return environ
+
+def authenticated_user_id(scope):
+    """Flask-Login's session / remember-cookie check for an ASGI request. Returns the user id or None."""
+    with web.app.request_context(wsgi_environ(scope)):
+        web.ensure_db_initialized()
+        return current_user.id if current_user.is_authenticated else None
+
+def header(scope, name):
+    name = name.encode('latin-1')
+    for key, value in scope['headers']:
+        if key == name:
+            return value.decode('latin-1')
+    return None
+
+async def send_json(send, payload, status=200, headers=None):
+    body = json.dumps(payload, default=web.numpy_json_default).encode('utf-8')
+    response_headers = [(b'content-type', b'application/json'), (b'content-length', str(len(body)).encode())]
+    for name, value in (headers or {}).items():
+        response_headers.append((name.lower().encode('latin-1'), str(value).encode('latin-1')))
+    await send({'type': 'http.response.start', 'status': status, 'headers': response_headers})
+    await send({'type': 'http.response.body', 'body': body})
+
+async def send_overloaded(send, e):
+    await send_json(send, {"ok": False, "error": str(e), "retry_after": e.retry_after}, 429, {'Retry-After': e.retry_after})
+
+async def read_body(receive, max_size):
+    body = bytearray()
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            raise ConnectionError("Client disconnected.")
+        body += message.get('body', b'')
+        if len(body) > max_size:
+            raise RequestEntityTooLarge()
+        if not message.get('more_body'):
+            return bytes(body)
+
+def watch_disconnect(receive):
+    """Returns (task, gone): gone() turns True once the client has gone away; cancel the task when done."""
+    disconnected = asyncio.Event()
+
+    async def watch():
+        while (await receive())['type'] != 'http.disconnect':
+            pass
+        disconnected.set()
+
+    return asyncio.ensure_future(watch()), disconnected.is_set
+
+
+# --- TOOL EXECUTION ---
+async def run_tool(folder, tool_input, options=None, timeout=120, progress=None, cancelled=None):
+    """Awaitable app.run_tool(): a warm async worker, else a one-shot process."""
+    message = {"input": tool_input, "options": options or {}}
+    pool = tool_workers.get_async_pool(folder)
+    if pool:
+        reply = await pool.run(message, timeout=timeout, progress=progress, cancelled=cancelled)
+        if reply is not None:
+            return reply
+    return await tool_workers.run_once_async(folder, message, timeout=timeout, progress=progress, cancelled=cancelled)
+
+async def execute_tool(tool, tool_input, options=None, progress=None, cancelled=None):
+    """Awaitable app.execute_tool() for the subprocess-backed tools. Raises admission.Overloaded."""
+    if not tool_input:
+        return None, {"ok": False, "error": "No input provided.", "error_type": "BadRequest"}
+    async with web.tool_admission.admit_async(tool):
+        if cancelled and cancelled():
+            # Cancelled while waiting for a slot
+            return None, {"ok": False, "error": "Scan cancelled.", "error_type": "Cancelled"}
+        folder, _ = web.tool_map[tool]
+        reply = await run_tool(folder, tool_input, options, progress=progress, cancelled=cancelled)
+    if reply.get('ok'):
+        return reply['report'], None
+    if reply.get('error_type') == 'Busy':
+        # Every pooled worker stayed busy; the tool itself never ran
+        raise admission.Overloaded(tool, web.tool_admission.retry_after(tool))
+    return None, {
+        "ok": False,
+        "error": reply.get('error', 'Execution failed.'),
+        "error_type": reply.get('error_type'),
+        "raw_stderr": reply.get('stderr', '')
+    }
+
+async def run_cached_tool(tool, cache_key, work):
+    """Awaitable app.run_cached_tool(); `work` is a coroutine function."""
+    async def lead():
+        report_json, error_json = await work()
+        if report_json:
+            await asyncio.to_thread(web.scan_cache.set, cache_key, tool, report_json, web.numpy_json_default)
+        return report_json, error_json
+
+    async def lookup():
+        report_json = await asyncio.to_thread(web.scan_cache.get, cache_key)
+        return (report_json, None) if report_json is not None else None
+
+    (report_json, error_json), shared = await web.scan_flights.do_async(cache_key, lead, lookup)
+    if shared and error_json and error_json.get('error_type') == 'Cancelled':
+        # The leader's request was cancelled, not ours
+        return await work()
+    if shared and report_json is not None:
+        report_json = dict(report_json, cached=True)
+    return report_json, error_json
+
+
+# --- API ROUTE FOR TEXT/JSON INPUTS ---
+def serves_tool(tool):
+    """True for the tools api_tool() runs here; the internal and in-process ones stay on Flask."""
+    folder, _ = web.tool_map.get(tool, (None, None))
+    return bool(folder) and folder != 'internal' and tool not in web.IN_PROCESS_TOOLS
+
+async def api_tool(scope, receive, send, tool, user_id):
+    try:
+        data = json.loads(await read_body(receive, web.app.config['MAX_CONTENT_LENGTH']) or b'{}')
+    except RequestEntityTooLarge:
+        return await send_json(send, {"ok": False, "error": "Request body too large."}, 413)
+    except ValueError:
+        return await send_json(send, {"ok": False, "error": "Request body is not valid JSON."}, 400)
+    if not isinstance(data, dict):
+        data = {}
+    user_input = data.get('input', '')
+    user_mode = data.get('mode', '')
+
+    # The cache key stats the tool's files (model fingerprint)
+    cache_key = await asyncio.to_thread(
+        web.tool_cache_key, tool, result_cache.canonicalize(tool, user_input), user_mode
+    ) if user_input else None
+    final_report_json = await asyncio.to_thread(web.scan_cache.get, cache_key)
+    if final_report_json is not None:
+        final_report_json['cached'] = True
+    else:
+        # A client that gives up stops its scan (unless other requests are waiting on it)
+        watcher, gone = watch_disconnect(receive)
+        try:
+            work = lambda: execute_tool(tool, user_input, cancelled=gone)
+            if cache_key:
+                final_report_json, error_json = await run_cached_tool(tool, cache_key, work)
+            else:
+                final_report_json, error_json = await work()
+        except admission.Overloaded as e:
+            return await send_overloaded(send, e)
+        finally:
+            watcher.cancel()
+        if error_json:
+            return await send_json(send, error_json, 400 if error_json.get('error_type') == 'BadRequest' else 500)
+
+    if final_report_json and final_report_json.get('ok'):
+        await asyncio.to_thread(web.save_scan_report, user_id, tool, user_input[:100] if user_input else "N/A", final_report_json)
+    await send_json(send, final_report_json)
+
+
+# --- API ROUTE FOR FILE UPLOADS ---
+async def run_upload_job(job, tool, absolute_filepath, upload, user_id):
+    """Awaitable app.run_upload_job()."""
+    upload_dir, filename = os.path.split(absolute_filepath)
+    error_json = None
+    try:
+        if await job.refresh_cancelled():
+            return {"ok": False, "error": "Scan cancelled before it started.", "error_type": "Cancelled"}
+        cache_key = await asyncio.to_thread(web.tool_cache_key, tool, web.upload_cache_input(upload, filename, user_id))
+        final_report_json = await asyncio.to_thread(web.scan_cache.get, cache_key)
+        if final_report_json is not None:
+            final_report_json['cached'] = True
+        else:
+            final_report_json, error_json = await run_cached_tool(
+                tool, cache_key,
+                lambda: execute_tool(tool, absolute_filepath, options=upload, progress=job.progress, cancelled=job.cancelled)
+            )
+    except admission.Overloaded as e:
+        return {"ok": False, "error": str(e), "retry_after": e.retry_after}
+    finally:
+        await asyncio.to_thread(shutil.rmtree, upload_dir, True)
+
+    if error_json:
+        return error_json
+
+    if final_report_json.get('ok'):
+        await asyncio.to_thread(web.save_scan_report, user_id, tool, f"File: {filename}", final_report_json)
+    return final_report_json
+
+async def api_file_upload(scope, receive, send, tool, user_id):
+    folder, _ = web.tool_map.get(tool, (None, None))
+    if folder == 'internal':
+        return await send_json(send, {"ok": False, "error": "This file tool is not configured correctly."}, 400)
+    if not folder:
+        return await send_json(send, {"ok": False, "error": "Unknown processing error."}, 500)
+    if not await asyncio.to_thread(web.tool_admission.has_capacity, tool):
+        return await send_overloaded(send, admission.Overloaded(tool, web.tool_admission.retry_after(tool)))
+
+    content_type, options = parse_options_header(header(scope, 'content-type') or '')
+    if content_type != 'multipart/form-data' or not options.get('boundary'):
+        return await send_json(send, {"ok": False, "error": "No file part in the request."}, 400)
+    try:
+        ingest, client_filename = await uploads.receive_file(
+            receive, options['boundary'].encode('latin-1'), 'file',
+            web.app.config['UPLOAD_FOLDER'], web.app.config['MAX_CONTENT_LENGTH']
+        )
+    except RequestEntityTooLarge:
+        return await send_json(send, {"ok": False, "error": f"File too large (max {web.MAX_UPLOAD_SIZE_MB} MB)."}, 413)
+    except ValueError:
+        return await send_json(send, {"ok": False, "error": "Malformed multipart body."}, 400)
+
+    if client_filename is None:
+        return await send_json(send, {"ok": False, "error": "No file part in the request."}, 400)
+    if ingest is None:
+        return await send_json(send, {"ok": False, "error": "No file selected for uploading."}, 400)
+    if not web.allowed_file(client_filename):
+        await asyncio.to_thread(ingest.discard)
+        return await send_json(send, {"ok": False, "error": "File type not allowed."}, 400)
+
+    filename = ingest.filename
+    upload = {
+        "sha256": ingest.sha256,
+        "content_type": ingest.content_type or 'application/octet-stream',
+    }
+    absolute_filepath = ingest.claim()
+    job_id = await web.job_store.submit_async(
+        user_id, tool, f"File: {filename}",
+        lambda job: run_upload_job(job, tool, absolute_filepath, upload, user_id)
+    )
+    root = scope.get('root_path', '')
+    await send_json(send, {
+        "ok": True,
+        "job_id": job_id,
+        "status": jobs.QUEUED,
+        "status_url": f"{root}/api/jobs/{job_id}",
+        "events_url": f"{root}/api/jobs/{job_id}/events",
+        "cancel_url": f"{root}/api/jobs/{job_id}/cancel"
+    }, 202)
+
+
+# --- ASGI APPLICATION ---
+def native_handler(scope):
+    """The async handler and tool for a request, or (None, None) when Flask serves it."""
+    if scope['method'] != 'POST':
+        return None, None
+    match = UPLOAD_ROUTE.match(scope['path'])
+    if match:
+        return api_file_upload, match.group('tool')
+    match = TOOL_ROUTE.match(scope['path'])
+    if match and serves_tool(match.group('tool')):
+        return api_tool, match.group('tool')
+    return None, None
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await tool_workers.shutdown_async()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+async def application(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        return await lifespan(receive, send)
+    if scope['type'] == 'http':
+        handler, tool = native_handler(scope)
+        if handler:
+            user_id = await asyncio.to_thread(authenticated_user_id, scope)
+            if user_id is not None:
+                try:
+                    return await handler(scope, receive, send, tool, user_id)
+                except ConnectionError:
+                    logging.info(f"Client went away during {scope['path']}")
+                    return
+            # Not logged in: Flask-Login answers exactly as it does under WSGI
+    await flask_asgi(scope, receive, send)
@@ -93,39 +93,56 @@ def analyze_packet_data(data):
         }
     }
 
+# --- PLUGIN ENTRY POINT ---
+def parse_input(raw_arg):
+    """Parses a JSON request (optionally wrapped as {"input": "<json>"}) or plain "Protocol Service Length" text."""
+    parsed_data = {}
+
+    # Attempt 1: JSON
+    try:
+        parsed_data = json.loads(raw_arg)
+        if isinstance(parsed_data, str): 
+            try: parsed_data = json.loads(parsed_data)
+            except: pass
+        elif 'input' in parsed_data:
+            try: 
+                inner = json.loads(parsed_data['input'])
+                if isinstance(inner, dict): parsed_data = inner
+            except: pass
+    except:
+        # Attempt 2: Plain Text "Protocol Service Length"
+        parts = raw_arg.split()
+        if len(parts) >= 1: parsed_data['protocol'] = parts[0]
+        if len(parts) >= 2: parsed_data['service'] = parts[1]
+        if len(parts) >= 3: parsed_data['packet_len'] = parts[2]
+    return parsed_data
+
+def analyze(data):
+    """Plugin entry point: accepts a parsed request dict or the raw JSON/text string."""
+    try:
+        if isinstance(data, str):
+            data = parse_input(data)
+        return analyze_packet_data(data)
+    except Exception as e:
+        # Valid JSON of the wrong shape (a list, a number...) lands here
+        return {"ok": False, "error": str(e)}
+
 # --- CLI HANDLER ---
-if __name__ == "__main__":
+def main(args):
+    """Builds the JSON report for the CLI arguments (argv without the script name)."""
     try:
-        if len(sys.argv) > 1:
-            raw_arg = " ".join(sys.argv[1:]).strip()
+        if len(args) > 0:
+            raw_arg = " ".join(args).strip()
             
             # Clean quotes
             if raw_arg.startswith("'") and raw_arg.endswith("'"): raw_arg = raw_arg[1:-1]
             if raw_arg.startswith('"') and raw_arg.endswith('"'): raw_arg = raw_arg[1:-1]
 
-            parsed_data = {}
-
-            # Attempt 1: JSON
-            try:
-                parsed_data = json.loads(raw_arg)
-                if isinstance(parsed_data, str): 
-                    try: parsed_data = json.loads(parsed_data)
-                    except: pass
-                elif 'input' in parsed_data:
-                    try: 
-                        inner = json.loads(parsed_data['input'])
-                        if isinstance(inner, dict): parsed_data = inner
-                    except: pass
-            except:
-                # Attempt 2: Plain Text "Protocol Service Length"
-                parts = raw_arg.split()
-                if len(parts) >= 1: parsed_data['protocol'] = parts[0]
-                if len(parts) >= 2: parsed_data['service'] = parts[1]
-                if len(parts) >= 3: parsed_data['packet_len'] = parts[2]
-
-            result = analyze_packet_data(parsed_data)
-            print(json.dumps(result))
+            return analyze(raw_arg)
         else:
-            print(json.dumps({"ok": False, "error": "No input provided"}))
+            return {"ok": False, "error": "No input provided"}
     except Exception as e:
-        print(json.dumps({"ok": False, "error": str(e)}))
\ No newline at end of file
+        return {"ok": False, "error": str(e)}
+
+if __name__ == "__main__":
+    print(json.dumps(main(sys.argv[1:])))
@@ -6,18 +6,32 @@ from joblib import load
 from datetime import datetime
 from PIL import Image
 
+try:
+    # Preloaded, shared copies (and memory-mapped forests) in the web app and its tool workers
+    from backend.model_registry import load_artifact
+except ImportError as e:
+    # A standalone `python main.py` run from the tool folder
+    sys.stderr.write(f"WARNING: backend.model_registry unavailable ({e}); loading model files directly.\n")
+    load_artifact = load
+
 # --- CONFIGURATION ---
 TOOL_NAME = "Adversarial Attack Shield"
 MODEL_DIR = os.path.join(os.path.dirname(__file__), 'model_files')
 MODEL_PATH = os.path.join(MODEL_DIR, 'aas_noise_classifier.joblib')
 SCALER_PATH = os.path.join(MODEL_DIR, 'aas_scaler.joblib')
 
+_ARTIFACTS = None
+
 def load_ml_artifacts():
-    """Loads the saved noise classifier model and scaler."""
+    """Loads the saved noise classifier model and scaler (once per process)."""
+    global _ARTIFACTS
+    if _ARTIFACTS is not None:
+        return _ARTIFACTS
     try:
-        model = load(MODEL_PATH)
-        scaler = load(SCALER_PATH)
-        return model, scaler
+        model = load_artifact(MODEL_PATH)
+        scaler = load_artifact(SCALER_PATH)
+        _ARTIFACTS = (model, scaler)
+        return _ARTIFACTS
     except FileNotFoundError:
         sys.stderr.write(f"FATAL ERROR: Model files not found. Did you run train_model.py?\n")
         sys.exit(1)
@@ -102,24 +116,28 @@ def run_attack_shield(model, scaler, file_path):
         }
     }
 
-if __name__ == "__main__":
-    if len(sys.argv) < 2:
-        sys.stderr.write("ERROR: No input provided. Expected image file path.\n")
-        sys.exit(1)
-        
-    raw_input_data = sys.argv[1] # This is the file path from Flask
-    
+def analyze(raw_input_data):
+    """Plugin entry point: builds the full JSON report for one image file path."""
     model, scaler = load_ml_artifacts()
     
     final_report_data = run_attack_shield(model, scaler, raw_input_data)
     
-    report = {
+    return {
         "tool": TOOL_NAME,
         "input_received": os.path.basename(raw_input_data),
         "timestamp": str(datetime.now()),
         "ok": True,
         **final_report_data
     }
-    
+
+def main(args):
+    """Builds the JSON report for the CLI arguments (argv without the script name)."""
+    if len(args) < 1:
+        sys.stderr.write("ERROR: No input provided. Expected image file path.\n")
+        sys.exit(1)
+        
+    return analyze(args[0]) # This is the file path from Flask
+
+if __name__ == "__main__":
     # Use float conversion for NumPy types before dumping to JSON
-    print(json.dumps(report, indent=4, default=lambda o: float(o) if isinstance(o, (np.float32, np.float64, np.int32, np.int64)) else o.__dict__))
\ No newline at end of file
+    print(json.dumps(main(sys.argv[1:]), indent=4, default=lambda o: float(o) if isinstance(o, (np.float32, np.float64, np.int32, np.int64)) else o.__dict__))
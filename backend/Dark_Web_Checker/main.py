@@ -7,6 +7,16 @@ import pandas as pd
 from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.ensemble import RandomForestClassifier
 
+try:
+    # Preloaded, shared copies (and memory-mapped forests) in the web app and its tool workers
+    from backend.model_registry import load_artifact
+except ImportError as e:
+    # A standalone `python main.py` run from the tool folder
+    sys.stderr.write(f"WARNING: backend.model_registry unavailable ({e}); loading model files directly.\n")
+    def load_artifact(path):
+        with open(path, 'rb') as f:
+            return pickle.load(f)
+
 # --- CONFIGURATION ---
 BASE_PATH = os.path.dirname(os.path.abspath(__file__))
 MODEL_PATH = os.path.join(BASE_PATH, 'darkweb_model.pkl')
@@ -38,16 +48,24 @@ def train_and_save_model():
     return model, tfidf
 
 # --- 2. LOAD MODEL ---
+_MODEL_CACHE = None
+
 def load_model():
+    # Cached for the lifetime of the process (warm workers reuse it across scans)
+    global _MODEL_CACHE
+    if _MODEL_CACHE is not None:
+        return _MODEL_CACHE
     try:
         if not os.path.exists(MODEL_PATH) or not os.path.exists(VEC_PATH):
-            return train_and_save_model() # Auto-train if missing
+            _MODEL_CACHE = train_and_save_model() # Auto-train if missing
+            return _MODEL_CACHE
             
-        with open(MODEL_PATH, 'rb') as f: model = pickle.load(f)
-        with open(VEC_PATH, 'rb') as f: vectorizer = pickle.load(f)
-        return model, vectorizer
+        model = load_artifact(MODEL_PATH)
+        vectorizer = load_artifact(VEC_PATH)
+        _MODEL_CACHE = (model, vectorizer)
     except Exception:
-        return train_and_save_model() # Fallback to retrain if corrupt
+        _MODEL_CACHE = train_and_save_model() # Fallback to retrain if corrupt
+    return _MODEL_CACHE
 
 # --- 3. SIMULATED DATABASE ---
 def check_breach_db(query):
@@ -61,23 +79,47 @@ def check_breach_db(query):
     return simulated_breaches.get(query, [])
 
 # --- 4. MAIN ANALYSIS ---
+def analyze(input_text):
+    """Plugin entry point: builds the full JSON report for one email, handle or text snippet."""
+    return scan_dark_web(input_text)
+
+def analyze_batch(input_texts):
+    """Plugin batch entry point: one report per input, scored in a single vectorized call."""
+    return scan_dark_web_batch(input_texts)
+
 def scan_dark_web(input_text):
-    if not input_text:
-        return {"ok": False, "error": "Empty input"}
+    return scan_dark_web_batch([input_text])[0]
 
-    model, vectorizer = load_model()
-    
+def scan_dark_web_batch(input_texts):
+    """Checks many inputs with one TF-IDF transform and a single predict/predict_proba call."""
+    texts = [text for text in input_texts if text]
+    predictions = [0] * len(texts)
+    probs = [0.0] * len(texts)
+
+    if texts:
+        model, vectorizer = load_model()
+        
+        # Check AI Context
+        try:
+            vectorized_input = vectorizer.transform(texts)
+            predictions = model.predict(vectorized_input)
+            probs = model.predict_proba(vectorized_input)[:, 1]
+        except:
+            pass
+
+    scored = iter(zip(texts, predictions, probs))
+    results = []
+    for input_text in input_texts:
+        if not input_text:
+            results.append({"ok": False, "error": "Empty input"})
+        else:
+            text, prediction, prob = next(scored)
+            results.append(build_report(text, prediction, prob))
+    return results
+
+def build_report(input_text, prediction, prob):
     # Check Database
     breaches = check_breach_db(input_text)
-    
-    # Check AI Context
-    try:
-        vectorized_input = vectorizer.transform([input_text])
-        prediction = model.predict(vectorized_input)[0]
-        prob = model.predict_proba(vectorized_input)[0][1]
-    except:
-        prediction = 0
-        prob = 0.0
 
     # Determine Risk
     risk_level = "Safe"
@@ -102,12 +144,16 @@ def scan_dark_web(input_text):
         }
     }
 
-if __name__ == "__main__":
+def main(args):
+    """Builds the JSON report for the CLI arguments (argv without the script name)."""
     try:
-        if len(sys.argv) > 1:
-            user_input = " ".join(sys.argv[1:])
-            print(json.dumps(scan_dark_web(user_input)))
+        if len(args) > 0:
+            user_input = " ".join(args)
+            return analyze(user_input)
         else:
-            print(json.dumps({"ok": False, "error": "No input provided"}))
+            return {"ok": False, "error": "No input provided"}
     except Exception as e:
-        print(json.dumps({"ok": False, "error": str(e)}))
\ No newline at end of file
+        return {"ok": False, "error": str(e)}
+
+if __name__ == "__main__":
+    print(json.dumps(main(sys.argv[1:])))
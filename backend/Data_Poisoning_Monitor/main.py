@@ -6,10 +6,19 @@ from sklearn.ensemble import IsolationForest
 from joblib import dump, load
 from datetime import datetime
 
+try:
+    # Preloaded, shared copies (and memory-mapped forests) in the web app and its tool workers
+    from backend.model_registry import load_artifact
+except ImportError as e:
+    # A standalone `python main.py` run from the tool folder
+    sys.stderr.write(f"WARNING: backend.model_registry unavailable ({e}); loading model files directly.\n")
+    load_artifact = load
+
 # --- CONFIGURATION ---
-MODEL_PATH = 'data_poisoning_model.joblib'
-SCALER_PATH = 'data_poisoning_scaler.joblib'
-DATASET_PATH = 'simulated_dataset.csv' # Placeholder for a real dataset
+BASE_PATH = os.path.dirname(os.path.abspath(__file__))
+MODEL_PATH = os.path.join(BASE_PATH, 'data_poisoning_model.joblib')
+SCALER_PATH = os.path.join(BASE_PATH, 'data_poisoning_scaler.joblib')
+DATASET_PATH = os.path.join(BASE_PATH, 'simulated_dataset.csv') # Placeholder for a real dataset
 
 # --- SIMULATION FUNCTION: Creates a fake dataset and injects outliers ---
 def generate_simulated_data(num_samples=100, num_features=5, poisoning_rate=0.05):
@@ -38,7 +47,8 @@ def train_and_save_model(data):
     # the structure consistent for complex ML pipelines.
     
     dump(model, MODEL_PATH)
-    print(f"Simulated Isolation Forest model saved to {MODEL_PATH}")
+    # stderr: stdout carries the JSON report
+    print(f"Simulated Isolation Forest model saved to {MODEL_PATH}", file=sys.stderr)
     return model
 
 # --- CORE ANALYSIS FUNCTION ---
@@ -47,12 +57,12 @@ def run_poisoning_analysis(raw_input_data):
     
     # Check if the model exists, if not, generate and train a new one (for demo purposes)
     if not os.path.exists(MODEL_PATH):
-        print("Model not found. Training a simulated model...")
+        print("Model not found. Training a simulated model...", file=sys.stderr)
         data = generate_simulated_data()
         train_and_save_model(data)
     
     try:
-        model = load(MODEL_PATH)
+        model = load_artifact(MODEL_PATH)
     except Exception as e:
         return {
             "ok": False,
@@ -104,14 +114,22 @@ def run_poisoning_analysis(raw_input_data):
     }
 
 
+# --- PLUGIN ENTRY POINT ---
+def analyze(input_data):
+    """Plugin entry point: builds the full JSON report for one dataset/model name."""
+    return run_poisoning_analysis(input_data or "simulated_training_data_batch")
+
 # --- EXECUTION ENTRY POINT ---
-if __name__ == "__main__":
-    if len(sys.argv) > 1:
-        # In a real tool, sys.argv[1] would be the dataset path to analyze
-        input_data = sys.argv[1]
+def main(args):
+    """Builds the JSON report for the CLI arguments (argv without the script name)."""
+    if len(args) > 0:
+        # In a real tool, args[0] would be the dataset path to analyze
+        input_data = args[0]
     else:
         # Use a default placeholder for demonstration
         input_data = "simulated_training_data_batch"
         
-    report = run_poisoning_analysis(input_data)
-    print(json.dumps(report, indent=2))
\ No newline at end of file
+    return analyze(input_data)
+
+if __name__ == "__main__":
+    print(json.dumps(main(sys.argv[1:]), indent=2))
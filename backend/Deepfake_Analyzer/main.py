@@ -7,18 +7,32 @@ from joblib import load
 from datetime import datetime
 from PIL import Image # For robust image opening
 
+try:
+    # Preloaded, shared copies (and memory-mapped forests) in the web app and its tool workers
+    from backend.model_registry import load_artifact
+except ImportError as e:
+    # A standalone `python main.py` run from the tool folder
+    sys.stderr.write(f"WARNING: backend.model_registry unavailable ({e}); loading model files directly.\n")
+    load_artifact = load
+
 # --- CONFIGURATION ---
 TOOL_NAME = "Deepfake & Synthetic Media Analyzer"
 MODEL_DIR = os.path.join(os.path.dirname(__file__), 'model_files')
 MODEL_PATH = os.path.join(MODEL_DIR, 'deepfake_cnn_sim.joblib')
 SCALER_PATH = os.path.join(MODEL_DIR, 'deepfake_scaler.joblib')
 
+_ARTIFACTS = None
+
 def load_ml_artifacts():
-    """Loads the saved deepfake detection model and scaler."""
+    """Loads the saved deepfake detection model and scaler (once per process)."""
+    global _ARTIFACTS
+    if _ARTIFACTS is not None:
+        return _ARTIFACTS
     try:
-        model = load(MODEL_PATH)
-        scaler = load(SCALER_PATH)
-        return model, scaler
+        model = load_artifact(MODEL_PATH)
+        scaler = load_artifact(SCALER_PATH)
+        _ARTIFACTS = (model, scaler)
+        return _ARTIFACTS
     except FileNotFoundError:
         sys.stderr.write(f"FATAL ERROR: Model files not found. Did you run train_model.py?\n")
         sys.exit(1)
@@ -26,7 +40,10 @@ def load_ml_artifacts():
         sys.stderr.write(f"ERROR loading model artifacts: {e}\n")
         sys.exit(1)
 
-def extract_features_from_file(file_path):
+def no_progress(stage, **data):
+    pass
+
+def extract_features_from_file(file_path, progress=no_progress):
     """
     Simulates complex CNN feature extraction from an image or video frame.
     Returns a single feature vector [Noise_StdDev, JPEG_Artifacts, Inconsistency_Score].
@@ -57,6 +74,8 @@ def extract_features_from_file(file_path):
             except Exception:
                 raise ValueError("Could not open image file.")
         file_type = "Image"
+
+    progress('decoded', file_type=file_type, frames_decoded=1, resolution=f"{img.shape[1]} x {img.shape[0]}")
         
     # --- SIMULATED FEATURE GENERATION based on file size/type ---
     
@@ -82,7 +101,7 @@ def extract_features_from_file(file_path):
         
     return np.array([noise_std_dev, jpeg_artifacts, inconsistency_score]), file_type
 
-def run_deepfake_analysis(model, scaler, file_path):
+def run_deepfake_analysis(model, scaler, file_path, progress=no_progress):
     label = "Analysis Interrupted"
     risk = "ERROR"
     finding = "Processing failed or an unexpected condition occurred during feature extraction."
@@ -96,7 +115,8 @@ def run_deepfake_analysis(model, scaler, file_path):
     
     try:
         # 1. Feature Extraction
-        features, file_type = extract_features_from_file(file_path)
+        features, file_type = extract_features_from_file(file_path, progress)
+        progress('features', features=[float(value) for value in features])
         
         # 2. Scale features
         scaled_features = scaler.transform(features.reshape(1, -1))
@@ -117,6 +137,7 @@ def run_deepfake_analysis(model, scaler, file_path):
         # If the model prediction is 0 (Synthetic), we use prediction_proba[0]. 
         # If the model prediction is 1 (Authentic), we use prediction_proba[1].
         confidence = prediction_proba[int(prediction_numeric)] 
+        progress('verdict', tool_prediction=label, confidence_score=float(confidence))
         
         # Use the corrected 'label' for the final reporting logic
         if label == "Synthetic/Deepfake" and confidence > 0.6:
@@ -157,24 +178,31 @@ def run_deepfake_analysis(model, scaler, file_path):
         }
     }
 
-if __name__ == "__main__":
-    if len(sys.argv) < 2:
-        sys.stderr.write("ERROR: No input provided. Expected image or video file path.\n")
-        sys.exit(1)
-        
-    raw_input_data = sys.argv[1] # This is the file path from Flask
-    
+def analyze(raw_input_data, progress=None):
+    """
+    Plugin entry point: builds the full JSON report for one image or video file path.
+    progress(stage, **data), when given, is called as each step finishes.
+    """
     model, scaler = load_ml_artifacts()
     
-    final_report_data = run_deepfake_analysis(model, scaler, raw_input_data)
+    final_report_data = run_deepfake_analysis(model, scaler, raw_input_data, progress or no_progress)
     
-    report = {
+    return {
         "tool": TOOL_NAME,
         "input_received": raw_input_data,
         "timestamp": str(datetime.now()),
         "ok": True,
         **final_report_data
     }
-    
+
+def main(args):
+    """Builds the JSON report for the CLI arguments (argv without the script name)."""
+    if len(args) < 1:
+        sys.stderr.write("ERROR: No input provided. Expected image or video file path.\n")
+        sys.exit(1)
+        
+    return analyze(args[0]) # This is the file path from Flask
+
+if __name__ == "__main__":
     # Use float conversion for NumPy types before dumping to JSON
-    print(json.dumps(report, indent=4, default=lambda o: float(o) if isinstance(o, (np.float32, np.float64, np.int32, np.int64)) else o.__dict__))
\ No newline at end of file
+    print(json.dumps(main(sys.argv[1:]), indent=4, default=lambda o: float(o) if isinstance(o, (np.float32, np.float64, np.int32, np.int64)) else o.__dict__))
@@ -85,9 +85,10 @@ def run_fake_login_analysis(url):
     }
 
 
-# --- EXECUTION ENTRY POINT ---
-if __name__ == "__main__":
-    if len(sys.argv) < 2:
+# --- PLUGIN ENTRY POINT ---
+def analyze(url_input):
+    """Plugin entry point: builds the full JSON report for one login page URL."""
+    if not url_input:
         report = {
             "ok": False,
             "risk_level": "ERROR",
@@ -96,11 +97,17 @@ if __name__ == "__main__":
             "confidence_score": 0.0
         }
     else:
-        # sys.argv[1] is the URL string passed from Flask
-        url_input = sys.argv[1]
         report = run_fake_login_analysis(url_input)
     
     report["tool"] = "AI Fake Login Detector"
     report["timestamp"] = datetime.now().isoformat()
-    
-    print(json.dumps(report, indent=4))
\ No newline at end of file
+    return report
+
+# --- EXECUTION ENTRY POINT ---
+def main(args):
+    """Builds the JSON report for the CLI arguments (argv without the script name)."""
+    # args[0] is the URL string passed from Flask
+    return analyze(args[0] if args else None)
+
+if __name__ == "__main__":
+    print(json.dumps(main(sys.argv[1:]), indent=4))
@@ -8,17 +8,27 @@ import numpy as np
 
 # --- CONFIGURATION ---
 TOOL_NAME = "File & URL Scanner"
+HASH_CHUNK_SIZE = 1024 * 1024
 
-def run_scanner(input_data):
+def file_sha256(file_path):
+    """SHA-256 of a file, read in fixed-size chunks (never the whole file in memory)."""
+    sha256 = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+def run_scanner(input_data, sha256=None, content_type=None):
     
     # 1. Check if the input is a file path (for image uploads)
     if os.path.exists(input_data):
-        return analyze_image_file(input_data)
+        return analyze_image_file(input_data, sha256, content_type)
         
     # 2. Assume input is a URL or text (original behavior)
     return analyze_text_url(input_data)
 
-def analyze_image_file(file_path):
+def analyze_image_file(file_path, sha256=None, content_type=None):
+    # sha256/content_type: computed by the web app while it received the upload
     
     # Simulate malicious detection based on file properties
     risk = "Suspicious (Image)"
@@ -36,7 +46,7 @@ def analyze_image_file(file_path):
                  finding = "Image integrity check flagged an extremely high-resolution file. Potential resource exhaustion or steganography target."
             
             # Simple check for a specific known malicious hash (e.g., a hash known to contain a hidden payload)
-            file_hash = hashlib.sha256(open(file_path, 'rb').read()).hexdigest()
+            file_hash = sha256 or file_sha256(file_path)
             if file_hash.startswith('a1b2c3d4e5f6'): # Simulated malicious hash prefix
                 risk = "Malicious (Image Payload)"
                 finding = "Image hash matches known malicious payload fingerprint."
@@ -56,6 +66,7 @@ def analyze_image_file(file_path):
         "advanced_report_details": {
             "input_type": "Image File",
             "file_path": file_path,
+            "content_type": content_type,
             "simulated_analysis": True
         }
     }
@@ -84,22 +95,28 @@ def analyze_text_url(input_data):
     }
 
 
-if __name__ == "__main__":
-    if len(sys.argv) < 2:
-        sys.stderr.write("ERROR: No input provided. Expected file path or text/URL string.\n")
-        sys.exit(1)
-        
-    raw_input_data = sys.argv[1]
-    
-    final_report_data = run_scanner(raw_input_data)
+def analyze(raw_input_data, sha256=None, content_type=None):
+    """Plugin entry point: builds the full JSON report for one file path or text/URL string."""
+    final_report_data = run_scanner(raw_input_data, sha256, content_type)
     
-    report = {
+    return {
         "tool": TOOL_NAME,
         "input_received": raw_input_data,
         "timestamp": str(datetime.now()),
         "ok": True,
         **final_report_data
     }
-    
+
+def main(args):
+    """Builds the JSON report for the CLI arguments (argv without the script name)."""
+    if len(args) < 1:
+        sys.stderr.write("ERROR: No input provided. Expected file path or text/URL string.\n")
+        sys.exit(1)
+
+    # Optional trailing --sha256=<hex> --content-type=<mime> flags for uploads
+    options = dict(arg[2:].split('=', 1) for arg in args[1:] if arg.startswith('--') and '=' in arg)
+    return analyze(args[0], sha256=options.get('sha256'), content_type=options.get('content-type'))
+
+if __name__ == "__main__":
     # Use float conversion for NumPy types before dumping to JSON
-    print(json.dumps(report, indent=4, default=lambda o: float(o) if isinstance(o, (np.float32, np.float64, np.int32, np.int64)) else o.__dict__))
\ No newline at end of file
+    print(json.dumps(main(sys.argv[1:]), indent=4, default=lambda o: float(o) if isinstance(o, (np.float32, np.float64, np.int32, np.int64)) else o.__dict__))
@@ -4,7 +4,10 @@ import os
 import datetime
 from PIL import Image, ExifTags
 
-def extract_metadata(filepath):
+def no_progress(stage, **data):
+    pass
+
+def extract_metadata(filepath, progress=no_progress):
     final_data = {}
     
     # --- LEVEL 1: FILE SYSTEM METADATA (Always Exists) ---
@@ -19,6 +22,7 @@ def extract_metadata(filepath):
         }
     except Exception as e:
         final_data['File Info'] = {"Error": str(e)}
+    progress('file_info', section=final_data['File Info'])
 
     # --- LEVEL 2: IMAGE ATTRIBUTES (Resolution, Format) ---
     try:
@@ -30,6 +34,7 @@ def extract_metadata(filepath):
             "Is Animated": getattr(img, "is_animated", False),
             "Frames": getattr(img, "n_frames", 1)
         }
+        progress('image_attributes', section=final_data['Image Attributes'])
         
         # --- LEVEL 3: EXIF DATA (Camera, GPS - Often Stripped) ---
         exif_info = {}
@@ -49,6 +54,7 @@ def extract_metadata(filepath):
             final_data['EXIF Data'] = exif_info
         else:
             final_data['EXIF Data'] = {"Status": "Not Found (Likely stripped by WhatsApp/Social Media)"}
+        progress('exif', section=final_data['EXIF Data'])
             
     except IOError:
         final_data['Error'] = "Not a valid image file."
@@ -63,23 +69,29 @@ def extract_metadata(filepath):
         "data": final_data
     }
 
+# --- PLUGIN ENTRY POINT ---
+def analyze(file_path, progress=None):
+    """Plugin entry point: builds the full JSON report for one file path, reporting each section to progress(stage, **data)."""
+    if not file_path:
+        return {"ok": False, "error": "No file path provided."}
+    if not os.path.exists(file_path):
+        return {"ok": False, "error": "File not found."}
+    return extract_metadata(file_path, progress or no_progress)
+
 # --- CLI HANDLER ---
-if __name__ == "__main__":
+def main(args):
+    """Builds the JSON report for the CLI arguments (argv without the script name)."""
     try:
-        if len(sys.argv) > 1:
-            # Handle file path argument
-            file_path = " ".join(sys.argv[1:]).strip()
-            
-            # Remove quotes if present (Windows issue)
-            if file_path.startswith("'") and file_path.endswith("'"): file_path = file_path[1:-1]
-            if file_path.startswith('"') and file_path.endswith('"'): file_path = file_path[1:-1]
-            
-            if os.path.exists(file_path):
-                result = extract_metadata(file_path)
-                print(json.dumps(result))
-            else:
-                print(json.dumps({"ok": False, "error": "File not found."}))
-        else:
-            print(json.dumps({"ok": False, "error": "No file path provided."}))
+        # Handle file path argument (trailing --name=value flags from the web app are not part of it)
+        file_path = " ".join(arg for arg in args if not arg.startswith('--')).strip()
+        
+        # Remove quotes if present (Windows issue)
+        if file_path.startswith("'") and file_path.endswith("'"): file_path = file_path[1:-1]
+        if file_path.startswith('"') and file_path.endswith('"'): file_path = file_path[1:-1]
+        
+        return analyze(file_path)
     except Exception as e:
-        print(json.dumps({"ok": False, "error": str(e)}))
\ No newline at end of file
+        return {"ok": False, "error": str(e)}
+
+if __name__ == "__main__":
+    print(json.dumps(main(sys.argv[1:])))
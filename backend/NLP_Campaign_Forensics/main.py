@@ -5,6 +5,14 @@ from joblib import load
 from datetime import datetime
 import numpy as np
 
+try:
+    # Preloaded, shared copies (and memory-mapped forests) in the web app and its tool workers
+    from backend.model_registry import load_artifact
+except ImportError as e:
+    # A standalone `python main.py` run from the tool folder
+    sys.stderr.write(f"WARNING: backend.model_registry unavailable ({e}); loading model files directly.\n")
+    load_artifact = load
+
 # --- CONFIGURATION ---
 TOOL_NAME = "Phishing Campaign Forensics"
 MODEL_DIR = os.path.join(os.path.dirname(__file__), 'model_files')
@@ -20,12 +28,18 @@ CLUSTER_NAMES = {
     2: "Campaign A: Amazon Account Lockout" 
 }
 
+_ARTIFACTS = None
+
 def load_ml_artifacts():
-    """Loads the saved vectorizer and clustering model."""
+    """Loads the saved vectorizer and clustering model (once per process)."""
+    global _ARTIFACTS
+    if _ARTIFACTS is not None:
+        return _ARTIFACTS
     try:
-        vectorizer = load(VECTORIZER_PATH)
-        kmeans = load(CLUSTER_MODEL_PATH)
-        return vectorizer, kmeans
+        vectorizer = load_artifact(VECTORIZER_PATH)
+        kmeans = load_artifact(CLUSTER_MODEL_PATH)
+        _ARTIFACTS = (vectorizer, kmeans)
+        return _ARTIFACTS
     except FileNotFoundError:
         sys.stderr.write(f"FATAL ERROR: Model files not found. Did you run train_model.py in the NLP Forensics folder?\n")
         sys.exit(1)
@@ -37,25 +51,32 @@ def run_campaign_forensics(vectorizer, kmeans, raw_input):
     """
     Analyzes an input email/text and classifies it into a known phishing campaign cluster.
     """
+    return run_campaign_forensics_batch(vectorizer, kmeans, [raw_input])[0]
+
+def run_campaign_forensics_batch(vectorizer, kmeans, raw_inputs):
+    """Classifies many emails/texts with one TF-IDF transform and a single predict call."""
     
     try:
-        # 1. Transform the input text using the fitted vectorizer
-        X_new = vectorizer.transform([raw_input])
+        # 1. Transform the input texts using the fitted vectorizer
+        X_new = vectorizer.transform(raw_inputs)
 
-        # 2. Predict the cluster ID
-        cluster_id = kmeans.predict(X_new)[0]
-        
-        # 3. Get the campaign name
-        campaign_name = CLUSTER_NAMES.get(cluster_id, "Unknown Campaign")
-
-        # 4. Generate Finding
-        risk = "INTELLIGENCE GATHERED"
-        finding = f"Input text matches known phishing campaign: {campaign_name}. Treat all emails in this cluster as malicious."
+        # 2. Predict the cluster IDs
+        cluster_ids = kmeans.predict(X_new)
             
     except Exception as e:
         sys.stderr.write(f"ERROR processing input data: {e}\n")
         sys.exit(1)
 
+    return [build_report_data(cluster_id) for cluster_id in cluster_ids]
+
+def build_report_data(cluster_id):
+    # Get the campaign name
+    campaign_name = CLUSTER_NAMES.get(cluster_id, "Unknown Campaign")
+
+    # Generate Finding
+    risk = "INTELLIGENCE GATHERED"
+    finding = f"Input text matches known phishing campaign: {campaign_name}. Treat all emails in this cluster as malicious."
+
     return {
         "tool_prediction": campaign_name,
         "confidence_score": 1.0, # Clustering assigns a definitive ID
@@ -68,23 +89,42 @@ def run_campaign_forensics(vectorizer, kmeans, raw_input):
         }
     }
 
-if __name__ == "__main__":
-    if len(sys.argv) < 2:
-        sys.stderr.write("ERROR: No input provided. Expected text of a phishing email/subject line.\n")
-        sys.exit(1)
-        
-    raw_input_data = sys.argv[1]
-    
+def analyze(raw_input_data):
+    """Plugin entry point: builds the full JSON report for one email/subject line."""
     vectorizer, kmeans = load_ml_artifacts()
     
     final_report_data = run_campaign_forensics(vectorizer, kmeans, raw_input_data)
     
-    report = {
+    return {
         "tool": TOOL_NAME,
         "input_received": raw_input_data,
         "timestamp": str(datetime.now()),
         "ok": True,
         **final_report_data
     }
-    
-    print(json.dumps(report, indent=4))
\ No newline at end of file
+
+def analyze_batch(raw_inputs):
+    """Plugin batch entry point: one report per email/subject line, clustered in a single call."""
+    vectorizer, kmeans = load_ml_artifacts()
+    timestamp = str(datetime.now())
+    return [
+        {
+            "tool": TOOL_NAME,
+            "input_received": raw_input,
+            "timestamp": timestamp,
+            "ok": True,
+            **report_data
+        }
+        for raw_input, report_data in zip(raw_inputs, run_campaign_forensics_batch(vectorizer, kmeans, raw_inputs))
+    ]
+
+def main(args):
+    """Builds the JSON report for the CLI arguments (argv without the script name)."""
+    if len(args) < 1:
+        sys.stderr.write("ERROR: No input provided. Expected text of a phishing email/subject line.\n")
+        sys.exit(1)
+        
+    return analyze(args[0])
+
+if __name__ == "__main__":
+    print(json.dumps(main(sys.argv[1:]), indent=4))
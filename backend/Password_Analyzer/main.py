@@ -8,6 +8,14 @@ import pandas as pd
 import numpy as np
 import math
 
+try:
+    # Preloaded, shared copies (and memory-mapped forests) in the web app and its tool workers
+    from backend.model_registry import load_artifact
+except ImportError as e:
+    # A standalone `python main.py` run from the tool folder
+    sys.stderr.write(f"WARNING: backend.model_registry unavailable ({e}); loading model files directly.\n")
+    load_artifact = load
+
 # --- CONFIGURATION ---
 TOOL_NAME = "Password Strength Analyzer"
 MODEL_DIR = os.path.join(os.path.dirname(__file__), 'model_files')
@@ -17,12 +25,18 @@ FEATURES_LIST_PATH = os.path.join(MODEL_DIR, 'password_features.joblib')
 STRENGTH_LABELS = ["Very Weak", "Weak", "Medium", "Strong"] 
 # Assuming the training mapped 0, 1, 2, 3 to these labels. Adjust if your model outputs more/fewer classes.
 
+_ARTIFACTS = None
+
 def load_ml_artifacts():
-    """Loads the trained ML model and the list of expected feature columns."""
+    """Loads the trained ML model and the list of expected feature columns (once per process)."""
+    global _ARTIFACTS
+    if _ARTIFACTS is not None:
+        return _ARTIFACTS
     try:
-        model = load(MODEL_PATH)
-        feature_columns = load(FEATURES_LIST_PATH)
-        return model, feature_columns
+        model = load_artifact(MODEL_PATH)
+        feature_columns = load_artifact(FEATURES_LIST_PATH)
+        _ARTIFACTS = (model, feature_columns)
+        return _ARTIFACTS
     except FileNotFoundError:
         # If model files are missing, the tool cannot run.
         sys.stderr.write(f"FATAL ERROR: Model files not found for {TOOL_NAME}. Did you run train_model.py?\n")
@@ -57,31 +71,17 @@ def extract_password_features(password):
     }
     return features
 
-def run_ml_analysis(model, feature_columns, raw_password):
-    """Runs the prediction on the loaded model."""
-    
-    # Handle empty input case to prevent errors
-    if not raw_password:
-        return {
-            "tool_prediction": "Very Weak",
-            "confidence_score": 1.0,
-            "risk_level": "Very Weak",
-            "main_finding": "Input empty. Predicted strength: Very Weak (100% confidence).",
-            "advanced_report_details": {"model_type": "Random Forest Classifier", "input_valid": False}
-        }
-        
-    # 1. Extract features
-    feature_dict = extract_password_features(raw_password)
-    
-    # 2. CRITICAL: Convert the feature dictionary into a DataFrame
-    # Column order is maintained using the loaded feature_columns list
-    X_predict = pd.DataFrame([feature_dict], columns=feature_columns)
-    
-    # 3. Run Prediction
-    prediction_index = model.predict(X_predict)[0]
-    confidence = model.predict_proba(X_predict).max()
-    
-    # 4. Map numerical prediction (0, 1, 2...) to a human-readable label
+EMPTY_INPUT_RESULT = {
+    "tool_prediction": "Very Weak",
+    "confidence_score": 1.0,
+    "risk_level": "Very Weak",
+    "main_finding": "Input empty. Predicted strength: Very Weak (100% confidence).",
+    "advanced_report_details": {"model_type": "Random Forest Classifier", "input_valid": False}
+}
+
+def build_report_data(prediction_index, confidence, feature_dict):
+    """Turns one (class index, confidence) prediction into the report fields."""
+    # Map numerical prediction (0, 1, 2...) to a human-readable label
     # Clamp the index to prevent errors if the model outputs an unexpected class number
     safe_index = int(np.clip(prediction_index, 0, len(STRENGTH_LABELS) - 1))
     prediction_label = STRENGTH_LABELS[safe_index]
@@ -98,24 +98,74 @@ def run_ml_analysis(model, feature_columns, raw_password):
         }
     }
 
-if __name__ == "__main__":
-    if len(sys.argv) < 2:
-        sys.stderr.write("ERROR: No password input provided.\n")
-        sys.exit(1)
+def run_ml_analysis(model, feature_columns, raw_password):
+    """Runs the prediction on the loaded model."""
+    return run_ml_batch(model, feature_columns, [raw_password])[0]
+
+def run_ml_batch(model, feature_columns, raw_passwords):
+    """Scores many passwords with ONE feature matrix and a single predict/predict_proba call."""
+    results = [None] * len(raw_passwords)
+    
+    # Handle empty inputs up front to prevent errors
+    scored = [i for i, password in enumerate(raw_passwords) if password]
+    for i in range(len(raw_passwords)):
+        if not raw_passwords[i]:
+            results[i] = dict(EMPTY_INPUT_RESULT)
+    if not scored:
+        return results
         
-    raw_input_password = sys.argv[1]
+    # 1. Extract features
+    feature_dicts = [extract_password_features(raw_passwords[i]) for i in scored]
+    
+    # 2. CRITICAL: Convert the feature dictionaries into a DataFrame
+    # Column order is maintained using the loaded feature_columns list
+    X_predict = pd.DataFrame(feature_dicts, columns=feature_columns)
     
+    # 3. Run Prediction
+    prediction_indices = model.predict(X_predict)
+    confidences = model.predict_proba(X_predict).max(axis=1)
+    
+    for i, feature_dict, prediction_index, confidence in zip(scored, feature_dicts, prediction_indices, confidences):
+        results[i] = build_report_data(prediction_index, confidence, feature_dict)
+    return results
+
+def analyze(raw_input_password):
+    """Plugin entry point: builds the full JSON report for one password."""
     model, feature_columns = load_ml_artifacts()
     
     final_report_data = run_ml_analysis(model, feature_columns, raw_input_password)
     
-    report = {
+    return {
         "tool": TOOL_NAME,
         "input_received": raw_input_password,
         "timestamp": str(datetime.now()),
         "ok": True,
         **final_report_data
     }
-    
+
+def analyze_batch(raw_passwords):
+    """Plugin batch entry point: one report per password, scored in a single vectorized call."""
+    model, feature_columns = load_ml_artifacts()
+    timestamp = str(datetime.now())
+    return [
+        {
+            "tool": TOOL_NAME,
+            "input_received": raw_password,
+            "timestamp": timestamp,
+            "ok": True,
+            **report_data
+        }
+        for raw_password, report_data in zip(raw_passwords, run_ml_batch(model, feature_columns, raw_passwords))
+    ]
+
+def main(args):
+    """Builds the JSON report for the CLI arguments (argv without the script name)."""
+    if len(args) < 1:
+        sys.stderr.write("ERROR: No password input provided.\n")
+        sys.exit(1)
+        
+    return analyze(args[0])
+
+if __name__ == "__main__":
     # Print the full JSON report to stdout for Flask to capture
-    print(json.dumps(report, indent=4))
\ No newline at end of file
+    print(json.dumps(main(sys.argv[1:]), indent=4))
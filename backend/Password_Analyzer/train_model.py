@@ -85,6 +85,7 @@ try:
     dump(FEATURE_COLUMNS, FEATURES_LIST_SAVE_PATH)
 
     print(f"\nSUCCESS: Model and feature list saved to {MODEL_DIR}")
+    print("Memory-mapped copy for fast loading: run `python -m backend.model_registry export` from the project root.")
     
 except Exception as e:
     print(f"FATAL ERROR: Could not save model files. Error: {e}")
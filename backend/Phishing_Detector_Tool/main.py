@@ -7,18 +7,32 @@ from datetime import datetime
 import pandas as pd
 import numpy as np
 
+try:
+    # Preloaded, shared copies (and memory-mapped forests) in the web app and its tool workers
+    from backend.model_registry import load_artifact
+except ImportError as e:
+    # A standalone `python main.py` run from the tool folder
+    sys.stderr.write(f"WARNING: backend.model_registry unavailable ({e}); loading model files directly.\n")
+    load_artifact = load
+
 # --- CONFIGURATION ---
 TOOL_NAME = "AI Phishing Detector"
 MODEL_DIR = os.path.join(os.path.dirname(__file__), 'model_files')
 MODEL_PATH = os.path.join(MODEL_DIR, 'phishing_model.joblib')
 FEATURES_LIST_PATH = os.path.join(MODEL_DIR, 'phishing_features.joblib')
 
+_ARTIFACTS = None
+
 def load_ml_artifacts():
-    """Loads the trained ML model and the list of expected feature columns."""
+    """Loads the trained ML model and the list of expected feature columns (once per process)."""
+    global _ARTIFACTS
+    if _ARTIFACTS is not None:
+        return _ARTIFACTS
     try:
-        model = load(MODEL_PATH)
-        feature_columns = load(FEATURES_LIST_PATH)
-        return model, feature_columns
+        model = load_artifact(MODEL_PATH)
+        feature_columns = load_artifact(FEATURES_LIST_PATH)
+        _ARTIFACTS = (model, feature_columns)
+        return _ARTIFACTS
     except FileNotFoundError:
         # If model files are missing, the tool cannot run.
         sys.stderr.write(f"FATAL ERROR: Model files not found for {TOOL_NAME}. Did you run train_model.py?\n")
@@ -27,21 +41,19 @@ def load_ml_artifacts():
         sys.stderr.write(f"ERROR loading model artifacts: {e}\n")
         sys.exit(1)
 
-def run_ml_analysis(model, feature_columns, raw_url):
+def extract_url_features(feature_columns, raw_url):
     """
-    Simulates the preprocessing and runs the prediction on the loaded model.
+    Builds the feature row for one URL, keyed by the training feature columns.
     
     NOTE: In a production tool, the complex feature extraction logic 
     (calculating NumDots, UrlLength, etc., from raw_url) MUST happen here.
     """
     
-    # --- STEP 1: Feature Extraction/Generation (SIMULATED PLACEHOLDER) ---
+    # --- Feature Extraction/Generation (SIMULATED PLACEHOLDER) ---
     # This is the single most complex step in a real Phishing Detector tool.
     # It must analyze the 'raw_url' and generate a dictionary of 50+ numerical features.
     
-    # We create a placeholder DataFrame (DF) that mirrors the structure used during training.
     # The values here are randomized just for testing the deployment structure.
-    
     feature_data = {}
     for feature in feature_columns:
         # Simulate generating a plausible numerical value for each feature
@@ -51,19 +63,10 @@ def run_ml_analysis(model, feature_columns, raw_url):
             feature_data[feature] = random.randint(30, 200)
         else: # Assuming boolean or float features
             feature_data[feature] = random.choice([0.0, 1.0])
+    return feature_data
 
-    # CRITICAL: Convert the feature dictionary into a Pandas DataFrame in the exact order
-    # This ensures the model receives the features in the same sequence as training.
-    X_predict = pd.DataFrame([feature_data], columns=feature_columns)
-    
-    # --- STEP 2: Prediction ---
-    prediction_array = model.predict(X_predict)
-    prediction = prediction_array[0] # Get the class label (0 or 1)
-    
-    # Get probability/confidence score
-    confidence = model.predict_proba(X_predict).max()
-    
-    # --- STEP 3: Report Generation ---
+def build_report_data(prediction, confidence, feature_columns):
+    """Turns one (class label, confidence) prediction into the report fields."""
     # Assuming 1 = Phishing (Malicious), 0 = Legitimate (Benign)
     is_phishing = (prediction == 1)
     
@@ -83,26 +86,68 @@ def run_ml_analysis(model, feature_columns, raw_url):
         }
     }
 
-if __name__ == "__main__":
-    if len(sys.argv) < 2:
-        sys.stderr.write("ERROR: No URL input provided.\n")
-        sys.exit(1)
-        
-    raw_input_url = sys.argv[1]
+def run_ml_analysis(model, feature_columns, raw_url):
+    """Runs the preprocessing and the prediction on the loaded model for one URL."""
+    return run_ml_batch(model, feature_columns, [raw_url])[0]
+
+def run_ml_batch(model, feature_columns, raw_urls):
+    """Scores many URLs with ONE feature matrix and a single predict/predict_proba call."""
     
+    # --- STEP 1: Feature Extraction ---
+    # CRITICAL: Build the DataFrame with the exact training column order
+    # This ensures the model receives the features in the same sequence as training.
+    rows = [extract_url_features(feature_columns, raw_url) for raw_url in raw_urls]
+    X_predict = pd.DataFrame(rows, columns=feature_columns)
+    
+    # --- STEP 2: Prediction ---
+    predictions = model.predict(X_predict) # Class labels (0 or 1)
+    confidences = model.predict_proba(X_predict).max(axis=1)
+    
+    # --- STEP 3: Report Generation ---
+    return [
+        build_report_data(prediction, confidence, feature_columns)
+        for prediction, confidence in zip(predictions, confidences)
+    ]
+
+def analyze(raw_input_url):
+    """Plugin entry point: builds the full JSON report for one URL."""
     # Load the model and feature columns
     model, feature_columns = load_ml_artifacts()
     
     # Run the analysis
     final_report_data = run_ml_analysis(model, feature_columns, raw_input_url)
     
-    # 3. Print the final JSON report to stdout for app.py to capture
-    report = {
+    return {
         "tool": TOOL_NAME,
         "input_received": raw_input_url,
         "timestamp": str(datetime.now()),
+        "ok": True,
         **final_report_data
     }
-    
-    # Print the full JSON report to stdout
-    print(json.dumps(report, indent=4))
\ No newline at end of file
+
+def analyze_batch(raw_urls):
+    """Plugin batch entry point: one report per URL, scored in a single vectorized call."""
+    model, feature_columns = load_ml_artifacts()
+    timestamp = str(datetime.now())
+    return [
+        {
+            "tool": TOOL_NAME,
+            "input_received": raw_url,
+            "timestamp": timestamp,
+            "ok": True,
+            **report_data
+        }
+        for raw_url, report_data in zip(raw_urls, run_ml_batch(model, feature_columns, raw_urls))
+    ]
+
+def main(args):
+    """Builds the JSON report for the CLI arguments (argv without the script name)."""
+    if len(args) < 1:
+        sys.stderr.write("ERROR: No URL input provided.\n")
+        sys.exit(1)
+        
+    return analyze(args[0])
+
+if __name__ == "__main__":
+    # Print the full JSON report to stdout for app.py to capture
+    print(json.dumps(main(sys.argv[1:]), indent=4))
@@ -0,0 +1 @@
+"""Backend security tools. Each tool folder's main.py doubles as an in-process plugin (see registry.py)."""
@@ -0,0 +1,65 @@
+"""
+Length-prefixed message framing between the web app and the backend tools.
+
+Every message is a frame: a 4-byte big-endian length followed by that many
+bytes of compact UTF-8 JSON. No shell quoting, no ARG_MAX limit on the
+input, no pretty-printed report text to re-parse.
+
+    request:  {"input": "<raw user input or file path>", "options": {"sha256": "...", ...}}
+    progress: {"progress": {"stage": "<name>", ...}}       zero or more, before the response
+    response: {"ok": true, "report": {...}, "stderr": "..."}
+              {"ok": false, "error": "<message>", "error_type": "<kind>", "stderr": "..."}
+
+error_type is one of:
+    BadRequest     the request frame was malformed or had no input
+    ToolExit       the tool called sys.exit() (it writes the reason to stderr)
+    ToolError      the tool raised an exception
+    Timeout        no reply within the time limit
+    WorkerCrashed  the tool process died mid-request
+    StartFailed    the tool process could not be started
+    Cancelled      the job was cancelled and the tool process stopped
+
+Used by backend/tool_worker.py (both the warm pool workers and one-shot
+runs) and by tool_workers.py in the app.
+"""
+import json
+import struct
+
+HEADER = struct.Struct('>I')
+
+
+def json_default(o):
+    # numpy scalars (the tools' confidence scores, counts...) -> Python numbers
+    if hasattr(o, 'item'):
+        return o.item()
+    return o.__dict__
+
+
+def encode(message):
+    payload = json.dumps(message, separators=(',', ':'), default=json_default).encode('utf-8')
+    return HEADER.pack(len(payload)) + payload
+
+
+def decode(payload):
+    return json.loads(payload.decode('utf-8'))
+
+
+def read_frame(stream):
+    """Reads one frame from a blocking binary stream; None at end of stream."""
+    header = stream.read(HEADER.size)
+    if len(header) < HEADER.size:
+        return None
+    (length,) = HEADER.unpack(header)
+    payload = stream.read(length)
+    if len(payload) < length:
+        return None
+    return decode(payload)
+
+
+def write_frame(stream, message):
+    stream.write(encode(message))
+    stream.flush()
+
+
+def error(error_type, message, stderr=''):
+    return {"ok": False, "error": message, "error_type": error_type, "stderr": stderr}
@@ -0,0 +1,161 @@
+"""
+Memory-mapped export format for the tools' Random Forests.
+
+Unpickling a RandomForestClassifier rebuilds every tree: sklearn copies each
+tree's node and value arrays into freshly malloc'd buffers, so load time and
+per-process memory grow with n_estimators (joblib's mmap_mode cannot help,
+the copy happens in Tree.__setstate__).
+
+export_forest() flattens all trees into a handful of uncompressed .npy files:
+
+    <model>.mmap/
+        meta.json       classes, feature names, depth, source file stamp
+        left.npy        children (global node ids, -1 for leaves)
+        right.npy
+        feature.npy
+        threshold.npy
+        value.npy       per-node class probabilities
+        roots.npy       root node id of each tree
+
+FlatForest opens them with np.load(mmap_mode='r'): loading is a few mmap()
+calls whatever the forest size, sklearn is not even imported, and every
+process on the host shares the same page-cache copy. Predictions match
+sklearn's predict_proba (checked on export).
+"""
+import os
+import json
+import numpy as np
+
+ARRAYS = ('left', 'right', 'feature', 'threshold', 'value', 'roots')
+FORMAT_VERSION = 1
+
+
+def mmap_dir(artifact_path):
+    return os.path.splitext(artifact_path)[0] + '.mmap'
+
+
+def is_exportable(model):
+    estimators = getattr(model, 'estimators_', None)
+    return (
+        hasattr(model, 'classes_') and hasattr(model, 'predict_proba') and bool(estimators)
+        and all(hasattr(tree, 'tree_') for tree in estimators)
+        and getattr(model, 'n_outputs_', 1) == 1
+    )
+
+
+def export_forest(model, artifact_path):
+    """Writes the flattened forest next to `artifact_path`; returns the directory."""
+    lefts, rights, features, thresholds, values, roots = [], [], [], [], [], []
+    offset = 0
+    for estimator in model.estimators_:
+        tree = estimator.tree_
+        left = tree.children_left.astype(np.int64)
+        right = tree.children_right.astype(np.int64)
+        leaf = left == -1
+        lefts.append(np.where(leaf, -1, left + offset))
+        rights.append(np.where(leaf, -1, right + offset))
+        features.append(tree.feature.astype(np.int64))
+        thresholds.append(tree.threshold.astype(np.float64))
+        value = tree.value[:, 0, :].astype(np.float64)
+        totals = value.sum(axis=1, keepdims=True)
+        totals[totals == 0] = 1.0
+        values.append(value / totals)
+        roots.append(offset)
+        offset += tree.node_count
+
+    target = mmap_dir(artifact_path)
+    tmp_target = f"{target}.tmp{os.getpid()}"
+    os.makedirs(tmp_target, exist_ok=True)
+    arrays = {
+        'left': np.concatenate(lefts),
+        'right': np.concatenate(rights),
+        'feature': np.concatenate(features),
+        'threshold': np.concatenate(thresholds),
+        'value': np.concatenate(values),
+        'roots': np.asarray(roots, dtype=np.int64),
+    }
+    for name, array in arrays.items():
+        np.save(os.path.join(tmp_target, f"{name}.npy"), array)
+
+    source = os.stat(artifact_path)
+    meta = {
+        "format_version": FORMAT_VERSION,
+        "classes": model.classes_.tolist(),
+        "feature_names_in": list(getattr(model, 'feature_names_in_', [])),
+        "n_features_in": int(model.n_features_in_),
+        "max_depth": int(max(estimator.tree_.max_depth for estimator in model.estimators_)),
+        "source_size": source.st_size,
+        "source_mtime_ns": source.st_mtime_ns,
+    }
+    with open(os.path.join(tmp_target, 'meta.json'), 'w') as f:
+        json.dump(meta, f)
+
+    # Swap the whole directory in: running processes keep their maps of the old files
+    if os.path.isdir(target):
+        old_target = f"{target}.old{os.getpid()}"
+        os.rename(target, old_target)
+        os.rename(tmp_target, target)
+        for name in os.listdir(old_target):
+            os.unlink(os.path.join(old_target, name))
+        os.rmdir(old_target)
+    else:
+        os.rename(tmp_target, target)
+    return target
+
+
+def is_current(artifact_path):
+    """True when a flattened copy exists and was exported from the artifact as it is now."""
+    meta_path = os.path.join(mmap_dir(artifact_path), 'meta.json')
+    try:
+        with open(meta_path) as f:
+            meta = json.load(f)
+        source = os.stat(artifact_path)
+    except (OSError, ValueError):
+        return False
+    return (
+        meta.get('format_version') == FORMAT_VERSION
+        and meta.get('source_size') == source.st_size
+        and meta.get('source_mtime_ns') == source.st_mtime_ns
+    )
+
+
+class FlatForest:
+    """Read-only stand-in for a fitted RandomForestClassifier: predict() and predict_proba() only."""
+
+    def __init__(self, directory):
+        with open(os.path.join(directory, 'meta.json')) as f:
+            meta = json.load(f)
+        self.classes_ = np.asarray(meta['classes'])
+        self.n_features_in_ = meta['n_features_in']
+        if meta['feature_names_in']:
+            self.feature_names_in_ = np.asarray(meta['feature_names_in'], dtype=object)
+        self.max_depth = meta['max_depth']
+        for name in ARRAYS:
+            setattr(self, f"_{name}", np.load(os.path.join(directory, f"{name}.npy"), mmap_mode='r'))
+
+    def _as_matrix(self, X):
+        if hasattr(X, 'toarray'):
+            X = X.toarray()
+        # sklearn's trees compare float32 inputs against float64 thresholds
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim != 2 or X.shape[1] != self.n_features_in_:
+            raise ValueError(f"X has {X.shape[-1]} features, but the model expects {self.n_features_in_}.")
+        return X
+
+    def predict_proba(self, X):
+        X = self._as_matrix(X)
+        rows = np.arange(X.shape[0])[np.newaxis, :]
+        # One walk for all trees and all rows at once: node[t, i] is row i's position in tree t
+        node = np.repeat(np.asarray(self._roots)[:, np.newaxis], X.shape[0], axis=1)
+        for _ in range(self.max_depth):
+            left = self._left[node]
+            leaf = left == -1
+            if leaf.all():
+                break
+            feature = np.where(leaf, 0, self._feature[node])
+            go_left = X[rows, feature] <= self._threshold[node]
+            node = np.where(leaf, node, np.where(go_left, left, self._right[node]))
+        return np.asarray(self._value[node]).mean(axis=0)
+
+    def predict(self, X):
+        return self.classes_[np.argmax(self.predict_proba(X), axis=1)]
@@ -0,0 +1,169 @@
+"""
+Process-wide registry of the backend tools' model artifacts.
+
+Tools load their joblib/pickle files through load_artifact(). In a plain
+`python main.py` run that is just a cached load, but the web app can call
+preload() in the gunicorn master (`--preload` with PRELOAD_MODELS=true):
+every artifact is then read once before the fork and the workers share
+those memory pages copy-on-write instead of each holding its own copy of
+the Random Forests.
+
+An artifact whose file changed after it was loaded (a retrain) is loaded
+again on its next use.
+
+Random Forests can also be exported to a memory-mapped format
+(backend/mmap_forest.py) that loads in milliseconds whatever n_estimators:
+
+    python -m backend.model_registry export
+
+Other joblib artifacts are loaded with mmap_mode='r', so their large numpy
+arrays are mapped from the page cache instead of copied into the heap.
+Set MODEL_MMAP=false to always unpickle normally.
+"""
+import os
+import gc
+import glob
+import time
+import pickle
+import shutil
+import logging
+import threading
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+ARTIFACT_PATTERNS = ('*/model_files/*.joblib', '*/model_files/*.pkl', '*/*.joblib', '*/*.pkl')
+
+_artifacts = {}  # abs path -> (mtime_ns, object)
+_stats = {}      # abs path -> {"file_mb", "memory_mb", "load_seconds"}
+_lock = threading.Lock()
+
+MODEL_MMAP = os.getenv('MODEL_MMAP', 'true').lower() == 'true'
+
+
+def _read(path, mmap=MODEL_MMAP):
+    from . import mmap_forest
+    if mmap and mmap_forest.is_current(path):
+        return mmap_forest.FlatForest(mmap_forest.mmap_dir(path))
+    if path.endswith('.pkl'):
+        with open(path, 'rb') as f:
+            return pickle.load(f)
+    from joblib import load
+    return load(path, mmap_mode='r' if mmap else None)
+
+
+def _rss_bytes():
+    # Resident set size from /proc (Linux); None elsewhere
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def load_artifact(path):
+    """Returns the unpickled artifact at `path`, reading the file only when it is new or has changed."""
+    path = os.path.abspath(path)
+    mtime_ns = os.stat(path).st_mtime_ns  # FileNotFoundError propagates like joblib.load's
+    entry = _artifacts.get(path)
+    if entry is not None and entry[0] == mtime_ns:
+        return entry[1]
+    with _lock:
+        entry = _artifacts.get(path)
+        if entry is not None and entry[0] == mtime_ns:
+            return entry[1]
+        rss_before = _rss_bytes()
+        started = time.perf_counter()
+        artifact = _read(path)
+        elapsed = time.perf_counter() - started
+        rss_after = _rss_bytes()
+        _artifacts[path] = (mtime_ns, artifact)
+        _stats[path] = {
+            "file_mb": round(os.path.getsize(path) / 1048576, 2),
+            "memory_mb": round((rss_after - rss_before) / 1048576, 2) if rss_before is not None else None,
+            "load_seconds": round(elapsed, 3),
+        }
+        return artifact
+
+
+def discover():
+    """All model artifacts shipped next to the backend tools."""
+    paths = set()
+    for pattern in ARTIFACT_PATTERNS:
+        paths.update(glob.glob(os.path.join(BACKEND_DIR, pattern)))
+    return sorted(paths)
+
+
+def preload():
+    """
+    Loads every discovered artifact now and logs its size and load time.
+    Meant for the gunicorn master before it forks; returns the stats.
+    """
+    started = time.perf_counter()
+    try:
+        # Import sklearn up front so its own footprint is not billed to the first artifact
+        import joblib, sklearn.ensemble, sklearn.feature_extraction.text  # noqa: F401
+    except ImportError:
+        pass
+    for path in discover():
+        try:
+            load_artifact(path)
+        except Exception as e:
+            logging.warning(f"⚠️ Could not preload {os.path.relpath(path, BACKEND_DIR)}: {e}")
+            continue
+        stats = _stats[path]
+        memory = f"{stats['memory_mb']} MB resident" if stats['memory_mb'] is not None else f"{stats['file_mb']} MB on disk"
+        logging.info(f"✅ Preloaded {os.path.relpath(path, BACKEND_DIR)}: {memory}, {stats['load_seconds']}s")
+
+    # Move everything loaded so far out of the GC's reach: collections in the
+    # workers would otherwise write to (and un-share) these pages
+    gc.collect()
+    gc.freeze()
+
+    total_memory = sum(s['memory_mb'] or 0 for s in _stats.values())
+    logging.info(f"✅ Preloaded {len(_stats)} model artifacts ({total_memory:.1f} MB) in {time.perf_counter() - started:.2f}s")
+    return stats_report()
+
+
+def stats_report():
+    return {os.path.relpath(path, BACKEND_DIR): dict(stats) for path, stats in _stats.items()}
+
+
+def export(paths=None):
+    """
+    Writes the memory-mapped copy of every exportable forest and checks that
+    it predicts exactly like the original. Returns {artifact: status}.
+    """
+    import numpy as np
+    from . import mmap_forest
+
+    results = {}
+    for path in paths or discover():
+        name = os.path.relpath(path, BACKEND_DIR)
+        started = time.perf_counter()
+        model = _read(path, mmap=False)
+        pickle_seconds = time.perf_counter() - started
+        if not mmap_forest.is_exportable(model):
+            results[name] = "skipped (not a forest classifier)"
+            continue
+
+        target = mmap_forest.export_forest(model, path)
+        started = time.perf_counter()
+        flat = mmap_forest.FlatForest(target)
+        mmap_seconds = time.perf_counter() - started
+
+        sample = np.random.default_rng(0).normal(scale=10.0, size=(256, model.n_features_in_))
+        if not np.allclose(flat.predict_proba(sample), model.predict_proba(sample)):
+            shutil.rmtree(target, ignore_errors=True)
+            results[name] = "FAILED: predictions differ from the original model, export removed"
+            continue
+        results[name] = f"exported to {os.path.relpath(target, BACKEND_DIR)} (load {pickle_seconds:.3f}s -> {mmap_seconds:.4f}s)"
+    return results
+
+
+if __name__ == "__main__":
+    import sys
+
+    if sys.argv[1:2] != ['export']:
+        sys.stderr.write("Usage: python -m backend.model_registry export [artifact ...]\n")
+        sys.exit(1)
+    for artifact, status in export([os.path.abspath(p) for p in sys.argv[2:]] or None).items():
+        print(f"{artifact}: {status}")
@@ -0,0 +1,119 @@
+"""
+Worker process for a backend tool.
+
+Started by tool_workers.py (in the app root) as:
+
+    python tool_worker.py <Tool_Folder>          # warm pool worker
+    python tool_worker.py <Tool_Folder> --once   # one-shot run (pooling disabled or unavailable)
+
+The worker imports <Tool_Folder>/main.py ONCE (so pandas/sklearn and the
+model artifacts stay loaded) and then serves requests over stdin/stdout
+using the frames described in framing.py. A pool worker first sends a
+{"ready": true} frame and then answers requests until stdin closes; a
+one-shot run answers a single request and exits.
+
+Requests call the tool's analyze(input, **options); options the tool's
+analyze() does not accept are dropped. If analyze() takes a `progress`
+argument it gets a progress(stage, **data) callback; each call is sent
+straight away as a {"progress": {"stage": ..., ...}} frame ahead of the reply.
+"""
+import sys
+import os
+import io
+import inspect
+import importlib.util
+import contextlib
+
+import framing
+
+# The tools import backend.model_registry (shared artifacts, mmap forests) from the app root
+APP_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if APP_ROOT not in sys.path:
+    sys.path.append(APP_ROOT)
+
+
+def load_tool(folder):
+    tool_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), folder)
+    # Tools resolve some paths relative to their own folder
+    os.chdir(tool_dir)
+    sys.path.insert(0, tool_dir)
+    spec = importlib.util.spec_from_file_location(f"tool_{folder}", os.path.join(tool_dir, 'main.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def warm_up(module):
+    # Load the model artifacts now instead of on the first request
+    for loader_name in ('load_ml_artifacts', 'load_model'):
+        loader = getattr(module, loader_name, None)
+        if loader:
+            try:
+                with contextlib.redirect_stdout(sys.stderr):
+                    loader()
+            except SystemExit:
+                pass # Missing artifacts are reported per request instead
+
+
+def accepted_options(analyze):
+    parameters = inspect.signature(analyze).parameters
+    if any(p.kind == p.VAR_KEYWORD for p in parameters.values()):
+        return None # **kwargs: everything
+    return set(list(parameters)[1:])
+
+
+def progress_sender(stream):
+    def progress(stage, **data):
+        framing.write_frame(stream, {"progress": dict(data, stage=stage)})
+    return progress
+
+
+def handle(module, request, accepted, stream):
+    if not isinstance(request, dict) or not request.get('input'):
+        return framing.error('BadRequest', "No input provided.")
+    options = request.get('options') or {}
+    if accepted is not None:
+        options = {name: value for name, value in options.items() if name in accepted}
+    if accepted is None or 'progress' in accepted:
+        options['progress'] = progress_sender(stream)
+
+    captured_out = io.StringIO()
+    captured_err = io.StringIO()
+    try:
+        # Tools must never write to the real stdout: it carries the frames
+        with contextlib.redirect_stdout(captured_out), contextlib.redirect_stderr(captured_err):
+            report = module.analyze(request['input'], **options)
+        return {"ok": True, "report": report, "stderr": captured_err.getvalue().strip()}
+    except SystemExit:
+        # Tools call sys.exit(1) after writing the reason to stderr
+        error_output = captured_err.getvalue().strip() or captured_out.getvalue().strip() or 'Unknown backend error.'
+        return framing.error('ToolExit', f"Tool failed: {error_output}", captured_err.getvalue().strip())
+    except Exception as e:
+        return framing.error('ToolError', f"Tool failed: {e}", captured_err.getvalue().strip())
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        sys.stderr.write("ERROR: No tool folder provided.\n")
+        sys.exit(1)
+
+    stdin = sys.stdin.buffer
+    stdout = sys.stdout.buffer
+    once = '--once' in sys.argv[2:]
+
+    tool_module = load_tool(sys.argv[1])
+    analyze_options = accepted_options(tool_module.analyze)
+
+    if once:
+        framing.write_frame(stdout, handle(tool_module, framing.read_frame(stdin), analyze_options, stdout))
+        sys.exit(0)
+
+    warm_up(tool_module)
+    # Readiness frame: the supervisor waits for it before sending work
+    framing.write_frame(stdout, {"ready": True, "pid": os.getpid()})
+
+    while True:
+        request = framing.read_frame(stdin)
+        if request is None:
+            break
+        framing.write_frame(stdout, handle(tool_module, request, analyze_options, stdout))
@@ -0,0 +1,59 @@
+"""
+Import-time report: what does starting the app actually spend?
+
+Runs `python -X importtime -c "import app"` in a fresh interpreter (so
+nothing is already cached in sys.modules) and ranks the modules by their
+cumulative import cost.
+
+    python import_report.py            # top 20 top-level imports of app.py
+    python import_report.py --all 40   # top 40 modules at any depth
+    flask --app app import-report      # same, as a Flask CLI command
+"""
+import os
+import sys
+import subprocess
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def measure(module='app'):
+    """Returns [(module, depth, self_us, cumulative_us)] for a fresh import of `module`."""
+    completed = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=APP_DIR, capture_output=True, text=True
+    )
+    rows = []
+    for line in completed.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip(' ')) - 1) // 2
+        rows.append((name.strip(), depth, int(self_us), int(cumulative_us)))
+    if completed.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{completed.stderr[-2000:]}")
+    return rows
+
+
+def report(module='app', top=20, all_depths=False):
+    rows = measure(module)
+    end = next(i for i, row in enumerate(rows) if row[0] == module and row[1] == 0)
+    start = end
+    while start > 0 and rows[start - 1][1] > 0:
+        start -= 1
+    # -X importtime prints children before their parent: rows[start:end] is the subtree of `module`
+    # (interpreter start-up imports such as site-packages .pth hooks fall outside it)
+    subtree = rows[start:end]
+    total = rows[end][3]
+    # Depth 1 = what `module` imports directly; everything below is attributed to those
+    candidates = subtree if all_depths else [row for row in subtree if row[1] == 1]
+    lines = [f"Import of '{module}': {total / 1000:.1f} ms", f"{'cumulative ms':>14} {'self ms':>9}  module"]
+    for name, depth, self_us, cumulative_us in sorted(candidates, key=lambda row: row[3], reverse=True)[:top]:
+        lines.append(f"{cumulative_us / 1000:>14.1f} {self_us / 1000:>9.1f}  {name}")
+    return '\n'.join(lines)
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    all_depths = '--all' in args
+    numbers = [int(arg) for arg in args if arg.isdigit()]
+    print(report(top=numbers[0] if numbers else 20, all_depths=all_depths))
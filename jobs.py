@@ -0,0 +1,370 @@
+"""
+Background jobs for long-running scans (file uploads).
+
+The upload request only stores the file and enqueues a job; a local thread
+pool runs the tool. Job state lives in a small SQLite table on local disk,
+so any gunicorn worker on the host can answer a /api/jobs/<id> poll, not
+just the one that accepted the upload.
+
+Tools report progress while they run (decoded frames, features done, a
+partial verdict...). Each event is appended to the job_events table, so the
+/api/jobs/<id>/events stream can be served by any worker too. A cancel sets
+a flag on the job; the running work checks job.cancelled() and stops the
+tool process.
+
+submit_async() runs a coroutine as an asyncio task instead of on the thread
+pool (the asgi.py serving mode); the table and the API are the same, and the
+SQLite calls are made from the default thread pool.
+"""
+import os
+import json
+import time
+import uuid
+import asyncio
+import sqlite3
+import logging
+import threading
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+
+FINISHED = (DONE, FAILED, CANCELLED)
+
+# How often a running job re-reads its cancel flag from the shared table
+CANCEL_CHECK_SECONDS = 0.5
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    user_id INTEGER NOT NULL,
+    tool TEXT NOT NULL,
+    input_summary TEXT,
+    status TEXT NOT NULL,
+    result TEXT,
+    error TEXT,
+    owner_pid INTEGER,
+    cancel_requested INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status);
+CREATE INDEX IF NOT EXISTS idx_jobs_created_at ON jobs(created_at);
+CREATE TABLE IF NOT EXISTS job_events (
+    job_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    data TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    PRIMARY KEY (job_id, seq)
+);
+"""
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class JobContext:
+    """Handed to a job's work(): reports progress events and tells it when the job was cancelled."""
+
+    def __init__(self, store, job_id):
+        self.store = store
+        self.job_id = job_id
+        self._cancelled = False
+        self._checked_at = 0.0
+
+    def progress(self, event):
+        """Records one progress event: a JSON-able dict with a 'stage' key."""
+        self.store.add_event(self.job_id, event)
+
+    def cancelled(self):
+        # Cheap enough to call from a read loop: the flag is re-read at most every CANCEL_CHECK_SECONDS
+        now = time.monotonic()
+        if not self._cancelled and now - self._checked_at >= CANCEL_CHECK_SECONDS:
+            self._checked_at = now
+            self._cancelled = self.store.cancel_requested(self.job_id)
+        return self._cancelled
+
+
+class AsyncJobContext(JobContext):
+    """
+    JobContext for a coroutine job: the SQLite reads and writes run on the
+    default thread pool, never on the event loop. progress() and cancelled()
+    stay plain calls (the async tool pool calls them from its read loop):
+    events are written in order by a background task, and cancelled() answers
+    from the last flag read while the next read runs.
+    """
+
+    def __init__(self, store, job_id):
+        super().__init__(store, job_id)
+        self._pending = []
+        self._writer = None
+        self._check = None
+
+    def progress(self, event):
+        self._pending.append(event)
+        if self._writer is None or self._writer.done():
+            self._writer = asyncio.get_running_loop().create_task(self._write_events())
+
+    async def _write_events(self):
+        while self._pending:
+            await asyncio.to_thread(self.store.add_event, self.job_id, self._pending.pop(0))
+
+    async def drain(self):
+        """Waits until every progress event is recorded."""
+        if self._writer is not None:
+            await self._writer
+
+    def cancelled(self):
+        now = time.monotonic()
+        if (not self._cancelled and now - self._checked_at >= CANCEL_CHECK_SECONDS
+                and (self._check is None or self._check.done())):
+            self._checked_at = now
+            self._check = asyncio.get_running_loop().create_task(self.refresh_cancelled())
+        return self._cancelled
+
+    async def refresh_cancelled(self):
+        """Re-reads the cancel flag now; returns it."""
+        if not self._cancelled:
+            self._cancelled = await asyncio.to_thread(self.store.cancel_requested, self.job_id)
+        return self._cancelled
+
+
+class JobStore:
+    def __init__(self, path, max_workers=2, retention_hours=24):
+        self.path = path
+        self.max_workers = max_workers
+        self.retention_seconds = retention_hours * 3600
+        self._executor = None
+        self._executor_pid = None
+        self._events = {}
+        self._tasks = set()
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+            columns = {row['name'] for row in conn.execute("PRAGMA table_info(jobs)")}
+            if 'cancel_requested' not in columns:
+                # jobs.db files created before cancellation existed
+                conn.execute("ALTER TABLE jobs ADD COLUMN cancel_requested INTEGER NOT NULL DEFAULT 0")
+        self.recover()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        conn.execute('PRAGMA journal_mode=WAL')
+        return conn
+
+    def _get_executor(self):
+        # One pool per process: threads do not survive a gunicorn fork
+        with self._lock:
+            if self._executor is None or self._executor_pid != os.getpid():
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='scan-job')
+                self._executor_pid = os.getpid()
+                self._events = {}
+            return self._executor
+
+    def _update(self, job_id, **fields):
+        fields['updated_at'] = time.time()
+        columns = ', '.join(f"{name} = ?" for name in fields)
+        with self._connect() as conn:
+            conn.execute(f"UPDATE jobs SET {columns} WHERE id = ?", (*fields.values(), job_id))
+
+    def _insert(self, user_id, tool, input_summary):
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO jobs (id, user_id, tool, input_summary, status, owner_pid, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (job_id, user_id, tool, input_summary, QUEUED, os.getpid(), now, now)
+            )
+        return job_id
+
+    def submit(self, user_id, tool, input_summary, work):
+        """
+        Records a job and runs work(job) on the background pool, job being a
+        JobContext. work() returns the response dict for the client; ok=False
+        marks the job failed (cancelled if its error_type is 'Cancelled').
+        """
+        executor = self._get_executor()
+        job_id = self._insert(user_id, tool, input_summary)
+        self._events[job_id] = threading.Event()
+        executor.submit(self._run, job_id, work)
+        return job_id
+
+    async def submit_async(self, user_id, tool, input_summary, work):
+        """
+        submit() for a coroutine function work(job), run as a task on the
+        current event loop; job is an AsyncJobContext.
+        """
+        job_id = await asyncio.to_thread(self._insert, user_id, tool, input_summary)
+        task = asyncio.get_running_loop().create_task(self._run_async(job_id, work))
+        # The loop only keeps weak references to tasks
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return job_id
+
+    def _run(self, job_id, work):
+        self._update(job_id, status=RUNNING)
+        try:
+            self._finish(job_id, work(JobContext(self, job_id)))
+        except Exception as e:
+            logging.error(f"❌ Job {job_id} crashed: {e}")
+            self._update(job_id, status=FAILED, error=f"Job crashed: {e}")
+        finally:
+            event = self._events.pop(job_id, None)
+            if event:
+                event.set()
+
+    async def _run_async(self, job_id, work):
+        await asyncio.to_thread(self._update, job_id, status=RUNNING)
+        job = AsyncJobContext(self, job_id)
+        try:
+            result = await work(job)
+            await job.drain()
+            await asyncio.to_thread(self._finish, job_id, result)
+        except Exception as e:
+            logging.error(f"❌ Job {job_id} crashed: {e}")
+            await asyncio.to_thread(self._update, job_id, status=FAILED, error=f"Job crashed: {e}")
+
+    def _finish(self, job_id, result):
+        if result.get('ok'):
+            status = DONE
+        elif result.get('error_type') == 'Cancelled':
+            status = CANCELLED
+        else:
+            status = FAILED
+        error = None if status == DONE else result.get('error') or result.get('main_finding')
+        self._update(job_id, status=status, error=error, result=json.dumps(result))
+
+    def get(self, job_id, user_id=None):
+        """Returns the job as a dict, or None if it does not exist (or belongs to someone else)."""
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None or (user_id is not None and row['user_id'] != user_id):
+            return None
+        job = {
+            "ok": True,
+            "job_id": row['id'],
+            "tool": row['tool'],
+            "status": row['status'],
+            "input_summary": row['input_summary'],
+            "cancel_requested": bool(row['cancel_requested']),
+            "created_at": datetime.utcfromtimestamp(row['created_at']).isoformat(),
+            "updated_at": datetime.utcfromtimestamp(row['updated_at']).isoformat(),
+        }
+        if row['status'] not in FINISHED:
+            job['progress'] = self.last_event(job_id)
+        else:
+            job['result'] = json.loads(row['result']) if row['result'] else None
+            job['error'] = row['error']
+        return job
+
+    def wait(self, job_id, user_id, timeout):
+        """Long-poll: returns the job once it finishes or after `timeout` seconds."""
+        deadline = time.monotonic() + timeout
+        event = self._events.get(job_id)
+        if event is not None:
+            event.wait(timeout)
+            return self.get(job_id, user_id)
+        # Job runs in another worker process: poll the shared table
+        while True:
+            job = self.get(job_id, user_id)
+            if job is None or job['status'] in FINISHED or time.monotonic() >= deadline:
+                return job
+            time.sleep(min(0.5, max(0.0, deadline - time.monotonic())))
+
+    def add_event(self, job_id, event):
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO job_events (job_id, seq, data, created_at) "
+                "SELECT ?, COALESCE(MAX(seq), 0) + 1, ?, ? FROM job_events WHERE job_id = ?",
+                (job_id, json.dumps(event), now, job_id)
+            )
+            conn.execute("UPDATE jobs SET updated_at = ? WHERE id = ?", (now, job_id))
+
+    def last_event(self, job_id):
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT data FROM job_events WHERE job_id = ? ORDER BY seq DESC LIMIT 1", (job_id,)
+            ).fetchone()
+        return json.loads(row['data']) if row else None
+
+    def events(self, job_id, after=0):
+        """Progress events recorded after sequence number `after`, as [(seq, event)]."""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT seq, data FROM job_events WHERE job_id = ? AND seq > ? ORDER BY seq", (job_id, after)
+            ).fetchall()
+        return [(row['seq'], json.loads(row['data'])) for row in rows]
+
+    def stream(self, job_id, user_id, after=0, max_seconds=25, poll_seconds=0.25):
+        """
+        Yields ('progress', seq, event), ('status', None, job) on each status
+        change and finally ('done', None, job) once the job finishes. Stops
+        after `max_seconds` without finishing; the client reconnects with the
+        last seq it saw.
+        """
+        deadline = time.monotonic() + max_seconds
+        status = None
+        while True:
+            job = self.get(job_id, user_id)
+            if job is None:
+                return
+            for seq, event in self.events(job_id, after):
+                after = seq
+                yield 'progress', seq, event
+            if job['status'] in FINISHED:
+                yield 'done', None, job
+                return
+            if job['status'] != status:
+                status = job['status']
+                yield 'status', None, job
+            if time.monotonic() >= deadline:
+                return
+            time.sleep(poll_seconds)
+
+    def cancel(self, job_id, user_id):
+        """Asks a queued or running job to stop. Returns the job, or None if it does not exist."""
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET cancel_requested = 1, updated_at = ? WHERE id = ? AND user_id = ? AND status IN (?, ?)",
+                (time.time(), job_id, user_id, QUEUED, RUNNING)
+            )
+        return self.get(job_id, user_id)
+
+    def cancel_requested(self, job_id):
+        with self._connect() as conn:
+            row = conn.execute("SELECT cancel_requested FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return bool(row and row['cancel_requested'])
+
+    def recover(self):
+        """Fails jobs whose owning process died (e.g. a worker restart) and prunes old rows."""
+        now = time.time()
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT id, owner_pid FROM jobs WHERE status IN (?, ?)", (QUEUED, RUNNING)
+            ).fetchall()
+            for row in rows:
+                if row['owner_pid'] != os.getpid() and not _pid_alive(row['owner_pid']):
+                    conn.execute(
+                        "UPDATE jobs SET status = ?, error = ?, updated_at = ? WHERE id = ?",
+                        (FAILED, "Interrupted by a server restart. Please upload the file again.", now, row['id'])
+                    )
+            conn.execute(
+                "DELETE FROM jobs WHERE status IN (?, ?, ?) AND updated_at < ?",
+                (*FINISHED, now - self.retention_seconds)
+            )
+            conn.execute("DELETE FROM job_events WHERE job_id NOT IN (SELECT id FROM jobs)")
@@ -0,0 +1,317 @@
+"""
+Versioned schema migrations for the application database.
+
+`db.create_all()` only creates missing tables: columns and indexes added to
+the models later never reached databases created before them. Migrations are
+numbered steps, each applied once and recorded in `schema_migrations`:
+
+    MIGRATIONS = (
+        (1, "create tables", lambda engine: ...),
+        (2, "add scan_report.search_text", lambda engine: ...),
+    )
+
+Steps must be idempotent (a crash between a step and its record re-runs it)
+and are never edited once released: a change to the models gets a new
+version. `migrate()` holds a Postgres advisory lock (a lock file next to the
+database on SQLite), so the release phase and workers starting at the same
+time apply each step once.
+
+Indexes are built with CREATE INDEX CONCURRENTLY on Postgres, so writes to
+the table carry on while they build; elsewhere they are plain CREATE INDEX.
+
+`drift()` compares the models with the live database (missing tables,
+columns, indexes and foreign keys, extra columns, column types, foreign
+keys pointing at another table, invalid indexes, pending migrations); the app logs it at
+startup and `flask --app app db-status` prints it. `check_foreign_keys()`
+fails init-db outright on a misdirected foreign key: a table created
+elsewhere under a model's name (create_all() keeps it) would make every
+write to it fail.
+"""
+import logging
+from datetime import datetime
+from contextlib import contextmanager
+
+from sqlalchemy import text, inspect, exc, types as sqltypes
+from sqlalchemy.schema import CreateIndex
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+ADVISORY_LOCK_KEY = 724113  # Any constant shared by every process migrating this database
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS schema_migrations (
+    version INTEGER PRIMARY KEY,
+    name VARCHAR(200) NOT NULL,
+    applied_at TIMESTAMP NOT NULL
+)
+"""
+
+
+def applied_versions(engine):
+    with engine.begin() as conn:
+        conn.execute(text(SCHEMA))
+        return {row[0] for row in conn.execute(text("SELECT version FROM schema_migrations"))}
+
+
+@contextmanager
+def migration_lock(engine):
+    """Serializes migrate() across processes: an advisory lock on Postgres, a lock file next to a SQLite database."""
+    if engine.dialect.name == 'postgresql':
+        # Session-level and outside any transaction: CREATE INDEX CONCURRENTLY waits for open transactions
+        conn = engine.connect().execution_options(isolation_level='AUTOCOMMIT')
+        try:
+            conn.execute(text("SELECT pg_advisory_lock(:key)"), {"key": ADVISORY_LOCK_KEY})
+            yield
+        finally:
+            conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": ADVISORY_LOCK_KEY})
+            conn.close()
+    elif engine.dialect.name == 'sqlite' and fcntl and engine.url.database not in (None, '', ':memory:'):
+        with open(f"{engine.url.database}.migrate.lock", 'a') as f:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+    else:
+        # Elsewhere the duplicate-version check in migrate() is the only guard
+        yield
+
+
+def migrate(engine, migrations):
+    """Applies the migrations not recorded yet, in version order. Returns the versions applied."""
+    with migration_lock(engine):
+        done = applied_versions(engine)
+        applied = []
+        for version, name, apply in sorted(migrations, key=lambda migration: migration[0]):
+            if version in done:
+                continue
+            logging.info(f"⏳ Applying migration {version}: {name}")
+            apply(engine)
+            try:
+                with engine.begin() as conn:
+                    conn.execute(
+                        text("INSERT INTO schema_migrations (version, name, applied_at) VALUES (:version, :name, :applied_at)"),
+                        {"version": version, "name": name, "applied_at": datetime.utcnow()}
+                    )
+            except exc.IntegrityError:
+                # Another process applied and recorded it meanwhile (steps are idempotent)
+                logging.info(f"Migration {version} was recorded by another process.")
+                continue
+            applied.append(version)
+            logging.info(f"✅ Migration {version} applied.")
+        return applied
+
+
+# --- DDL HELPERS ---
+def run_outside_transaction(engine, statement):
+    """For statements Postgres refuses inside a transaction block (CREATE INDEX CONCURRENTLY)."""
+    with engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+        conn.execute(text(statement))
+
+
+def _invalid_indexes(engine):
+    """Postgres indexes left INVALID by an interrupted concurrent build."""
+    if engine.dialect.name != 'postgresql':
+        return set()
+    with engine.connect() as conn:
+        return {
+            row[0] for row in conn.execute(text(
+                "SELECT c.relname FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid WHERE NOT i.indisvalid"
+            ))
+        }
+
+
+def create_index(engine, index):
+    """Creates a model index if it is missing, without blocking writes on Postgres."""
+    if engine.dialect.name != 'postgresql':
+        index.create(bind=engine, checkfirst=True)
+        return
+    if index.name in _invalid_indexes(engine):
+        # IF NOT EXISTS would keep the broken index
+        run_outside_transaction(engine, f'DROP INDEX CONCURRENTLY IF EXISTS "{index.name}"')
+    ddl = str(CreateIndex(index, if_not_exists=True).compile(dialect=engine.dialect))
+    run_outside_transaction(engine, ddl.replace('INDEX', 'INDEX CONCURRENTLY', 1))
+
+
+def create_indexes(engine, metadata):
+    for table in metadata.sorted_tables:
+        for index in sorted(table.indexes, key=lambda index: index.name):
+            create_index(engine, index)
+
+
+def add_missing_columns(engine, metadata):
+    """ALTER TABLE ... ADD COLUMN for nullable model columns that tables created earlier lack."""
+    inspector = inspect(engine)
+    preparer = engine.dialect.identifier_preparer
+    with engine.begin() as conn:
+        for table in metadata.sorted_tables:
+            existing = {column['name'] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing and column.nullable:
+                    column_type = column.type.compile(dialect=engine.dialect)
+                    conn.execute(text(
+                        f"ALTER TABLE {preparer.format_table(table)} ADD COLUMN {preparer.format_column(column)} {column_type}"
+                    ))
+
+
+def add_missing_foreign_keys(engine, metadata):
+    """
+    Adds the model foreign keys that tables created earlier lack (a column
+    added by add_missing_columns() comes without its constraint). On Postgres
+    each is added NOT VALID, which only locks the table briefly, and then
+    validated, which scans it without blocking writes. SQLite cannot add a
+    constraint to an existing table, so it is left alone there.
+    """
+    if engine.dialect.name == 'sqlite':
+        return
+    preparer = engine.dialect.identifier_preparer
+    not_valid = ' NOT VALID' if engine.dialect.name == 'postgresql' else ''
+    for table, constraint in missing_foreign_keys(engine, metadata):
+        columns = ', '.join(preparer.quote(column) for column in constraint.column_keys)
+        name = constraint.name or f"{table.name}_{'_'.join(constraint.column_keys)}_fkey"
+        referred = ', '.join(preparer.format_column(element.column) for element in constraint.elements)
+        on_delete = f" ON DELETE {constraint.ondelete}" if constraint.ondelete else ''
+        with engine.begin() as conn:
+            conn.execute(text(
+                f"ALTER TABLE {preparer.format_table(table)} ADD CONSTRAINT {preparer.quote(name)} "
+                f"FOREIGN KEY ({columns}) REFERENCES {preparer.format_table(constraint.referred_table)} ({referred})"
+                f"{on_delete}{not_valid}"
+            ))
+        if not_valid:
+            with engine.begin() as conn:
+                conn.execute(text(f"ALTER TABLE {preparer.format_table(table)} VALIDATE CONSTRAINT {preparer.quote(name)}"))
+
+
+def missing_foreign_keys(engine, metadata):
+    """(table, constraint) for each model foreign key with no live foreign key on the same columns."""
+    missing = []
+    inspector = inspect(engine)
+    tables = set(inspector.get_table_names())
+    for table in metadata.sorted_tables:
+        if table.name not in tables:
+            continue
+        live = {tuple(foreign_key['constrained_columns']) for foreign_key in inspector.get_foreign_keys(table.name)}
+        for constraint in sorted(table.foreign_key_constraints, key=lambda constraint: constraint.column_keys):
+            if tuple(constraint.column_keys) not in live:
+                missing.append((table, constraint))
+    return missing
+
+
+# --- DRIFT ---
+TYPE_FAMILIES = (
+    ('binary', sqltypes.LargeBinary),
+    ('boolean', sqltypes.Boolean),
+    ('datetime', sqltypes.DateTime),
+    ('date', sqltypes.Date),
+    ('integer', sqltypes.Integer),
+    ('number', sqltypes.Numeric),
+    ('text', sqltypes.String),
+)
+
+
+def type_family(column_type):
+    """Coarse storage class of a column type (a TypeDecorator counts as its impl); None if unknown."""
+    if isinstance(column_type, sqltypes.TypeDecorator):
+        column_type = column_type.impl
+    for family, base in TYPE_FAMILIES:
+        if isinstance(column_type, base):
+            return family
+    return None
+
+
+def misdirected_foreign_keys(engine, metadata):
+    """Live foreign keys on a model's columns that reference another table than the models do, one line each."""
+    problems = []
+    inspector = inspect(engine)
+    tables = set(inspector.get_table_names())
+    for table in metadata.sorted_tables:
+        if table.name not in tables:
+            continue
+        expected = {
+            tuple(constraint.column_keys): constraint.referred_table.name
+            for constraint in table.foreign_key_constraints
+        }
+        for foreign_key in inspector.get_foreign_keys(table.name):
+            columns = tuple(foreign_key['constrained_columns'])
+            referred = expected.get(columns)
+            if referred and foreign_key['referred_table'] != referred:
+                problems.append(
+                    f"foreign key {table.name}({', '.join(columns)}) references {foreign_key['referred_table']} (models: {referred})"
+                )
+    return problems
+
+
+def check_foreign_keys(engine, metadata):
+    """Raises RuntimeError when a foreign key references another table than the models do."""
+    problems = misdirected_foreign_keys(engine, metadata)
+    if problems:
+        raise RuntimeError(
+            "The database does not match the models: " + "; ".join(problems)
+            + ". The table was probably created outside the app; fix its foreign key or recreate it."
+        )
+
+
+def drift(engine, metadata, migrations, ignore_columns=()):
+    """
+    Differences between the models and the live database, one line each.
+    ignore_columns: "table.column" names expected in the database only
+    (e.g. generated columns created by a migration).
+    """
+    problems = []
+    inspector = inspect(engine)
+    tables = set(inspector.get_table_names())
+    for table in metadata.sorted_tables:
+        if table.name not in tables:
+            problems.append(f"table {table.name} is missing")
+            continue
+        live_types = {column['name']: column['type'] for column in inspector.get_columns(table.name)}
+        columns = set(live_types)
+        for column in table.columns:
+            if column.name not in columns:
+                problems.append(f"column {table.name}.{column.name} is missing")
+                continue
+            # SQLite column types are advisory (a TEXT column stores bytes just fine)
+            if engine.dialect.name == 'sqlite':
+                continue
+            live, model = type_family(live_types[column.name]), type_family(column.type)
+            if live and model and live != model:
+                problems.append(f"column {table.name}.{column.name} is {live_types[column.name]} (models: {model})")
+        for name in sorted(columns - {column.name for column in table.columns}):
+            if f"{table.name}.{name}" not in ignore_columns:
+                problems.append(f"column {table.name}.{name} is not in the models")
+        indexes = {index['name'] for index in inspector.get_indexes(table.name)}
+        for index in sorted(table.indexes, key=lambda index: index.name):
+            if index.name not in indexes:
+                problems.append(f"index {index.name} on {table.name} is missing")
+    problems.extend(misdirected_foreign_keys(engine, metadata))
+    if engine.dialect.name != 'sqlite':
+        # SQLite tables only get the foreign keys they were created with
+        for table, constraint in missing_foreign_keys(engine, metadata):
+            problems.append(
+                f"foreign key {table.name}({', '.join(constraint.column_keys)}) -> {constraint.referred_table.name} is missing"
+            )
+    for name in sorted(_invalid_indexes(engine)):
+        problems.append(f"index {name} is invalid (interrupted concurrent build)")
+    done = applied_versions(engine)
+    for version, name, _ in sorted(migrations, key=lambda migration: migration[0]):
+        if version not in done:
+            problems.append(f"migration {version} ({name}) is not applied")
+    return problems
+
+
+def log_drift(engine, metadata, migrations, ignore_columns=()):
+    try:
+        problems = drift(engine, metadata, migrations, ignore_columns)
+    except Exception as e:
+        logging.warning(f"⚠️ Could not check the database schema: {e}")
+        return None
+    for problem in problems:
+        logging.warning(f"⚠️ Schema drift: {problem}")
+    if any(problem.startswith('migration ') for problem in problems):
+        logging.warning("⚠️ Run `flask --app app init-db` to apply the pending migrations.")
+    elif problems:
+        logging.warning("⚠️ The database differs from the models outside any migration: add one for the change.")
+    return problems
@@ -0,0 +1,262 @@
+"""
+Cold storage for old ScanReport rows.
+
+`flask --app app archive-reports` moves reports older than
+REPORT_RETENTION_DAYS out of the database into one file per month:
+
+    <REPORT_ARCHIVE_FOLDER>/2025-03.ndjson.gz
+
+Each archiving run appends its rows as separate gzip members of at most
+MEMBER_ROWS reports (one JSON report per line); the file as a whole is still
+a plain .ndjson.gz for zcat and friends. A SQLite index next to the files
+keeps the summary columns of every archived report plus the offset and
+length of the member that holds it, so one report is found by id (or a user's
+reports listed) without decompressing more than a single member.
+
+Archiving is at-least-once: when a run dies between writing a member and
+deleting the rows from the database, the next run archives them again and the
+index points at the newer copy.
+
+    REPORT_RETENTION_DAYS=365
+    REPORT_ARCHIVE_FOLDER=<STATE_FOLDER>/report_archive
+"""
+import os
+import json
+import gzip
+import zlib
+import sqlite3
+from datetime import datetime
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+MEMBER_ROWS = 200
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS archived_reports (
+    id INTEGER PRIMARY KEY,
+    user_id INTEGER NOT NULL,
+    tool_name TEXT NOT NULL,
+    input_data_summary TEXT,
+    risk_level TEXT,
+    main_finding TEXT,
+    scan_date TEXT NOT NULL,
+    file TEXT NOT NULL,
+    member_offset INTEGER NOT NULL,
+    member_length INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_archived_user_date ON archived_reports(user_id, scan_date, id);
+"""
+
+SUMMARY_COLUMNS = ('id', 'user_id', 'tool_name', 'input_data_summary', 'risk_level', 'main_finding', 'scan_date')
+
+
+class ReportArchive:
+    def __init__(self, folder):
+        self.folder = folder
+        self.index_path = os.path.join(folder, 'index.db')
+        os.makedirs(folder, exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.index_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        conn.execute('PRAGMA journal_mode=WAL')
+        return conn
+
+    # --- WRITING ---
+    def append(self, rows):
+        """
+        Archives ScanReport column dicts (report_data as JSON text, scan_date
+        as datetime). Returns once the rows are on disk and indexed; the caller
+        deletes them from the database afterwards.
+        """
+        by_month = {}
+        for row in rows:
+            by_month.setdefault(row['scan_date'].strftime('%Y-%m'), []).append(row)
+        entries = []
+        for month, month_rows in sorted(by_month.items()):
+            file_name = f"{month}.ndjson.gz"
+            for start in range(0, len(month_rows), MEMBER_ROWS):
+                members = month_rows[start:start + MEMBER_ROWS]
+                offset, length = self._append_member(file_name, members)
+                entries.extend(
+                    tuple(_summary_value(row, column) for column in SUMMARY_COLUMNS) + (file_name, offset, length)
+                    for row in members
+                )
+        with self._connect() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO archived_reports "
+                "(id, user_id, tool_name, input_data_summary, risk_level, main_finding, scan_date, file, member_offset, member_length) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                entries
+            )
+        return len(entries)
+
+    def _append_member(self, file_name, rows):
+        lines = ''.join(json.dumps(dict(row, scan_date=row['scan_date'].isoformat())) + '\n' for row in rows)
+        data = gzip.compress(lines.encode('utf-8'), compresslevel=9, mtime=0)
+        with open(os.path.join(self.folder, file_name), 'ab') as f:
+            if fcntl:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                offset = f.seek(0, os.SEEK_END)
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            finally:
+                if fcntl:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+        return offset, len(data)
+
+    # --- READING ---
+    def get(self, report_id, user_id=None):
+        """The archived report as a ScanReport column dict, or None (also when it belongs to another user)."""
+        with self._connect() as conn:
+            entry = conn.execute(
+                "SELECT user_id, file, member_offset, member_length FROM archived_reports WHERE id = ?", (report_id,)
+            ).fetchone()
+        if entry is None or (user_id is not None and entry['user_id'] != user_id):
+            return None
+        try:
+            with open(os.path.join(self.folder, entry['file']), 'rb') as f:
+                f.seek(entry['member_offset'])
+                member = f.read(entry['member_length'])
+        except OSError:
+            return None
+        for line in zlib.decompress(member, wbits=31).decode('utf-8').splitlines():
+            row = json.loads(line)
+            if row['id'] == report_id:
+                row['scan_date'] = datetime.fromisoformat(row['scan_date'])
+                return row
+        return None
+
+    def user_reports(self, user_id, limit=50, before=None, tool=None, risk=None, date_from=None, date_to=None):
+        """
+        Summary columns of a user's archived reports, newest first, from the
+        index alone. before=(scan_date, id) continues after a previous page;
+        date_to is exclusive.
+        """
+        clauses, params = ["user_id = ?"], [user_id]
+        if tool:
+            clauses.append("tool_name = ?")
+            params.append(tool)
+        if risk:
+            clauses.append("risk_level = ?")
+            params.append(risk)
+        if date_from:
+            clauses.append("scan_date >= ?")
+            params.append(date_from.isoformat())
+        if date_to:
+            clauses.append("scan_date < ?")
+            params.append(date_to.isoformat())
+        if before:
+            clauses.append("(scan_date, id) < (?, ?)")
+            params.extend([before[0].isoformat(), before[1]])
+        with self._connect() as conn:
+            rows = conn.execute(
+                f"SELECT {', '.join(SUMMARY_COLUMNS)} FROM archived_reports WHERE {' AND '.join(clauses)} "
+                "ORDER BY scan_date DESC, id DESC LIMIT ?",
+                params + [limit]
+            ).fetchall()
+        return [dict(row, scan_date=datetime.fromisoformat(row['scan_date'])) for row in rows]
+
+    def iter_reports(self, user_id=None, date_from=None, date_to=None, tool=None):
+        """
+        Full archived reports (as from get()), member by member, oldest member
+        first: memory stays at one member however much is exported. date_to is exclusive.
+        """
+        clauses, params = ["1 = 1"], []
+        if user_id is not None:
+            clauses.append("user_id = ?")
+            params.append(user_id)
+        if tool:
+            clauses.append("tool_name = ?")
+            params.append(tool)
+        if date_from:
+            clauses.append("scan_date >= ?")
+            params.append(date_from.isoformat())
+        if date_to:
+            clauses.append("scan_date < ?")
+            params.append(date_to.isoformat())
+        with self._connect() as conn:
+            members = conn.execute(
+                "SELECT file, member_offset, member_length, group_concat(id) AS ids FROM archived_reports "
+                f"WHERE {' AND '.join(clauses)} GROUP BY file, member_offset, member_length "
+                "ORDER BY min(scan_date), file, member_offset",
+                params
+            ).fetchall()
+        for member in members:
+            ids = {int(report_id) for report_id in member['ids'].split(',')}
+            try:
+                with open(os.path.join(self.folder, member['file']), 'rb') as f:
+                    f.seek(member['member_offset'])
+                    data = f.read(member['member_length'])
+            except OSError:
+                continue
+            rows = []
+            # Rows the index does not point at here are stale copies from a re-run, or filtered out
+            for line in zlib.decompress(data, wbits=31).decode('utf-8').splitlines():
+                row = json.loads(line)
+                if row['id'] in ids:
+                    row['scan_date'] = datetime.fromisoformat(row['scan_date'])
+                    rows.append(row)
+            rows.sort(key=lambda row: (row['scan_date'], row['id']))
+            yield from rows
+
+    def summary_counts(self):
+        """
+        Archived reports per (user_id, tool_name, risk_level, day) from the
+        index alone, as (user_id, tool_name, risk_level, day, count, last scan_date).
+        """
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT user_id, tool_name, risk_level, substr(scan_date, 1, 10) AS day, COUNT(*), MAX(scan_date) "
+                "FROM archived_reports GROUP BY user_id, tool_name, risk_level, day"
+            ).fetchall()
+        for user_id, tool_name, risk_level, day, count, last in rows:
+            yield user_id, tool_name, risk_level, datetime.strptime(day, '%Y-%m-%d').date(), count, datetime.fromisoformat(last)
+
+    def newest_scan_date(self):
+        with self._connect() as conn:
+            newest = conn.execute("SELECT MAX(scan_date) FROM archived_reports").fetchone()[0]
+        return datetime.fromisoformat(newest) if newest else None
+
+    def archived_ids(self, report_ids):
+        """The ids among `report_ids` that are archived."""
+        report_ids = list(report_ids)
+        found = set()
+        with self._connect() as conn:
+            for start in range(0, len(report_ids), 500):
+                chunk = report_ids[start:start + 500]
+                found.update(row[0] for row in conn.execute(
+                    f"SELECT id FROM archived_reports WHERE id IN ({', '.join('?' * len(chunk))})", chunk
+                ))
+        return found
+
+    def forget_user(self, user_id):
+        """
+        Drops a deleted user's reports from the index, which makes them
+        unreachable; the bytes stay in the monthly files until those are removed.
+        """
+        with self._connect() as conn:
+            return conn.execute("DELETE FROM archived_reports WHERE user_id = ?", (user_id,)).rowcount
+
+    def stats(self):
+        with self._connect() as conn:
+            reports = conn.execute("SELECT COUNT(*) FROM archived_reports").fetchone()[0]
+        files = [name for name in os.listdir(self.folder) if name.endswith('.ndjson.gz')]
+        return {
+            "reports": reports,
+            "files": len(files),
+            "bytes": sum(os.path.getsize(os.path.join(self.folder, name)) for name in files),
+        }
+
+
+def _summary_value(row, column):
+    value = row.get(column)
+    # ISO strings sort chronologically, which the (scan_date, id) keyset relies on
+    return value.isoformat() if isinstance(value, datetime) else value
@@ -0,0 +1,230 @@
+"""
+Write-behind persistence of ScanReport rows.
+
+Saving a report used to add + commit in the request: a full round trip to
+Postgres on every scan, and the report was lost if the database blipped.
+ReportWriter queues the rows in memory instead; a background thread inserts
+them with one multi-row INSERT once `flush_rows` are waiting or the oldest
+has waited `flush_seconds`.
+
+When the database cannot be reached, the batch is appended to a local spool
+file (one JSON row per line) and replayed - by one worker at a time - once
+inserts work again. Rows the database rejects for good (e.g. their user was
+deleted meanwhile) are logged and dropped instead of being retried forever.
+Replay is at-least-once: a crash in the middle of one can insert a batch twice.
+
+Queued rows are flushed at exit; a hard kill loses at most `flush_seconds`
+worth of reports.
+
+    REPORT_WRITE_BEHIND=true      false: insert in the request (still spooling on failure)
+    REPORT_FLUSH_ROWS=200
+    REPORT_FLUSH_SECONDS=1.0
+    REPORT_SPOOL_PATH=<STATE_FOLDER>/report_spool.ndjson
+"""
+import os
+import json
+import time
+import atexit
+import logging
+import threading
+from datetime import datetime
+
+from sqlalchemy import exc as sa_exc
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+REPLAY_SECONDS = 30
+
+
+def is_transient(error):
+    """True when the insert failed because the database is unreachable, not because it refused the rows."""
+    return (
+        isinstance(error, (sa_exc.OperationalError, sa_exc.InterfaceError, sa_exc.DisconnectionError, sa_exc.TimeoutError))
+        or getattr(error, 'connection_invalidated', False)
+    )
+
+
+class _SpoolLock:
+    def __init__(self, f):
+        self.f = f
+
+    def __enter__(self):
+        if fcntl:
+            fcntl.flock(self.f.fileno(), fcntl.LOCK_EX)
+        return self.f
+
+    def __exit__(self, *exc):
+        if fcntl:
+            fcntl.flock(self.f.fileno(), fcntl.LOCK_UN)
+        return False
+
+
+class ReportWriter:
+    def __init__(self, insert, spool_path, flush_rows=200, flush_seconds=1.0, enabled=True):
+        """insert(rows) writes a list of ScanReport column dicts in one statement and raises on failure."""
+        self.insert = insert
+        self.spool_path = spool_path
+        self.flush_rows = flush_rows
+        self.flush_seconds = flush_seconds
+        self.enabled = enabled
+        self._rows = []
+        self._oldest = None
+        self._cond = threading.Condition()
+        self._write_lock = threading.Lock()
+        self._thread_pid = None
+        self._last_replay = 0.0
+        os.makedirs(os.path.dirname(os.path.abspath(spool_path)), exist_ok=True)
+        atexit.register(self.flush)
+
+    def submit(self, *rows):
+        """Queues ScanReport rows; returns at once."""
+        if not rows:
+            return
+        if not self.enabled:
+            self._write(list(rows))
+            return
+        self._ensure_thread()
+        with self._cond:
+            first = not self._rows
+            if first:
+                self._oldest = time.monotonic()
+            self._rows.extend(rows)
+            if first or len(self._rows) >= self.flush_rows:
+                # Wake the flusher to (re)compute its deadline
+                self._cond.notify()
+
+    def _ensure_thread(self):
+        # One flusher per process: threads do not survive a gunicorn fork
+        if self._thread_pid == os.getpid():
+            return
+        with self._cond:
+            if self._thread_pid != os.getpid():
+                self._rows = []
+                self._thread_pid = os.getpid()
+                threading.Thread(target=self._run, name='report-writer', daemon=True).start()
+
+    def _take_due(self):
+        with self._cond:
+            while True:
+                if self._rows:
+                    wait = self._oldest + self.flush_seconds - time.monotonic()
+                    if wait <= 0 or len(self._rows) >= self.flush_rows:
+                        batch, self._rows = self._rows, []
+                        return batch
+                else:
+                    wait = REPLAY_SECONDS
+                    if self.spooled_bytes() and time.monotonic() - self._last_replay >= REPLAY_SECONDS:
+                        return []
+                self._cond.wait(wait)
+
+    def _run(self):
+        while True:
+            batch = self._take_due()
+            try:
+                if batch:
+                    self._write(batch)
+                else:
+                    self.replay()
+            except Exception as e:
+                logging.error(f"❌ Report writer: {e}")
+
+    def flush(self):
+        """Writes every queued row now (at exit, or from a CLI command)."""
+        with self._cond:
+            batch, self._rows = self._rows, []
+        if batch:
+            self._write(batch)
+
+    def _write(self, rows):
+        with self._write_lock:
+            try:
+                self.insert(rows)
+            except Exception as e:
+                unsaved = rows if is_transient(e) else self._insert_one_by_one(rows)
+                if unsaved:
+                    logging.warning(f"⚠️ Database unreachable, spooling {len(unsaved)} report(s): {e}")
+                    self._spool(unsaved)
+                    return False
+        # Inserts work: this is the moment to catch up on anything spooled earlier
+        if self.spooled_bytes():
+            self.replay()
+        return True
+
+    def _insert_one_by_one(self, rows):
+        """
+        The batch was refused: keeps the good rows and drops only the offending
+        ones. Returns the rows left unsaved because the database went away.
+        """
+        for i, row in enumerate(rows):
+            try:
+                self.insert([row])
+            except Exception as e:
+                if is_transient(e):
+                    return rows[i:]
+                logging.error(f"❌ Dropping report of user {row.get('user_id')} for {row.get('tool_name')}: {e}")
+        return []
+
+    # --- SPOOL FILE ---
+    def _spool(self, rows):
+        lines = ''.join(json.dumps(dict(row, scan_date=row['scan_date'].isoformat())) + '\n' for row in rows)
+        with open(self.spool_path, 'a') as f, _SpoolLock(f):
+            f.write(lines)
+            f.flush()
+            os.fsync(f.fileno())
+
+    def spooled_bytes(self):
+        try:
+            return os.path.getsize(self.spool_path)
+        except OSError:
+            return 0
+
+    def replay(self):
+        """Inserts the spooled rows in batches; whatever still fails stays in the file."""
+        self._last_replay = time.monotonic()
+        if not self.spooled_bytes():
+            return 0
+        replayed = 0
+        with open(self.spool_path, 'r+') as f, _SpoolLock(f):
+            rows = []
+            for line in f:
+                try:
+                    row = json.loads(line)
+                    row['scan_date'] = datetime.fromisoformat(row['scan_date'])
+                except (ValueError, KeyError, TypeError):
+                    # A line torn by a crash mid-append
+                    if line.strip():
+                        logging.error(f"❌ Skipping unreadable spooled report: {line[:200]!r}")
+                    continue
+                rows.append(row)
+            remaining = []
+            for start in range(0, len(rows), self.flush_rows):
+                batch = rows[start:start + self.flush_rows]
+                try:
+                    self.insert(batch)
+                    replayed += len(batch)
+                except Exception as e:
+                    if is_transient(e):
+                        remaining = rows[start:]
+                        break
+                    unsaved = self._insert_one_by_one(batch)
+                    if unsaved:
+                        remaining = unsaved + rows[start + self.flush_rows:]
+                        break
+            # Rewritten in place under the lock: appenders wait for it
+            f.seek(0)
+            f.truncate()
+            for row in remaining:
+                f.write(json.dumps(dict(row, scan_date=row['scan_date'].isoformat())) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        if replayed:
+            logging.info(f"✅ Replayed {replayed} spooled report(s).")
+        return replayed
+
+    def stats(self):
+        with self._cond:
+            queued = len(self._rows)
+        return {"queued": queued, "spooled_bytes": self.spooled_bytes()}
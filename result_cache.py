@@ -0,0 +1,236 @@
+"""
+Result cache for tool scans.
+
+Analysts rescan the same URLs, e-mails and files again and again. A report
+is cached under (tool, canonical input, model fingerprint), where the
+fingerprint changes whenever the tool's code or model artifacts change, so a
+retrained model never serves stale verdicts.
+
+Backends (RESULT_CACHE_URL):
+    sqlite:///instance/result_cache.db    default; shared by every worker on the host
+    redis://localhost:6379/0               needs the `redis` package
+    off                                    disables caching
+
+Entries expire after RESULT_CACHE_TTL_SECONDS; the SQLite backend also keeps
+at most RESULT_CACHE_MAX_ENTRIES, evicting the least recently used. Tools in
+UNCACHED_TOOLS (the password analyzer) are never cached.
+"""
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from urllib.parse import urlsplit, urlunsplit
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+ARTIFACT_EXTENSIONS = ('.joblib', '.pkl', '.h5', '.pt', '.onnx')
+SKIP_DIRS = {'__pycache__', 'data'}
+FINGERPRINT_RECHECK_SECONDS = 30
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    key TEXT PRIMARY KEY,
+    tool TEXT NOT NULL,
+    value TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_results_last_used ON results(last_used);
+"""
+
+
+# --- INPUT CANONICALIZATION ---
+def canonical_url(raw):
+    value = raw.strip()
+    try:
+        parts = urlsplit(value)
+    except ValueError:
+        return value
+    if not parts.scheme or not parts.netloc:
+        return value
+    # Scheme and host are case-insensitive; path and query are not
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path or '/', parts.query, ''))
+
+
+def canonical_json(raw):
+    try:
+        return json.dumps(json.loads(raw), sort_keys=True, separators=(',', ':'))
+    except (TypeError, ValueError):
+        return raw.strip()
+
+
+CANONICALIZERS = {
+    'phishing-detector': canonical_url,
+    'fake-login-detector': canonical_url,
+    'dark-web-checker': lambda raw: raw.strip().lower(),
+    'bughunter': canonical_json,
+    'network-analyzer': canonical_json,
+    'ueba-analyzer': canonical_json,
+    'forensics-nlp': lambda raw: raw.strip(),
+}
+
+
+# Reports echo their input (input_received): these tools' inputs must never be written to the cache
+UNCACHED_TOOLS = ('password-analyzer',)
+
+
+def canonicalize(tool, raw):
+    """Normalizes an input so trivially different spellings share one cache entry."""
+    return CANONICALIZERS.get(tool, lambda value: value)(raw or '')
+
+
+# --- MODEL FINGERPRINTS ---
+_fingerprints = {}
+_fingerprints_lock = threading.Lock()
+
+
+def _compute_fingerprint(paths):
+    sha256 = hashlib.sha256()
+    for path in paths:
+        if os.path.isfile(path):
+            files = [path]
+        else:
+            files = []
+            for root, dirs, names in os.walk(path):
+                dirs[:] = sorted(d for d in dirs if d not in SKIP_DIRS)
+                files.extend(
+                    os.path.join(root, name) for name in sorted(names)
+                    if name == 'main.py' or name.endswith(ARTIFACT_EXTENSIONS)
+                )
+        for file_path in files:
+            try:
+                stat = os.stat(file_path)
+            except OSError:
+                continue
+            sha256.update(f"{file_path}:{stat.st_size}:{stat.st_mtime_ns};".encode('utf-8'))
+    return sha256.hexdigest()[:16]
+
+
+def fingerprint(*paths):
+    """
+    Cheap version stamp for a tool: size + mtime of its main.py and model
+    artifacts. Re-checked at most every FINGERPRINT_RECHECK_SECONDS.
+    """
+    now = time.monotonic()
+    with _fingerprints_lock:
+        cached = _fingerprints.get(paths)
+        if cached and now - cached[1] < FINGERPRINT_RECHECK_SECONDS:
+            return cached[0]
+    value = _compute_fingerprint(paths)
+    with _fingerprints_lock:
+        _fingerprints[paths] = (value, now)
+    return value
+
+
+def make_key(tool, canonical_input, model_fingerprint, mode=''):
+    material = json.dumps([tool, mode, model_fingerprint, canonical_input])
+    return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+
+# --- BACKENDS ---
+class SQLiteResultCache:
+    def __init__(self, path, ttl_seconds, max_entries):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._writes = 0
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+            # Entries written before a tool was excluded
+            conn.execute(
+                f"DELETE FROM results WHERE tool IN ({', '.join('?' * len(UNCACHED_TOOLS))})", UNCACHED_TOOLS
+            )
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.execute('PRAGMA journal_mode=WAL')
+        return conn
+
+    def get(self, key):
+        now = time.time()
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT value FROM results WHERE key = ? AND created_at >= ?", (key, now - self.ttl_seconds)
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute("UPDATE results SET last_used = ? WHERE key = ?", (now, key))
+        return json.loads(row[0])
+
+    def set(self, key, tool, value):
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO results (key, tool, value, created_at, last_used) VALUES (?, ?, ?, ?, ?)",
+                (key, tool, value, now, now)
+            )
+        self._writes += 1
+        if self._writes % 100 == 0:
+            self.evict()
+
+    def evict(self):
+        """Drops expired entries, then the least recently used ones above max_entries."""
+        with self._connect() as conn:
+            conn.execute("DELETE FROM results WHERE created_at < ?", (time.time() - self.ttl_seconds,))
+            conn.execute(
+                "DELETE FROM results WHERE key IN ("
+                "SELECT key FROM results ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+
+
+class RedisResultCache:
+    # LRU eviction is left to the server's maxmemory-policy (allkeys-lru)
+    def __init__(self, url, ttl_seconds):
+        self.client = redis.Redis.from_url(url)
+        self.ttl_seconds = ttl_seconds
+
+    def get(self, key):
+        value = self.client.get(f"result:{key}")
+        return json.loads(value) if value is not None else None
+
+    def set(self, key, tool, value):
+        self.client.setex(f"result:{key}", self.ttl_seconds, value)
+
+
+class ResultCache:
+    """Front for the configured backend. A broken cache never breaks a scan: errors are logged and treated as misses."""
+
+    def __init__(self, url, ttl_seconds=3600, max_entries=10000):
+        self.backend = None
+        if not url or url == 'off':
+            logging.info("Result cache disabled.")
+        elif url.startswith('redis://'):
+            if redis is None:
+                logging.warning("⚠️ RESULT_CACHE_URL points to Redis but the `redis` package is not installed - cache disabled.")
+            else:
+                self.backend = RedisResultCache(url, ttl_seconds)
+        elif url.startswith('sqlite:///'):
+            self.backend = SQLiteResultCache(url[len('sqlite:///'):], ttl_seconds, max_entries)
+        else:
+            logging.warning(f"⚠️ Unsupported RESULT_CACHE_URL {url!r} - cache disabled.")
+
+    def get(self, key):
+        if self.backend is None or key is None:
+            return None
+        try:
+            return self.backend.get(key)
+        except Exception as e:
+            logging.warning(f"⚠️ Result cache read failed: {e}")
+            return None
+
+    def set(self, key, tool, report, json_default=None):
+        """Caches a successful report. Failed scans are never cached."""
+        if self.backend is None or key is None or not report or not report.get('ok'):
+            return
+        try:
+            self.backend.set(key, tool, json.dumps(report, default=json_default))
+        except Exception as e:
+            logging.warning(f"⚠️ Result cache write failed: {e}")
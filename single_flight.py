@@ -0,0 +1,207 @@
+"""
+Single-flight coalescing of identical in-flight scans.
+
+When a phishing URL goes round a team, dozens of identical requests arrive
+within seconds. Only the first (the leader) runs the tool; the rest wait for
+it and reuse its result.
+
+    - Inside one worker process, followers wait on the leader's Event.
+    - Across gunicorn workers, the leader holds an flock() on a per-key lock
+      file under STATE_FOLDER. Followers in other workers block on that lock,
+      release it as soon as they get it and look for the leader's report in
+      the shared result cache (the `lookup` callback). Only on a miss (an
+      error, an uncacheable report) do they run the tool, concurrently and
+      without the lock, so a failing scan is not retried one worker at a time.
+
+do_async() does the same for coroutines (asgi.py): followers in the same
+event loop await the leader's future, and the cross-worker lock is polled
+with asyncio.sleep(). Both share the lock files, so a threaded worker and an
+async worker still coalesce.
+
+On platforms without fcntl (Windows dev boxes) only in-process coalescing is
+done.
+"""
+import os
+import time
+import asyncio
+import logging
+import threading
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+LOCK_POLL_SECONDS = 0.05
+
+
+class _Call:
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+
+
+class SingleFlight:
+    def __init__(self, lock_dir, timeout=130):
+        self.lock_dir = lock_dir
+        self.timeout = timeout
+        self._calls = {}
+        self._async_calls = {}
+        self._lock = threading.Lock()
+        os.makedirs(lock_dir, exist_ok=True)
+
+    def do(self, key, work, lookup=None):
+        """
+        Runs work() once per key across concurrent callers. lookup() is tried
+        before work(); it returns a result another worker already produced, or
+        None. work() only holds the cross-worker lock when this caller got it
+        without waiting.
+        Returns (result, shared) where shared is True when this caller did not run work().
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            if call.event.wait(self.timeout) and call.result is not None:
+                return call.result, True
+            # Leader crashed or hung: do the work ourselves
+            return work(), False
+
+        try:
+            with self._file_lock(key) as lock:
+                if lock.waited:
+                    # Another worker led this key: reuse its result or run alongside the others
+                    lock.release()
+                result = lookup() if lookup else None
+                shared = result is not None
+                if not shared:
+                    result = work()
+            call.result = result
+            return result, shared
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.event.set()
+
+    async def do_async(self, key, work, lookup=None):
+        """do() for coroutine functions `work` and `lookup`, called from one event loop."""
+        call = self._async_calls.get(key)
+        if call is not None:
+            try:
+                result = await asyncio.wait_for(asyncio.shield(call), self.timeout)
+            except asyncio.TimeoutError:
+                result = None
+            if result is not None:
+                return result, True
+            # Leader crashed or hung: do the work ourselves
+            return await work(), False
+
+        call = self._async_calls[key] = asyncio.get_running_loop().create_future()
+        result = None
+        try:
+            async with self._file_lock(key) as lock:
+                if lock.waited:
+                    # Another worker led this key: reuse its result or run alongside the others
+                    lock.release()
+                result = await lookup() if lookup else None
+                shared = result is not None
+                if not shared:
+                    result = await work()
+            return result, shared
+        finally:
+            self._async_calls.pop(key, None)
+            call.set_result(result)
+
+    def _file_lock(self, key):
+        if fcntl is None:
+            return _NoLock()
+        return _FileLock(os.path.join(self.lock_dir, f"{key}.lock"), self.timeout)
+
+
+class _NoLock:
+    waited = False
+
+    def release(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+class _FileLock:
+    """flock() on a per-key file that the holder unlinks on release, so lock files never pile up."""
+
+    def __init__(self, path, timeout):
+        self.path = path
+        self.timeout = timeout
+        self.fd = None
+        self.waited = False
+
+    def __enter__(self):
+        deadline = time.monotonic() + self.timeout
+        while not self._try_lock():
+            self.waited = True
+            if time.monotonic() >= deadline:
+                self._timed_out()
+                break
+            time.sleep(LOCK_POLL_SECONDS)
+        return self
+
+    async def __aenter__(self):
+        deadline = time.monotonic() + self.timeout
+        while not self._try_lock():
+            self.waited = True
+            if time.monotonic() >= deadline:
+                self._timed_out()
+                break
+            await asyncio.sleep(LOCK_POLL_SECONDS)
+        return self
+
+    def _try_lock(self):
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            return False
+        # The previous holder may have unlinked the file while we waited; lock the live one
+        try:
+            if os.fstat(fd).st_ino == os.stat(self.path).st_ino:
+                self.fd = fd
+                return True
+        except FileNotFoundError:
+            pass
+        os.close(fd)
+        return False
+
+    def _timed_out(self):
+        logging.warning(f"⚠️ Timed out waiting for in-flight scan lock {os.path.basename(self.path)}; running anyway.")
+
+    def __exit__(self, *exc):
+        self.release()
+        return False
+
+    def release(self):
+        if self.fd is not None:
+            try:
+                os.unlink(self.path)
+            except FileNotFoundError:
+                pass
+            fcntl.flock(self.fd, fcntl.LOCK_UN)
+            os.close(self.fd)
+            self.fd = None
+
+    async def __aexit__(self, *exc):
+        return self.__exit__(*exc)
@@ -0,0 +1,70 @@
+/* --- jobs.js: waits for background upload jobs (/api/upload_file/<tool> answers with a job id) --- */
+
+// Finished job -> the tool report shown to the user.
+function jobResult(job) {
+    if (job.ok === false) {
+        return job;
+    }
+    if (job.status === 'done') {
+        return job.result;
+    }
+    if (job.status === 'cancelled') {
+        // The stored result is the tool's {ok: false, error_type: 'Cancelled'} reply, if any
+        return { ok: false, error: job.error || 'Scan cancelled.', ...(job.result || {}), cancelled: true };
+    }
+    return job.result || { ok: false, error: job.error || 'Background job failed.' };
+}
+
+// Returns the finished tool report for an upload response.
+// onProgress(event) is called with each progress event ({stage, ...}) the tool reports.
+// Uses the job's Server-Sent Events stream, falling back to long-polling /api/jobs/<id>.
+async function awaitJob(data, onProgress) {
+    if (!data || !data.job_id) {
+        return data; // Not a job (validation error, or a tool that answered directly)
+    }
+    if (window.EventSource) {
+        const job = await streamJob(data.job_id, onProgress);
+        if (job) {
+            return jobResult(job);
+        }
+    }
+    while (true) {
+        const res = await fetch(`/api/jobs/${data.job_id}?wait=25`);
+        const job = await res.json();
+        if (job.ok !== false && job.progress && onProgress) {
+            onProgress(job.progress);
+        }
+        if (job.ok === false || ['done', 'failed', 'cancelled'].includes(job.status)) {
+            return jobResult(job);
+        }
+    }
+}
+
+// Resolves with the finished job, or null when the stream cannot be used (the caller polls instead).
+function streamJob(jobId, onProgress) {
+    return new Promise((resolve) => {
+        const source = new EventSource(`/api/jobs/${jobId}/events`);
+        source.addEventListener('progress', (e) => {
+            if (onProgress) {
+                onProgress(JSON.parse(e.data));
+            }
+        });
+        source.addEventListener('done', (e) => {
+            source.close();
+            resolve(JSON.parse(e.data));
+        });
+        source.onerror = () => {
+            // The server ends each stream after a while and EventSource reconnects on its own;
+            // only give up when it stops retrying (e.g. a 404)
+            if (source.readyState === EventSource.CLOSED) {
+                resolve(null);
+            }
+        };
+    });
+}
+
+// Asks the server to stop a queued or running job; awaitJob() then resolves with {cancelled: true}.
+async function cancelJob(jobId) {
+    const res = await fetch(`/api/jobs/${jobId}/cancel`, { method: 'POST' });
+    return res.json();
+}
@@ -26,6 +26,17 @@ CREATE INDEX IF NOT EXISTS idx_users_email ON users(email);
 CREATE INDEX IF NOT EXISTS idx_users_username ON users(username);
 CREATE INDEX IF NOT EXISTS idx_users_role ON users(role);
 
+-- ====================================
+-- REPORT BODIES TABLE
+-- ====================================
+-- Report JSON stored once per distinct content, keyed by the SHA-256 of its
+-- canonical form (timestamps and other per-scan fields left out)
+CREATE TABLE IF NOT EXISTS report_bodies (
+    hash CHAR(64) PRIMARY KEY,
+    data BYTEA NOT NULL, -- gzip-compressed JSON
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+);
+
 -- ====================================
 -- SCAN REPORTS TABLE
 -- ====================================
@@ -35,7 +46,10 @@ CREATE TABLE IF NOT EXISTS scan_reports (
     input_data_summary TEXT NOT NULL,
     risk_level VARCHAR(20),
     main_finding VARCHAR(500),
-    report_data TEXT NOT NULL,
+    report_data BYTEA NOT NULL, -- gzip-compressed JSON; only the per-scan fields when body_hash is set
+    body_hash CHAR(64) REFERENCES report_bodies(hash),
+    search_text TEXT, -- input, finding and selected report fields, for full-text search
+    search_vector tsvector GENERATED ALWAYS AS (to_tsvector('simple', coalesce(search_text, ''))) STORED,
     scan_date TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
     user_id INTEGER NOT NULL,
     CONSTRAINT fk_user
@@ -45,11 +59,33 @@ CREATE TABLE IF NOT EXISTS scan_reports (
 );
 
 -- Create indexes for faster queries
+-- The application's own tables ("user", scan_report) get the equivalent indexes
+-- from the versioned migrations in app.py (`flask --app app init-db`, built
+-- CONCURRENTLY); `flask --app app db-status` reports any that are missing.
 CREATE INDEX IF NOT EXISTS idx_scan_reports_user_id ON scan_reports(user_id);
 CREATE INDEX IF NOT EXISTS idx_scan_reports_tool_name ON scan_reports(tool_name);
 CREATE INDEX IF NOT EXISTS idx_scan_reports_scan_date ON scan_reports(scan_date DESC);
 CREATE INDEX IF NOT EXISTS idx_scan_reports_risk_level ON scan_reports(risk_level);
 
+-- Keyset-paginated history: (user, [tool | risk,] date, id) range scans
+CREATE INDEX IF NOT EXISTS idx_scan_reports_user_date ON scan_reports(user_id, scan_date DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_scan_reports_user_tool_date ON scan_reports(user_id, tool_name, scan_date DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_scan_reports_user_risk_date ON scan_reports(user_id, risk_level, scan_date DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_scan_reports_date_id ON scan_reports(scan_date DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_scan_reports_body_hash ON scan_reports(body_hash);
+
+-- Full-text search (/api/search)
+CREATE INDEX IF NOT EXISTS idx_scan_reports_search ON scan_reports USING GIN (search_vector);
+
+-- ====================================
+-- SCAN STATISTICS ROLLUP
+-- ====================================
+-- Not created here. The app's scan_stats_daily table belongs with its own
+-- "user" and scan_report tables and is created by `flask --app app init-db`.
+-- A scan_stats_daily created by this file would point at users(id) instead;
+-- init-db would then keep that table, and every rollup write would fail.
+-- init-db refuses to start when a foreign key points at the wrong table.
+
 -- ====================================
 -- OTP VERIFICATION TABLE (Optional - for custom OTP)
 -- ====================================
@@ -124,7 +160,7 @@ ON CONFLICT (email) DO NOTHING;
 -- VIEWS FOR ANALYTICS (OPTIONAL)
 -- ====================================
 
--- View: Recent scans summary
+-- View: Recent scans summary (an index scan of idx_scan_reports_date_id)
 CREATE OR REPLACE VIEW recent_scans_summary AS
 SELECT 
     u.username,
@@ -176,6 +212,7 @@ GROUP BY u.id, u.username, u.email;
 
 GRANT SELECT, INSERT, UPDATE ON users TO authenticated;
 GRANT SELECT, INSERT, UPDATE, DELETE ON scan_reports TO authenticated;
+GRANT SELECT, INSERT, DELETE ON report_bodies TO authenticated;
 GRANT USAGE, SELECT ON ALL SEQUENCES IN SCHEMA public TO authenticated;
 
 -- ====================================
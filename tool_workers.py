@@ -0,0 +1,543 @@
+"""
+Supervised pools of warm backend tool workers.
+
+Instead of paying interpreter start-up, pandas/sklearn imports and joblib
+loading on every scan, each tool folder gets a small pool of long-lived
+`backend/tool_worker.py` processes. They are spawned lazily on first use,
+replaced when they crash or hang, and talk length-prefixed JSON frames
+(backend/framing.py) over their stdin/stdout pipes.
+
+Progress frames a tool sends before its reply go to the caller's progress()
+callback. While waiting, the caller's cancelled() callback is polled; a
+cancelled request kills the worker so its CPU is freed at once.
+
+The asyncio serving mode (asgi.py) uses AsyncWorkerPool / run_once_async:
+the same worker processes and frames, driven through asyncio pipes, so a
+pending scan costs the event loop nothing but a file descriptor.
+
+Pool sizes:
+    TOOL_WORKER_POOL_SIZE=1                               warm workers per tool (0 disables)
+    TOOL_WORKER_POOL_SIZES=phishing-detector=2,deepfake-analyzer=0   per-tool overrides
+    TOOL_WORKER_POOL_MAX=8                                workers a pool may grow to under load
+    TOOL_WORKER_WAIT_SECONDS=30                           max wait for a free worker at the maximum
+
+Workers started above the warm size are stopped again once they are idle.
+A request that finds every worker busy for TOOL_WORKER_WAIT_SECONDS gets a
+'Busy' error frame (HTTP 429 in the app), not a tool timeout: it never ran.
+"""
+import os
+import sys
+import time
+import queue
+import select
+import atexit
+import asyncio
+import logging
+import tempfile
+import threading
+import subprocess
+
+from backend import framing
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backend')
+WORKER_SCRIPT = os.path.join(BACKEND_DIR, 'tool_worker.py')
+
+DEFAULT_POOL_SIZE = int(os.getenv('TOOL_WORKER_POOL_SIZE', 1))
+POOL_MAX = int(os.getenv('TOOL_WORKER_POOL_MAX', 8))
+WORKER_WAIT_SECONDS = float(os.getenv('TOOL_WORKER_WAIT_SECONDS', 30))
+WORKER_START_TIMEOUT = int(os.getenv('TOOL_WORKER_START_TIMEOUT', 60))
+WORKER_PYTHON = os.getenv('TOOL_WORKER_PYTHON', sys.executable)
+CANCEL_POLL_SECONDS = 0.25
+
+
+class WorkerError(Exception):
+    """A worker could not be started or stopped answering."""
+
+
+class Cancelled(Exception):
+    """The caller cancelled the request while the worker was busy with it."""
+
+
+def _parse_pool_sizes(raw):
+    sizes = {}
+    for item in (raw or '').split(','):
+        if '=' not in item:
+            continue
+        name, size = item.split('=', 1)
+        try:
+            sizes[name.strip()] = int(size)
+        except ValueError:
+            logging.warning(f"⚠️ Ignoring invalid TOOL_WORKER_POOL_SIZES entry: {item!r}")
+    return sizes
+
+
+POOL_SIZES = _parse_pool_sizes(os.getenv('TOOL_WORKER_POOL_SIZES'))
+
+
+class _Worker:
+    def __init__(self, folder, once=False):
+        self.folder = folder
+        # A one-shot run has no handshake; its stderr explains an import failure
+        self.stderr = tempfile.TemporaryFile() if once else None
+        self.proc = subprocess.Popen(
+            [WORKER_PYTHON, WORKER_SCRIPT, folder] + (['--once'] if once else []),
+            cwd=BACKEND_DIR,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=self.stderr,
+        )
+        if once:
+            return
+        try:
+            ready = self._read_frame(time.monotonic() + WORKER_START_TIMEOUT)
+        except (EOFError, TimeoutError, OSError) as e:
+            self.stop()
+            raise WorkerError(f"{folder} worker failed to start: {e or type(e).__name__}")
+        if not ready.get('ready'):
+            self.stop()
+            raise WorkerError(f"{folder} worker sent an unexpected handshake.")
+
+    def alive(self):
+        return self.proc.poll() is None
+
+    def call(self, message, timeout, progress=None, cancelled=None):
+        deadline = time.monotonic() + timeout
+        self.proc.stdin.write(framing.encode(message))
+        self.proc.stdin.flush()
+        while True:
+            frame = self._read_frame(deadline, cancelled)
+            if 'progress' not in frame:
+                return frame
+            if progress:
+                progress(frame['progress'])
+
+    def _read_exact(self, size, deadline, cancelled=None):
+        # Raw os.read on the pipe fd so select() never disagrees with a userspace buffer
+        fd = self.proc.stdout.fileno()
+        chunks = []
+        remaining = size
+        while remaining:
+            if cancelled and cancelled():
+                raise Cancelled()
+            wait = deadline - time.monotonic()
+            if wait <= 0:
+                raise TimeoutError()
+            readable, _, _ = select.select([fd], [], [], min(wait, CANCEL_POLL_SECONDS) if cancelled else wait)
+            if not readable:
+                continue
+            chunk = os.read(fd, remaining)
+            if not chunk:
+                raise EOFError("worker exited")
+            chunks.append(chunk)
+            remaining -= len(chunk)
+        return b''.join(chunks)
+
+    def _read_frame(self, deadline, cancelled=None):
+        (length,) = framing.HEADER.unpack(self._read_exact(framing.HEADER.size, deadline, cancelled))
+        return framing.decode(self._read_exact(length, deadline, cancelled))
+
+    def stderr_text(self):
+        if self.stderr is None:
+            return ''
+        self.stderr.seek(0)
+        return self.stderr.read().decode('utf-8', 'replace').strip()
+
+    def stop(self, force=False):
+        try:
+            if force:
+                raise TimeoutError()
+            self.proc.stdin.close()
+            self.proc.wait(timeout=2)
+        except Exception:
+            self.proc.kill()
+            self.proc.wait()
+        if self.stderr is not None:
+            self.stderr.close()
+
+
+def busy_error(folder):
+    return framing.error('Busy', f"Every {folder} worker is busy. Please retry in a moment.")
+
+
+class WorkerPool:
+    def __init__(self, folder, size, max_size=None):
+        self.folder = folder
+        self.size = size
+        self.max_size = max(size, max_size or POOL_MAX)
+        self._idle = queue.LifoQueue()
+        self._spawned = 0
+        self._lock = threading.Lock()
+
+    def _spawn(self, limit=None):
+        with self._lock:
+            if self._spawned >= (limit or self.max_size):
+                return None
+            self._spawned += 1
+        try:
+            return _Worker(self.folder)
+        except Exception:
+            with self._lock:
+                self._spawned -= 1
+            raise
+
+    def _discard(self, worker, reason):
+        worker.stop(force=True)
+        with self._lock:
+            self._spawned -= 1
+        logging.warning(f"⚠️ Restarting {self.folder} worker (pid {worker.proc.pid}): {reason}")
+        threading.Thread(target=self._replace, daemon=True).start()
+
+    def _replace(self):
+        # Keep the pool warm so the next request does not pay the start-up cost
+        try:
+            worker = self._spawn(limit=self.size)
+            if worker:
+                self._idle.put(worker)
+        except Exception as e:
+            logging.error(f"❌ Could not restart {self.folder} worker: {e}")
+
+    def _release(self, worker):
+        if self._idle.qsize() < self.size:
+            self._idle.put(worker)
+            return
+        # A surge worker: the warm ones are enough again
+        with self._lock:
+            self._spawned -= 1
+        threading.Thread(target=worker.stop, daemon=True).start()
+
+    def _acquire(self, deadline):
+        while True:
+            try:
+                worker = self._idle.get_nowait()
+            except queue.Empty:
+                worker = self._spawn()
+                if worker is None:
+                    worker = self._idle.get(timeout=max(0.0, deadline - time.monotonic()))
+            if worker.alive():
+                return worker
+            self._discard(worker, "exited while idle")
+
+    def run(self, message, timeout=120, progress=None, cancelled=None):
+        """
+        Runs one request frame on a warm worker and returns the reply frame, or
+        None when no worker can be started (the caller falls back to a one-shot run).
+        progress(event) receives the tool's progress events; cancelled() is polled
+        while waiting and stops the request when it returns True.
+        """
+        try:
+            worker = self._acquire(time.monotonic() + WORKER_WAIT_SECONDS)
+        except queue.Empty:
+            return busy_error(self.folder)
+        except (WorkerError, OSError) as e:
+            logging.warning(f"⚠️ {e} - falling back to a one-off process.")
+            return None
+
+        # The tool's own time budget starts once it has a worker
+        try:
+            reply = worker.call(message, timeout, progress, cancelled)
+        except Cancelled:
+            self._discard(worker, "request cancelled")
+            return framing.error('Cancelled', "Scan cancelled.")
+        except TimeoutError:
+            self._discard(worker, "request timed out")
+            return framing.error('Timeout', f"Tool timed out after {timeout}s. Try a smaller file.")
+        except (EOFError, OSError, ValueError) as e:
+            self._discard(worker, f"crashed ({e or type(e).__name__})")
+            return framing.error('WorkerCrashed', "Tool worker crashed while processing the request.")
+
+        self._release(worker)
+        return reply
+
+    def shutdown(self):
+        while True:
+            try:
+                self._idle.get_nowait().stop()
+            except queue.Empty:
+                break
+
+
+_routes_by_folder = {}
+_pools = {}
+_pools_pid = None
+_pools_lock = threading.Lock()
+
+
+def configure(tool_folders):
+    """Registers {route: folder} so TOOL_WORKER_POOL_SIZES can use either name."""
+    for route, folder in tool_folders.items():
+        _routes_by_folder[folder] = route
+
+
+def pool_size(folder):
+    route = _routes_by_folder.get(folder)
+    if route in POOL_SIZES:
+        return POOL_SIZES[route]
+    return POOL_SIZES.get(folder, DEFAULT_POOL_SIZE)
+
+
+def run_once(folder, message, timeout=120, progress=None, cancelled=None):
+    """Runs one request frame in a fresh `tool_worker.py <folder> --once` process and returns the reply frame."""
+    try:
+        worker = _Worker(folder, once=True)
+    except OSError as e:
+        return framing.error('StartFailed', f"Could not start the backend tool: {e}")
+
+    try:
+        return worker.call(message, timeout, progress, cancelled)
+    except Cancelled:
+        return framing.error('Cancelled', "Scan cancelled.")
+    except TimeoutError:
+        return framing.error('Timeout', f"Tool timed out after {timeout}s. Try a smaller file.")
+    except (EOFError, OSError, ValueError):
+        # No reply frame: the tool failed to import (syntax error, missing package...)
+        worker.proc.wait()
+        stderr = worker.stderr_text()
+        return framing.error('StartFailed', f"Tool failed: {stderr or 'no reply from the backend tool.'}", stderr)
+    finally:
+        worker.stop(force=worker.alive())
+
+
+def get_pool(folder):
+    """Returns the pool for a backend folder, or None when pooling is disabled for it."""
+    global _pools_pid
+    if folder not in _routes_by_folder or pool_size(folder) <= 0:
+        return None
+    with _pools_lock:
+        if _pools_pid != os.getpid():
+            # Pipes inherited across a fork belong to the parent; start fresh
+            _pools.clear()
+            _pools_pid = os.getpid()
+        pool = _pools.get(folder)
+        if pool is None:
+            pool = _pools[folder] = WorkerPool(folder, pool_size(folder))
+        return pool
+
+
+class _AsyncWorker:
+    """_Worker for the event loop: create it with `await _AsyncWorker.start(folder)`."""
+
+    def __init__(self, folder, proc, stderr):
+        self.folder = folder
+        self.proc = proc
+        self.stderr = stderr
+
+    @classmethod
+    async def start(cls, folder, once=False):
+        stderr = tempfile.TemporaryFile() if once else None
+        proc = await asyncio.create_subprocess_exec(
+            WORKER_PYTHON, WORKER_SCRIPT, folder, *(['--once'] if once else []),
+            cwd=BACKEND_DIR,
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=stderr,
+        )
+        worker = cls(folder, proc, stderr)
+        if once:
+            return worker
+        try:
+            ready = await asyncio.wait_for(worker._read_frame(), WORKER_START_TIMEOUT)
+        except (asyncio.IncompleteReadError, asyncio.TimeoutError, OSError) as e:
+            await worker.stop(force=True)
+            raise WorkerError(f"{folder} worker failed to start: {e or type(e).__name__}")
+        if not ready.get('ready'):
+            await worker.stop(force=True)
+            raise WorkerError(f"{folder} worker sent an unexpected handshake.")
+        return worker
+
+    def alive(self):
+        return self.proc.returncode is None
+
+    async def _read_frame(self):
+        (length,) = framing.HEADER.unpack(await self.proc.stdout.readexactly(framing.HEADER.size))
+        return framing.decode(await self.proc.stdout.readexactly(length))
+
+    async def call(self, message, timeout, progress=None, cancelled=None):
+        deadline = time.monotonic() + timeout
+        self.proc.stdin.write(framing.encode(message))
+        await self.proc.stdin.drain()
+        while True:
+            read = asyncio.ensure_future(self._read_frame())
+            try:
+                while not read.done():
+                    wait = deadline - time.monotonic()
+                    if wait <= 0:
+                        raise TimeoutError()
+                    await asyncio.wait({read}, timeout=min(wait, CANCEL_POLL_SECONDS) if cancelled else wait)
+                    if not read.done() and cancelled and cancelled():
+                        raise Cancelled()
+            finally:
+                if not read.done():
+                    read.cancel()
+            frame = read.result()
+            if 'progress' not in frame:
+                return frame
+            if progress:
+                progress(frame['progress'])
+
+    def stderr_text(self):
+        if self.stderr is None:
+            return ''
+        self.stderr.seek(0)
+        return self.stderr.read().decode('utf-8', 'replace').strip()
+
+    async def stop(self, force=False):
+        try:
+            if force:
+                raise TimeoutError()
+            self.proc.stdin.close()
+            await asyncio.wait_for(self.proc.wait(), 2)
+        except Exception:
+            if self.alive():
+                self.proc.kill()
+            await self.proc.wait()
+        if self.stderr is not None:
+            self.stderr.close()
+
+
+class AsyncWorkerPool:
+    """WorkerPool for one event loop; its workers are separate from the threaded pools."""
+
+    def __init__(self, folder, size, max_size=None):
+        self.folder = folder
+        self.size = size
+        self.max_size = max(size, max_size or POOL_MAX)
+        self._idle = asyncio.LifoQueue()
+        self._spawned = 0
+        self._replacements = set()
+
+    async def _spawn(self, limit=None):
+        if self._spawned >= (limit or self.max_size):
+            return None
+        self._spawned += 1
+        try:
+            return await _AsyncWorker.start(self.folder)
+        except Exception:
+            self._spawned -= 1
+            raise
+
+    async def _discard(self, worker, reason):
+        await worker.stop(force=True)
+        self._spawned -= 1
+        logging.warning(f"⚠️ Restarting {self.folder} worker (pid {worker.proc.pid}): {reason}")
+        self._background(self._replace())
+
+    def _background(self, coroutine):
+        task = asyncio.ensure_future(coroutine)
+        self._replacements.add(task)
+        task.add_done_callback(self._replacements.discard)
+
+    async def _replace(self):
+        # Keep the pool warm so the next request does not pay the start-up cost
+        try:
+            worker = await self._spawn(limit=self.size)
+            if worker:
+                self._idle.put_nowait(worker)
+        except Exception as e:
+            logging.error(f"❌ Could not restart {self.folder} worker: {e}")
+
+    def _release(self, worker):
+        if self._idle.qsize() < self.size:
+            self._idle.put_nowait(worker)
+            return
+        # A surge worker: the warm ones are enough again
+        self._spawned -= 1
+        self._background(worker.stop())
+
+    async def _acquire(self, deadline):
+        while True:
+            try:
+                worker = self._idle.get_nowait()
+            except asyncio.QueueEmpty:
+                worker = await self._spawn()
+                if worker is None:
+                    worker = await asyncio.wait_for(self._idle.get(), max(0.0, deadline - time.monotonic()))
+            if worker.alive():
+                return worker
+            await self._discard(worker, "exited while idle")
+
+    async def run(self, message, timeout=120, progress=None, cancelled=None):
+        """Awaitable WorkerPool.run(): the reply frame, or None when no worker can be started."""
+        try:
+            worker = await self._acquire(time.monotonic() + WORKER_WAIT_SECONDS)
+        except asyncio.TimeoutError:
+            return busy_error(self.folder)
+        except (WorkerError, OSError) as e:
+            logging.warning(f"⚠️ {e} - falling back to a one-off process.")
+            return None
+
+        # The tool's own time budget starts once it has a worker
+        try:
+            reply = await worker.call(message, timeout, progress, cancelled)
+        except Cancelled:
+            await self._discard(worker, "request cancelled")
+            return framing.error('Cancelled', "Scan cancelled.")
+        except TimeoutError:
+            await self._discard(worker, "request timed out")
+            return framing.error('Timeout', f"Tool timed out after {timeout}s. Try a smaller file.")
+        except asyncio.CancelledError:
+            # The request itself was cancelled (server shutdown): do not leave a busy worker behind
+            await self._discard(worker, "request aborted")
+            raise
+        except (asyncio.IncompleteReadError, OSError, ValueError) as e:
+            await self._discard(worker, f"crashed ({e or type(e).__name__})")
+            return framing.error('WorkerCrashed', "Tool worker crashed while processing the request.")
+
+        self._release(worker)
+        return reply
+
+    async def shutdown(self):
+        while True:
+            try:
+                worker = self._idle.get_nowait()
+            except asyncio.QueueEmpty:
+                break
+            await worker.stop()
+
+
+async def run_once_async(folder, message, timeout=120, progress=None, cancelled=None):
+    """Awaitable run_once()."""
+    try:
+        worker = await _AsyncWorker.start(folder, once=True)
+    except OSError as e:
+        return framing.error('StartFailed', f"Could not start the backend tool: {e}")
+
+    try:
+        return await worker.call(message, timeout, progress, cancelled)
+    except Cancelled:
+        return framing.error('Cancelled', "Scan cancelled.")
+    except TimeoutError:
+        return framing.error('Timeout', f"Tool timed out after {timeout}s. Try a smaller file.")
+    except (asyncio.IncompleteReadError, OSError, ValueError):
+        # No reply frame: the tool failed to import (syntax error, missing package...)
+        await worker.proc.wait()
+        stderr = worker.stderr_text()
+        return framing.error('StartFailed', f"Tool failed: {stderr or 'no reply from the backend tool.'}", stderr)
+    finally:
+        await worker.stop(force=worker.alive())
+
+
+_async_pools = {}
+
+
+def get_async_pool(folder):
+    """get_pool() for the running event loop (one loop per asgi.py server process)."""
+    if folder not in _routes_by_folder or pool_size(folder) <= 0:
+        return None
+    pool = _async_pools.get(folder)
+    if pool is None:
+        pool = _async_pools[folder] = AsyncWorkerPool(folder, pool_size(folder))
+    return pool
+
+
+async def shutdown_async():
+    for pool in list(_async_pools.values()):
+        await pool.shutdown()
+    _async_pools.clear()
+
+
+@atexit.register
+def shutdown_all():
+    if _pools_pid != os.getpid():
+        return
+    for pool in list(_pools.values()):
+        pool.shutdown()
@@ -0,0 +1,172 @@
+"""
+Single-pass upload ingestion.
+
+By default Werkzeug spools a multipart upload into a temporary file, the view
+copies it into UPLOAD_FOLDER with file.save(), and the tool reads it again to
+hash it. IngestRequest instead hands the multipart parser an IngestFile that
+writes each chunk (the parser's fixed 64 KB reads) straight to its final
+place, UPLOAD_FOLDER/<random dir>/<secure filename>, while updating a
+SHA-256, the byte count and the magic-byte sniffer. A multi-hundred-MB video
+is written once and never held in memory.
+
+Files the request does not claim (rejected uploads, aborted requests) are
+deleted when the request ends.
+
+receive_file() does the same for the asyncio serving mode (asgi.py): it
+feeds the ASGI body messages to Werkzeug's sans-IO multipart decoder and
+writes the file part into an IngestFile as the chunks arrive.
+"""
+import os
+import uuid
+import shutil
+import hashlib
+
+from flask import Request, current_app, g
+from werkzeug.exceptions import RequestEntityTooLarge
+from werkzeug.sansio.multipart import MultipartDecoder, File, Data, Epilogue, NeedData
+from werkzeug.utils import secure_filename
+
+HEAD_BYTES = 16
+
+# (offset, magic bytes, content type) for the upload types we accept
+SIGNATURES = (
+    (0, b'\x89PNG\r\n\x1a\n', 'image/png'),
+    (0, b'\xff\xd8\xff', 'image/jpeg'),
+    (0, b'GIF87a', 'image/gif'),
+    (0, b'GIF89a', 'image/gif'),
+    (0, b'II*\x00', 'image/tiff'),
+    (0, b'MM\x00*', 'image/tiff'),
+    (0, b'\x1aE\xdf\xa3', 'video/webm'),
+    (4, b'ftypqt', 'video/quicktime'),
+    (4, b'ftyp', 'video/mp4'),
+)
+
+
+def sniff_content_type(head):
+    """Content type from the first bytes of a file, or None if it is not a type we know."""
+    if head[:4] == b'RIFF' and head[8:12] == b'AVI ':
+        return 'video/x-msvideo'
+    for offset, magic, content_type in SIGNATURES:
+        if head[offset:offset + len(magic)] == magic:
+            return content_type
+    return None
+
+
+class IngestFile:
+    """Readable/writable upload file that hashes, counts and sniffs its bytes as the parser writes them."""
+
+    def __init__(self, directory, filename):
+        self.directory = directory
+        self.filename = filename
+        self.path = os.path.join(directory, filename)
+        self.size = 0
+        self.claimed = False
+        self._sha256 = hashlib.sha256()
+        self._head = b''
+        self._file = open(self.path, 'w+b')
+
+    def write(self, data):
+        self._sha256.update(data)
+        self.size += len(data)
+        if len(self._head) < HEAD_BYTES:
+            self._head += data[:HEAD_BYTES - len(self._head)]
+        return self._file.write(data)
+
+    @property
+    def sha256(self):
+        return self._sha256.hexdigest()
+
+    @property
+    def content_type(self):
+        return sniff_content_type(self._head)
+
+    def claim(self):
+        """Takes ownership of the upload directory: it is no longer deleted at the end of the request."""
+        self._file.close()
+        self.claimed = True
+        return self.path
+
+    def discard(self):
+        self._file.close()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def readline(self, size=-1):
+        return self._file.readline(size)
+
+    def __iter__(self):
+        # Dunder lookups skip __getattr__: `for line in request.files['file'].stream` needs this
+        return iter(self._file)
+
+    def __getattr__(self, name):
+        # read/seek/close etc. for Werkzeug's FileStorage
+        return getattr(self._file, name)
+
+
+def create_ingest_file(upload_folder, filename):
+    """An IngestFile for `filename` in a fresh directory of its own under upload_folder."""
+    directory = os.path.abspath(os.path.join(upload_folder, uuid.uuid4().hex))
+    os.makedirs(directory, exist_ok=True)
+    return IngestFile(directory, secure_filename(filename or '') or 'upload')
+
+
+class IngestRequest(Request):
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        ingest = create_ingest_file(current_app.config['UPLOAD_FOLDER'], filename)
+        g.setdefault('ingested_files', []).append(ingest)
+        return ingest
+
+
+def discard_unclaimed(exc=None):
+    """teardown_request hook: removes every upload of the request that no job took over."""
+    for ingest in g.pop('ingested_files', []):
+        if not ingest.claimed:
+            ingest.discard()
+
+
+async def receive_file(receive, boundary, field, upload_folder, max_size):
+    """
+    Reads a multipart/form-data body from an ASGI `receive` channel and
+    ingests the file sent as `field`. Returns (ingest, client_filename);
+    ingest is None when the field is missing or no file was chosen. Other
+    fields are skipped. Raises RequestEntityTooLarge past `max_size` bytes and
+    ConnectionError if the client disconnects; the file is discarded then.
+    """
+    decoder = MultipartDecoder(boundary, max_form_memory_size=max_size)
+    ingest, client_filename, current = None, None, None
+    received = 0
+    more_body = True
+    try:
+        while True:
+            event = decoder.next_event()
+            if isinstance(event, NeedData):
+                if not more_body:
+                    return ingest, client_filename
+                message = await receive()
+                if message['type'] == 'http.disconnect':
+                    raise ConnectionError("Client disconnected during the upload.")
+                chunk = message.get('body', b'')
+                received += len(chunk)
+                if received > max_size:
+                    raise RequestEntityTooLarge()
+                more_body = message.get('more_body', False)
+                decoder.receive_data(chunk)
+                if not more_body:
+                    decoder.receive_data(None)
+            elif isinstance(event, File):
+                current = None
+                if event.name == field and ingest is None and event.filename:
+                    client_filename = event.filename
+                    ingest = current = create_ingest_file(upload_folder, event.filename)
+                elif event.name == field and ingest is None:
+                    client_filename = ''
+            elif isinstance(event, Data):
+                if current is not None:
+                    current.write(event.data)
+            elif isinstance(event, Epilogue):
+                return ingest, client_filename
+            else:
+                current = None
+    except BaseException:
+        if ingest is not None:
+            ingest.discard()
+        raise